@@ -0,0 +1,14 @@
+from django.contrib.auth.backends import ModelBackend
+
+from .models import User
+
+
+class SessionUserBackend(ModelBackend):
+    """
+    ``ModelBackend`` whose ``get_user`` — run once per signed-in request
+    by ``AuthenticationMiddleware`` — loads only ``User.SESSION_FIELDS``.
+    """
+
+    def get_user(self, user_id):
+        user = User._default_manager.only(*User.SESSION_FIELDS).filter(pk=user_id).first()
+        return user if user and self.user_can_authenticate(user) else None
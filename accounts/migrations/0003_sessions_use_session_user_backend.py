@@ -0,0 +1,53 @@
+# Generated by Django 6.0.2 on 2026-10-17 17:05
+
+from importlib import import_module
+
+from django.conf import settings
+from django.contrib.auth import BACKEND_SESSION_KEY
+from django.contrib.sessions.backends.db import SessionStore as DBStore
+from django.core.cache import caches
+from django.db import migrations
+from django.utils import timezone
+
+MODEL_BACKEND = 'django.contrib.auth.backends.ModelBackend'
+SESSION_USER_BACKEND = 'accounts.backends.SessionUserBackend'
+
+
+def _swap_backend(old, new):
+    """
+    Rewrites sessions signed in through ``old`` to load their user through
+    ``new``, which must be listed in AUTHENTICATION_BACKENDS for them to
+    stay valid. Stores that keep no database rows (cache, signed cookies)
+    are left alone.
+    """
+    def rewrite(apps, schema_editor):
+        engine = import_module(settings.SESSION_ENGINE)
+        if not issubclass(engine.SessionStore, DBStore):
+            return
+        Session = apps.get_model('sessions', 'Session')
+        cache = caches[settings.SESSION_CACHE_ALIAS]
+        for session in Session.objects.filter(expire_date__gt=timezone.now()).iterator(chunk_size=500):
+            store = engine.SessionStore(session.session_key)
+            data = store.decode(session.session_data)
+            if data.get(BACKEND_SESSION_KEY) != old:
+                continue
+            data[BACKEND_SESSION_KEY] = new
+            Session.objects.filter(pk=session.pk).update(session_data=store.encode(data))
+            if hasattr(store, 'cache_key'):
+                cache.delete(store.cache_key)  # cached_db would serve the old copy
+    return rewrite
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0002_user_bio_user_college_name_user_graduation_year_and_more'),
+        ('sessions', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.RunPython(
+            _swap_backend(MODEL_BACKEND, SESSION_USER_BACKEND),
+            _swap_backend(SESSION_USER_BACKEND, MODEL_BACKEND),
+        ),
+    ]
@@ -24,8 +24,24 @@ class User(AbstractUser):
     USERNAME_FIELD = 'email'
     REQUIRED_FIELDS = ['username', 'first_name', 'last_name']
 
+    # Columns loaded for request.user on every signed-in request (see
+    # accounts.backends): the navbar, the session hash check and the
+    # permission flags. The rest (bio, phone, college...) is deferred
+    # and only fetched by the pages that show it.
+    SESSION_FIELDS = (
+        'id', 'password', 'email', 'username', 'first_name', 'last_name',
+        'profile_picture', 'is_active', 'is_staff', 'is_superuser',
+    )
+    # Profile-only columns, skipped wherever users are joined into lists
+    PROFILE_FIELDS = ('bio', 'phone', 'college_name', 'graduation_year')
+
     def __str__(self):
         return f"{self.get_full_name()} ({self.email})"
 
+    @classmethod
+    def deferred_profile(cls, relation):
+        """``defer()`` arguments leaving PROFILE_FIELDS out of a joined user."""
+        return [f'{relation}__{name}' for name in cls.PROFILE_FIELDS]
+
     def get_full_name(self):
-        return f"{self.first_name} {self.last_name}".strip() or self.username
\ No newline at end of file
+        return f"{self.first_name} {self.last_name}".strip() or self.username
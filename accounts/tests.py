@@ -1,3 +1,82 @@
+from importlib import import_module
+from unittest import mock
+
+from django.apps import apps
+from django.conf import settings
+from django.contrib.auth import BACKEND_SESSION_KEY, HASH_SESSION_KEY, SESSION_KEY, authenticate
+from django.contrib.auth.hashers import get_hasher
+from django.db import connection
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from .models import User
+
+
+class SessionUserTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(
+            email='ada@college.edu', username='ada', password='x-pass-123',
+            first_name='Ada', bio='Selling my old textbooks.', college_name='State',
+        )
+
+    def setUp(self):
+        self.client.force_login(self.user)
+
+    def test_request_user_loads_only_session_fields(self):
+        response = self.client.get(reverse('marketplace:product_list'))
+        user = response.wsgi_request.user
+        self.assertEqual(user.get_deferred_fields() & set(User.SESSION_FIELDS), set())
+        self.assertIn('bio', user.get_deferred_fields())
+
+    def test_session_and_user_cost_one_query(self):
+        self.client.get(reverse('marketplace:product_list'))  # session now cached
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(reverse('marketplace:product_list'))
+            response.wsgi_request.user.get_full_name()
+        auth = [q['sql'] for q in context
+                if 'FROM "django_session"' in q['sql'] or 'FROM "accounts_user"' in q['sql']]
+        self.assertEqual(len(auth), 1, auth)
+
+    def test_profile_edits_the_full_row(self):
+        response = self.client.get(reverse('accounts:profile'))
+        self.assertContains(response, 'Selling my old textbooks.')
+
+        self.client.post(reverse('accounts:profile'), {
+            'first_name': 'Ada', 'last_name': 'L', 'bio': 'All sold.', 'college_name': 'State',
+        })
+        self.user.refresh_from_db()
+        self.assertEqual((self.user.last_name, self.user.bio, self.user.college_name), ('L', 'All sold.', 'State'))
+
+
+class AuthenticationBackendTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(email='ada@college.edu', username='ada', password='x-pass-123')
+
+    def test_failed_logins_hash_once(self):
+        hasher = type(get_hasher())
+        for username in ('ada@college.edu', 'nobody@college.edu'):
+            with self.subTest(username=username):
+                with mock.patch.object(hasher, 'encode', autospec=True, side_effect=hasher.encode) as encode:
+                    self.assertIsNone(authenticate(username=username, password='wrong'))
+                self.assertEqual(encode.call_count, 1)
+
+    def test_model_backend_sessions_are_migrated(self):
+        store = import_module(settings.SESSION_ENGINE).SessionStore()
+        store.update({
+            SESSION_KEY: str(self.user.pk),
+            BACKEND_SESSION_KEY: 'django.contrib.auth.backends.ModelBackend',
+            HASH_SESSION_KEY: self.user.get_session_auth_hash(),
+        })
+        store.save()
+        self.client.cookies[settings.SESSION_COOKIE_NAME] = store.session_key
+        response = self.client.get(reverse('accounts:profile'))
+        self.assertEqual(response.status_code, 302)  # no longer a listed backend
 
-# Create your tests here.
+        migration = import_module('accounts.migrations.0003_sessions_use_session_user_backend')
+        migration._swap_backend(migration.MODEL_BACKEND, migration.SESSION_USER_BACKEND)(apps, None)
+        response = self.client.get(reverse('accounts:profile'))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.wsgi_request.user, self.user)
@@ -77,15 +77,20 @@ class ProfileView(View):
     """
     template_name = 'accounts/profile.html'
 
+    def get_user(self, request):
+        # request.user only carries User.SESSION_FIELDS; load the whole
+        # row once rather than one query per deferred field
+        return User.objects.get(pk=request.user.pk)
+
     def get(self, request):
-        form = ProfileUpdateForm(instance=request.user)
+        form = ProfileUpdateForm(instance=self.get_user(request))
         return render(request, self.template_name, {'form': form})
 
     def post(self, request):
         form = ProfileUpdateForm(
             request.POST,
             request.FILES,
-            instance=request.user
+            instance=self.get_user(request)
         )
         if form.is_valid():
             form.save()
@@ -0,0 +1,98 @@
+import json
+import sys
+import tempfile
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import (
+    override_settings, setup_databases, setup_test_environment,
+    teardown_databases, teardown_test_environment,
+)
+
+from benchmarks import runner
+from benchmarks.scenarios import SCENARIOS, uncovered_url_names
+from benchmarks.seed import SCALES, seed_campus
+from marketplace.cache import get_cache
+
+
+class Command(BaseCommand):
+    help = (
+        "Seeds a synthetic campus in a throwaway test database, requests every "
+        "view and reports query counts, timings and response sizes against "
+        "the stored baselines. Exits non-zero on a regression."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--scale', choices=sorted(SCALES), default='full')
+        parser.add_argument('--repeat', type=int, default=5)
+        parser.add_argument('--only', action='append', metavar='SCENARIO',
+                            help='Run only the named scenario (repeatable).')
+        parser.add_argument('--json', metavar='FILE',
+                            help="Write the full report as JSON ('-' for stdout).")
+        parser.add_argument('--baseline', default=str(runner.BASELINE_PATH))
+        parser.add_argument('--update-baseline', action='store_true',
+                            help='Store this run as the baseline for its scale.')
+        parser.add_argument('--time-tolerance', type=float, default=0.5,
+                            help='Allowed fractional slowdown of median time (default 0.5).')
+
+    def handle(self, *args, **options):
+        missing = uncovered_url_names()
+        if missing:
+            raise CommandError(f"No benchmark scenario for: {', '.join(missing)}")
+
+        scenarios = SCENARIOS
+        if options['only']:
+            scenarios = [s for s in SCENARIOS if s.name in options['only']]
+            if not scenarios:
+                raise CommandError('No scenario matches --only.')
+
+        setup_test_environment()
+        old_config = setup_databases(verbosity=0, interactive=False, aliases={'default'})
+        try:
+            with tempfile.TemporaryDirectory() as media_root, override_settings(
+                MEDIA_ROOT=media_root, JOBS_EXECUTOR='worker', DEBUG=False,
+                REQUEST_METRICS={'ENABLED': False},
+            ):
+                get_cache().clear()
+                self.stderr.write(f"Seeding '{options['scale']}' campus...")
+                campus = seed_campus(**SCALES[options['scale']])
+                results = runner.run_all(scenarios, campus, repeat=options['repeat'])
+                report = {'meta': runner.metadata(options['scale']), 'results': results}
+        finally:
+            connection.close()
+            teardown_databases(old_config, verbosity=0)
+            teardown_test_environment()
+
+        self.print_table(results)
+        if options['json'] == '-':
+            json.dump(report, sys.stdout, indent=2)
+            sys.stdout.write('\n')
+        elif options['json']:
+            with open(options['json'], 'w') as fh:
+                json.dump(report, fh, indent=2)
+
+        if options['update_baseline']:
+            runner.save_baseline(report, options['baseline'])
+            self.stdout.write(self.style.SUCCESS(f"Baseline for '{options['scale']}' updated."))
+            return
+
+        baseline = runner.load_baselines(options['baseline']).get(options['scale'])
+        if not baseline:
+            self.stdout.write(self.style.WARNING(
+                f"No '{options['scale']}' baseline stored; run with --update-baseline."
+            ))
+            return
+        problems = runner.compare(results, baseline['results'], options['time_tolerance'])
+        if problems:
+            for problem in problems:
+                self.stdout.write(self.style.ERROR(f"  {problem}"))
+            raise CommandError(f"{len(problems)} regression(s) against the stored baseline.")
+        self.stdout.write(self.style.SUCCESS('No regressions against the stored baseline.'))
+
+    def print_table(self, results):
+        self.stdout.write(f"{'scenario':<28}{'status':>8}{'queries':>9}{'median ms':>11}{'p95 ms':>9}{'bytes':>10}")
+        for name, row in results.items():
+            self.stdout.write(
+                f"{name:<28}{'/'.join(map(str, row['status'])):>8}{row['queries']:>9}"
+                f"{row['time_ms']['median']:>11}{row['time_ms']['p95']:>9}{row['bytes']:>10}"
+            )
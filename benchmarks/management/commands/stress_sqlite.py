@@ -0,0 +1,74 @@
+import json
+import os
+import tempfile
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, connections
+from django.test.utils import (
+    override_settings, setup_databases, setup_test_environment,
+    teardown_databases, teardown_test_environment,
+)
+
+from benchmarks.stress import run_write_stress
+from bingo_project.sqlite.base import DatabaseWrapper as TunedWrapper
+
+
+# Stock SQLite behaviour, for comparison with the tuned backend
+UNTUNED = {
+    'transaction_mode': 'DEFERRED',
+    'lock_retries': 0,
+    'pragmas': {
+        'journal_mode': 'DELETE', 'synchronous': 'FULL', 'busy_timeout': 5000,
+        'cache_size': -2000, 'mmap_size': 0, 'temp_store': 'DEFAULT',
+    },
+}
+
+
+class Command(BaseCommand):
+    help = (
+        "Hammers a throwaway SQLite file database with concurrent chat "
+        "messages and new listings, and reports throughput, latency and "
+        "lock failures. Exits non-zero if any write failed or went missing."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--threads', type=int, default=16)
+        parser.add_argument('--writes', type=int, default=50, help='Writes per thread.')
+        parser.add_argument('--untuned', action='store_true',
+                            help='Use stock SQLite settings (rollback journal, deferred '
+                                 'transactions, no retries) to compare against.')
+        parser.add_argument('--json', action='store_true', help='Print the report as JSON.')
+
+    def handle(self, *args, **options):
+        if not isinstance(connections['default'], TunedWrapper):
+            raise CommandError("DATABASES['default'] must use the 'bingo_project.sqlite' engine.")
+
+        with tempfile.TemporaryDirectory() as tmp:
+            connection.settings_dict['TEST']['NAME'] = os.path.join(tmp, 'stress.sqlite3')
+            if options['untuned']:
+                connection.settings_dict['OPTIONS'] = UNTUNED
+            setup_test_environment()
+            old_config = setup_databases(verbosity=0, interactive=False, aliases={'default'})
+            try:
+                with override_settings(JOBS_EXECUTOR='worker', REQUEST_METRICS={'ENABLED': False}):
+                    report = run_write_stress(options['threads'], options['writes'])
+            finally:
+                connection.close()
+                teardown_databases(old_config, verbosity=0)
+                teardown_test_environment()
+
+        if options['json']:
+            self.stdout.write(json.dumps(report, indent=2))
+        else:
+            latency = report['latency_ms']
+            self.stdout.write(
+                f"{report['threads']} threads, {report['writes']} writes in {report['seconds']}s "
+                f"({report['writes_per_second']}/s); latency median {latency['median']} ms, "
+                f"p95 {latency['p95']} ms, max {latency['max']} ms"
+            )
+            for error in report['errors']:
+                self.stdout.write(self.style.ERROR(f"  {error}"))
+
+        if report['failed'] or report['lost']:
+            raise CommandError(f"{report['failed']} failed and {report['lost']} lost write(s).")
+        self.stdout.write(self.style.SUCCESS('No failed writes.'))
@@ -0,0 +1,184 @@
+"""
+Drives benchmark scenarios through the test client and compares the
+measurements with stored baselines.
+"""
+import json
+import statistics
+import subprocess
+import time
+from pathlib import Path
+
+import django
+from django.conf import settings
+from django.contrib.auth.middleware import AuthenticationMiddleware
+from django.contrib.sessions.middleware import SessionMiddleware
+from django.db import connection
+from django.test import Client, RequestFactory
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from marketplace.analytics import view_buffer
+
+
+BASELINE_PATH = Path(__file__).resolve().parent / 'baselines.json'
+
+# Timing noise below this many milliseconds is never reported
+TIME_FLOOR_MS = 5
+BYTES_TOLERANCE = 0.10
+
+
+def _percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[min(int(len(ordered) * fraction), len(ordered) - 1)]
+
+
+def _body_size(response):
+    if response.streaming:
+        return sum(len(chunk) for chunk in response.streaming_content)
+    return len(response.content)
+
+
+def run_scenario(scenario, campus, repeat=5):
+    """Runs one warm-up request plus ``repeat`` measured ones."""
+    users = {'seller': campus.seller, 'buyer': campus.buyer, 'staff': campus.staff}
+    timings, queries, sizes, statuses = [], [], [], set()
+
+    for attempt in range(repeat + 1):
+        client = Client()
+        if scenario.user:
+            client.force_login(users[scenario.user])
+        path, params, data = scenario.build(campus)
+        headers = scenario.get_headers(campus)
+        # Buffered view counts are written by whichever request comes due;
+        # flush here so that cost never lands inside a measurement
+        view_buffer.flush()
+        send = getattr(client, scenario.method)
+        payload = params if scenario.method == 'get' else {**data, **params}
+
+        with CaptureQueriesContext(connection) as captured:
+            started = time.perf_counter()
+            response = send(path, payload, headers=headers)
+            size = _body_size(response)
+            elapsed = (time.perf_counter() - started) * 1000
+
+        if attempt == 0:
+            continue  # warm-up: populates caches and lazy imports
+        timings.append(elapsed)
+        queries.append(len(captured))
+        sizes.append(size)
+        statuses.add(response.status_code)
+
+    return {
+        'url': scenario.url_name,
+        'method': scenario.method.upper(),
+        'status': sorted(statuses),
+        'queries': max(queries),
+        'time_ms': {
+            'min': round(min(timings), 2),
+            'median': round(statistics.median(timings), 2),
+            'p95': round(_percentile(timings, 0.95), 2),
+        },
+        'bytes': max(sizes),
+    }
+
+
+def measure_auth(campus, repeat=5):
+    """
+    What every signed-in request pays before its view runs: loading the
+    session and the user, and reading the fields the navbar shows.
+    Reported alongside the scenarios as ``auth_overhead``.
+    """
+    client = Client()
+    client.force_login(campus.buyer)
+    session_key = client.cookies[settings.SESSION_COOKIE_NAME].value
+    session_middleware = SessionMiddleware(lambda request: None)
+    auth_middleware = AuthenticationMiddleware(lambda request: None)
+    timings, queries = [], []
+
+    for attempt in range(repeat + 1):
+        request = RequestFactory().get('/')
+        request.COOKIES[settings.SESSION_COOKIE_NAME] = session_key
+        with CaptureQueriesContext(connection) as captured:
+            started = time.perf_counter()
+            session_middleware.process_request(request)
+            auth_middleware.process_request(request)
+            user = request.user
+            assert user.is_authenticated
+            (user.pk, user.email, user.get_full_name(), user.profile_picture, user.is_staff)
+            elapsed = (time.perf_counter() - started) * 1000
+        if attempt:
+            timings.append(elapsed)
+            queries.append(len(captured))
+
+    return {
+        'url': None,
+        'method': 'GET',
+        'status': [200],
+        'queries': max(queries),
+        'time_ms': {
+            'min': round(min(timings), 3),
+            'median': round(statistics.median(timings), 3),
+            'p95': round(_percentile(timings, 0.95), 3),
+        },
+        'bytes': 0,
+    }
+
+
+def run_all(scenarios, campus, repeat=5):
+    results = {scenario.name: run_scenario(scenario, campus, repeat) for scenario in scenarios}
+    results['auth_overhead'] = measure_auth(campus, repeat)
+    return results
+
+
+def metadata(scale):
+    try:
+        commit = subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True, check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {
+        'commit': commit,
+        'created_at': timezone.now().isoformat(),
+        'scale': scale,
+        'django': django.get_version(),
+        'database': connection.vendor,
+    }
+
+
+def compare(results, baseline, time_tolerance=0.5):
+    """
+    Lists regressions against ``baseline`` results: any extra query,
+    responses more than 10% larger, or a median time more than
+    ``time_tolerance`` (fractional) slower.
+    """
+    problems = []
+    for name, current in results.items():
+        before = baseline.get(name)
+        if before is None:
+            continue
+        if current['queries'] > before['queries']:
+            problems.append(f"{name}: {before['queries']} -> {current['queries']} queries")
+        if current['bytes'] > before['bytes'] * (1 + BYTES_TOLERANCE):
+            problems.append(f"{name}: response grew {before['bytes']} -> {current['bytes']} bytes")
+        old_ms, new_ms = before['time_ms']['median'], current['time_ms']['median']
+        if new_ms > old_ms * (1 + time_tolerance) and new_ms - old_ms > TIME_FLOOR_MS:
+            problems.append(f"{name}: median {old_ms} -> {new_ms} ms")
+        if any(status >= 400 for status in current['status']):
+            problems.append(f"{name}: HTTP {current['status']}")
+    return problems
+
+
+def load_baselines(path=BASELINE_PATH):
+    path = Path(path)
+    if not path.exists():
+        return {}
+    return json.loads(path.read_text())
+
+
+def save_baseline(report, path=BASELINE_PATH):
+    """Stores ``report`` as the baseline for its scale, keeping the others."""
+    path = Path(path)
+    baselines = load_baselines(path)
+    baselines[report['meta']['scale']] = report
+    path.write_text(json.dumps(baselines, indent=2, sort_keys=True) + '\n')
@@ -0,0 +1,159 @@
+"""
+One benchmark scenario per view (and a few per hot view), driven
+through the test client against a seeded ``Campus``.
+"""
+import io
+
+from django.test import Client
+from django.urls import get_resolver, reverse
+
+
+# URL confs whose every named route must have at least one scenario
+URLCONFS = {
+    'marketplace': 'marketplace.urls',
+    'chat': 'chat.urls',
+    'accounts': 'accounts.urls',
+}
+
+
+class Scenario:
+    """
+    ``kwargs``, ``query``, ``data`` and ``headers`` may be callables taking
+    the campus; they are evaluated before every request, outside the
+    measured time.
+    """
+
+    def __init__(self, name, url_name, kwargs=None, query=None, user=None,
+                 method='get', data=None, headers=None):
+        self.name = name
+        self.url_name = url_name
+        self.kwargs = kwargs
+        self.query = query
+        self.user = user
+        self.method = method
+        self.data = data
+        self.headers = headers
+
+    def _resolve(self, value, campus):
+        return value(campus) if callable(value) else (value or {})
+
+    def build(self, campus):
+        """Returns ``(path, query_params, post_data)`` for the next request."""
+        path = reverse(self.url_name, kwargs=self._resolve(self.kwargs, campus))
+        return path, self._resolve(self.query, campus), self._resolve(self.data, campus)
+
+    def get_headers(self, campus):
+        return self._resolve(self.headers, campus)
+
+
+def product(campus):
+    return {'pk': campus.product.pk}
+
+
+def room(campus):
+    return {'room_pk': campus.room.pk}
+
+
+def import_file(campus, rows=100):
+    """A fresh in-memory CSV upload of ``rows`` listings."""
+    lines = ['title,description,price,condition,category,location']
+    lines += [
+        f'Society sale item {i},Donated for the thrift drive,{i % 40 + 1}.00,good,'
+        f'{campus.category.slug},Student Union'
+        for i in range(rows)
+    ]
+    upload = io.BytesIO('\n'.join(lines).encode())
+    upload.name = 'listings.csv'
+    return {'file': upload}
+
+
+def revalidating(url_name, user, kwargs=None):
+    """Headers replaying the current ETag of a page, as a browser revisiting it would."""
+    def headers(campus):
+        client = Client()
+        client.force_login(getattr(campus, user))
+        path = reverse(url_name, kwargs=kwargs(campus) if kwargs else None)
+        return {'If-None-Match': client.get(path)['ETag']}
+    return headers
+
+
+def latest_message_id(campus):
+    return campus.room.messages.order_by('-pk').values_list('pk', flat=True).first()
+
+
+def oldest_hot_message_id(campus):
+    """Scrolling back from here reads only archived history."""
+    return campus.room.messages.order_by('pk').values_list('pk', flat=True).first()
+
+
+SCENARIOS = [
+    # ── marketplace ──────────────────────────
+    Scenario('landing', 'marketplace:landing'),
+    Scenario('product_list', 'marketplace:product_list', user='buyer'),
+    Scenario('product_list_not_modified', 'marketplace:product_list', user='buyer',
+             headers=revalidating('marketplace:product_list', 'buyer')),
+    Scenario('product_list_search', 'marketplace:product_list', user='buyer',
+             query={'q': 'calculus textbook'}),
+    Scenario('product_list_category', 'marketplace:product_list', user='buyer',
+             query=lambda c: {'category': c.category.slug, 'sort': 'price_low'}),
+    Scenario('product_list_facets', 'marketplace:product_list', user='buyer',
+             query={'condition': 'good', 'price': '10-25', 'posted': 'month'}),
+    Scenario('product_feed', 'marketplace:product_feed', query={'limit': 50}),
+    Scenario('my_listings', 'marketplace:my_listings', user='seller'),
+    Scenario('my_listings_all_page_2', 'marketplace:my_listings', user='seller',
+             query={'tab': 'all', 'page': 2}),
+    Scenario('product_create', 'marketplace:product_create', user='seller'),
+    Scenario('product_import', 'marketplace:product_import', user='seller'),
+    Scenario('product_import_post', 'marketplace:product_import', user='seller', method='post',
+             data=import_file),
+    Scenario('product_export', 'marketplace:product_export', user='seller'),
+    Scenario('product_export_all', 'marketplace:product_export', user='staff',
+             query={'scope': 'all', 'format': 'jsonl'}),
+    Scenario('product_detail', 'marketplace:product_detail', kwargs=product, user='buyer'),
+    Scenario('product_detail_not_modified', 'marketplace:product_detail', kwargs=product, user='buyer',
+             headers=revalidating('marketplace:product_detail', 'buyer', product)),
+    Scenario('product_edit', 'marketplace:product_edit', kwargs=product, user='seller'),
+    Scenario('product_delete', 'marketplace:product_delete', kwargs=product, user='seller'),
+    Scenario('product_delete_post', 'marketplace:product_delete', user='seller', method='post',
+             kwargs=lambda c: {'pk': c.disposable_product().pk}),
+    Scenario('mark_as_sold', 'marketplace:mark_as_sold', kwargs=product, user='seller',
+             method='post'),
+    Scenario('delete_image', 'marketplace:delete_image', user='seller', method='post',
+             kwargs=lambda c: {'image_id': c.disposable_image().pk}),
+    Scenario('image_derivative', 'marketplace:image_derivative',
+             kwargs=lambda c: {'image_id': c.image.pk, 'size': 'card'}),
+
+    # ── chat ─────────────────────────────────
+    Scenario('inbox', 'chat:inbox', user='seller'),
+    Scenario('inbox_not_modified', 'chat:inbox', user='seller',
+             headers=revalidating('chat:inbox', 'seller')),
+    Scenario('start_chat', 'chat:start_chat', user='buyer',
+             kwargs=lambda c: {'product_pk': c.product.pk}),
+    Scenario('chat_room', 'chat:chat_room', kwargs=room, user='buyer'),
+    Scenario('chat_room_send', 'chat:chat_room', kwargs=room, user='buyer', method='post',
+             data={'body': 'Is this still available?'}, headers={'Accept': 'application/json'}),
+    Scenario('room_messages_older', 'chat:room_messages', kwargs=room, user='buyer',
+             query=lambda c: {'before': latest_message_id(c)}),
+    Scenario('room_messages_archived', 'chat:room_messages', kwargs=room, user='buyer',
+             query=lambda c: {'before': oldest_hot_message_id(c)}),
+    Scenario('room_messages_poll', 'chat:room_messages', kwargs=room, user='buyer',
+             query=lambda c: {'after': latest_message_id(c)}),
+
+    # ── accounts ─────────────────────────────
+    Scenario('register', 'accounts:register'),
+    Scenario('login', 'accounts:login'),
+    Scenario('logout', 'accounts:logout', user='buyer', method='post'),
+    Scenario('profile', 'accounts:profile', user='buyer'),
+]
+
+
+def uncovered_url_names(scenarios=SCENARIOS):
+    """Named routes in ``URLCONFS`` that no scenario exercises."""
+    covered = {scenario.url_name for scenario in scenarios}
+    missing = []
+    for namespace, urlconf in URLCONFS.items():
+        for pattern in get_resolver(urlconf).url_patterns:
+            name = f'{namespace}:{pattern.name}'
+            if pattern.name and name not in covered:
+                missing.append(name)
+    return missing
@@ -0,0 +1,182 @@
+"""
+Synthetic campus data for the view benchmarks.
+
+Everything is bulk-inserted, so model signals never fire; the derived
+tables they normally maintain (search index, category counts, cover images,
+related listings, unread counters) are rebuilt once at the end instead.
+"""
+import random
+from decimal import Decimal
+from io import BytesIO
+
+from django.contrib.auth.hashers import make_password
+from django.core.files.base import ContentFile
+from django.db.models import OuterRef, Subquery
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+from PIL import Image
+
+from accounts.models import User
+from chat.archive import archive_room, get_config as archive_config
+from chat.models import ChatRoom, Message, UnreadCounter
+from marketplace.images import DERIVATIVE_SIZES
+from marketplace.models import Category, Product, ProductImage
+from marketplace.recommendations import refresh_recommendations
+from marketplace.search import get_backend
+
+
+SCALES = {
+    # name -> users, products, images per product, rooms, messages per room
+    'tiny': dict(users=20, products=120, images=2, rooms=12, messages=30),
+    'small': dict(users=200, products=2000, images=2, rooms=100, messages=60),
+    'full': dict(users=1500, products=30000, images=3, rooms=600, messages=200),
+}
+BATCH_SIZE = 2000
+PASSWORD = 'bench-password'
+
+CATEGORIES = [
+    ('Textbooks', 'bi-book'), ('Electronics', 'bi-laptop'), ('Furniture', 'bi-lamp'),
+    ('Clothing', 'bi-bag'), ('Bikes', 'bi-bicycle'), ('Tickets', 'bi-ticket'),
+    ('Kitchen', 'bi-cup-hot'), ('Sports', 'bi-trophy'), ('Music', 'bi-music-note'),
+    ('Stationery', 'bi-pencil'), ('Games', 'bi-controller'), ('Other', 'bi-box'),
+]
+ADJECTIVES = ['Used', 'Barely used', 'Vintage', 'Compact', 'Heavy duty', 'Mint', 'Cheap', 'Spare']
+ITEMS = [
+    'calculus textbook', 'chemistry lab coat', 'desk lamp', 'mini fridge', 'road bike',
+    'graphing calculator', 'gaming monitor', 'office chair', 'acoustic guitar', 'rice cooker',
+    'hoodie', 'basketball', 'concert ticket', 'mechanical keyboard', 'bookshelf', 'kettle',
+]
+LOCATIONS = ['North Hall', 'Library', 'Engineering Block', 'Student Union', 'East Dorms', 'Gym']
+MESSAGES = [
+    'Is this still available?', 'Yes it is!', 'Would you take less?', 'Can we meet at the library?',
+    'What condition is it in exactly?', 'Sounds good, see you at 5.', 'Thanks!',
+]
+
+
+class Campus:
+    """Seeded data plus the ids the benchmark scenarios run against."""
+
+    def __init__(self, seller, buyer, staff, product, image, room, category):
+        self.seller = seller
+        self.buyer = buyer
+        self.staff = staff
+        self.product = product
+        self.image = image
+        self.room = room
+        self.category = category
+
+    def disposable_product(self):
+        """A fresh listing of the seller's, for scenarios that delete one."""
+        return Product.objects.create(
+            title='Disposable listing', description='Benchmark', price=1,
+            seller=self.seller, category=self.category,
+        )
+
+    def disposable_image(self):
+        return ProductImage.objects.create(product=self.product, image='product_images/bench/spare.jpg')
+
+
+def _derivatives(n):
+    return {
+        size: {'name': f'product_images/derivatives/bench{n:06d}-{size}.webp', 'width': edge, 'height': edge}
+        for size, edge in DERIVATIVE_SIZES.items()
+    }
+
+
+def seed_campus(users, products, images, rooms, messages, seed=1):
+    """Populates an empty database and returns a ``Campus``."""
+    rng = random.Random(seed)
+    password = make_password(PASSWORD)
+
+    categories = Category.objects.bulk_create([
+        Category(name=name, slug=name.lower(), icon=icon) for name, icon in CATEGORIES
+    ])
+    people = User.objects.bulk_create([
+        User(
+            username=f'student{i}', email=f'student{i}@college.edu', password=password,
+            first_name=f'Student{i}', last_name='Bench', college_name='State University',
+        )
+        for i in range(users)
+    ], batch_size=BATCH_SIZE)
+    seller, buyer, staff = people[0], people[1], people[2]
+    staff.is_staff = True
+    User.objects.filter(pk=staff.pk).update(is_staff=True)
+
+    # The benchmark seller owns a dashboard-sized share of the catalog
+    seller_share = max(products // 100, 20)
+    listings = []
+    for i in range(products):
+        listings.append(Product(
+            title=f'{rng.choice(ADJECTIVES)} {rng.choice(ITEMS)}',
+            description=' '.join(rng.choices(ITEMS + LOCATIONS, k=12)),
+            price=Decimal(rng.randint(100, 50000)) / 100,
+            condition=rng.choice(Product.CONDITION_CHOICES)[0],
+            seller=seller if i < seller_share else rng.choice(people[2:]),
+            category=rng.choice(categories),
+            is_sold=rng.random() < 0.1,
+            is_active=rng.random() > 0.03,
+            location=rng.choice(LOCATIONS),
+        ))
+    listings = Product.objects.bulk_create(listings, batch_size=BATCH_SIZE)
+
+    ProductImage.objects.bulk_create([
+        ProductImage(
+            product=product, image=f'product_images/bench/{n:06d}.jpg',
+            content_hash=f'{n:064d}', derivatives=_derivatives(n),
+        )
+        for n, product in enumerate(p for p in listings for _ in range(images))
+    ], batch_size=BATCH_SIZE)
+    Product.refresh_cover_images()
+
+    product = next(p for p in listings if p.seller_id == seller.pk and p.is_active and not p.is_sold)
+
+    chat_rooms = [ChatRoom(product=product, buyer=buyer, seller=seller)]
+    buyers = people[2:]
+    for other in rng.sample(listings, min(rooms - 1, len(listings))):
+        chat_rooms.append(ChatRoom(
+            product=other, buyer=rng.choice([p for p in buyers[:50] if p.pk != other.seller_id]),
+            seller_id=other.seller_id,
+        ))
+    chat_rooms = ChatRoom.objects.bulk_create(chat_rooms, batch_size=BATCH_SIZE, ignore_conflicts=True)
+    chat_rooms = list(ChatRoom.objects.order_by('pk'))
+
+    history = []
+    for room in chat_rooms:
+        for i in range(messages):
+            history.append(Message(
+                room=room, sender_id=room.buyer_id if i % 2 == 0 else room.seller_id,
+                body=rng.choice(MESSAGES),
+            ))
+            if len(history) >= BATCH_SIZE:
+                Message.objects.bulk_create(history)
+                history = []
+    Message.objects.bulk_create(history)
+    # Both sides have read all but the last three messages of each room
+    read_through = Coalesce(Subquery(
+        Message.objects.filter(room=OuterRef('pk')).order_by('-pk').values('pk')[3:4]
+    ), 0)
+    ChatRoom.objects.update(buyer_read_through=read_through, seller_read_through=read_through)
+    # The benchmark room's older history is archived, so scrolling back
+    # into the archive has scenarios too
+    archive_room(
+        chat_rooms[0], cutoff=timezone.now(),
+        keep_recent=min(archive_config()['KEEP_RECENT'], messages // 2),
+    )
+
+    Category.reconcile_active_counts()
+    refresh_recommendations()
+    get_backend().rebuild(
+        Product.objects.filter(is_active=True, is_sold=False).order_by('pk'), batch_size=1000,
+    )
+    participants = {room.buyer_id for room in chat_rooms} | {room.seller_id for room in chat_rooms}
+    for user_id in participants:
+        UnreadCounter.recompute(user_id)
+
+    # One real photo so the lazy rendition view has something to render
+    buffer = BytesIO()
+    Image.new('RGB', (1600, 1200), (200, 120, 40)).save(buffer, 'JPEG')
+    image = ProductImage(product=product)
+    image.image.save('bench-original.jpg', ContentFile(buffer.getvalue()), save=False)
+    image.save()
+
+    return Campus(seller, buyer, staff, product, image, chat_rooms[0], product.category)
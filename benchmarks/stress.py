@@ -0,0 +1,96 @@
+"""
+Concurrent write stress for the database backend.
+
+Many threads post chat messages and create listings at the same moment,
+each on its own connection, as a threaded server does under load. Run
+it on a file database: the in-memory test database uses a shared cache
+and exercises neither WAL nor the busy handler.
+"""
+import threading
+import time
+from decimal import Decimal
+
+from django.db import OperationalError, connection
+
+from accounts.models import User
+from chat.models import ChatRoom, Message
+from marketplace.models import Product
+from .runner import _percentile
+
+
+def run_write_stress(threads=16, writes=50):
+    """
+    Runs ``threads`` writers of ``writes`` rows each — alternately a
+    message in the writer's own chat room and a new listing — and
+    returns throughput, latency and failure counts.
+    """
+    seller = User.objects.create_user(
+        email='stress-seller@college.edu', username='stress-seller', password=None,
+    )
+    product = Product.objects.create(title='Stress lamp', description='', price=5, seller=seller)
+    rooms = [
+        ChatRoom.objects.create(
+            product=product, seller=seller,
+            buyer=User.objects.create_user(
+                email=f'stress-{n}@college.edu', username=f'stress-{n}', password=None,
+            ),
+        )
+        for n in range(threads)
+    ]
+
+    start = threading.Barrier(threads)
+    lock = threading.Lock()
+    latencies, errors = [], []
+    sent = listed = 0
+
+    def writer(room):
+        nonlocal sent, listed
+        try:
+            start.wait()
+            for i in range(writes):
+                began = time.perf_counter()
+                try:
+                    if i % 2:
+                        Product.objects.create(
+                            title=f'Stress listing {room.pk}-{i}', description='',
+                            price=Decimal(i), seller=room.buyer,
+                        )
+                    else:
+                        room.post_message(room.buyer, f'Stress message {i}')
+                except OperationalError as exc:
+                    with lock:
+                        errors.append(str(exc))
+                    continue
+                with lock:
+                    latencies.append((time.perf_counter() - began) * 1000)
+                    if i % 2:
+                        listed += 1
+                    else:
+                        sent += 1
+        finally:
+            connection.close()
+
+    workers = [threading.Thread(target=writer, args=(room,)) for room in rooms]
+    began = time.perf_counter()
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    elapsed = time.perf_counter() - began
+
+    stored_messages = Message.objects.filter(room__in=rooms).count()
+    stored_listings = Product.objects.filter(title__startswith='Stress listing').count()
+    return {
+        'threads': threads,
+        'writes': threads * writes,
+        'failed': len(errors),
+        'lost': (sent - stored_messages) + (listed - stored_listings),
+        'seconds': round(elapsed, 2),
+        'writes_per_second': round(len(latencies) / elapsed, 1) if elapsed else 0,
+        'latency_ms': {
+            'median': round(_percentile(latencies, 0.5), 1) if latencies else 0,
+            'p95': round(_percentile(latencies, 0.95), 1) if latencies else 0,
+            'max': round(max(latencies, default=0), 1),
+        },
+        'errors': sorted(set(errors)),
+    }
@@ -0,0 +1,90 @@
+import os
+import subprocess
+import sys
+import tempfile
+from pathlib import Path
+
+from django.db import connection
+from django.test import SimpleTestCase, TestCase, override_settings
+
+from bingo_project.sqlite.base import Database, DatabaseWrapper, retry_on_lock
+
+from . import runner
+from .scenarios import SCENARIOS, uncovered_url_names
+from .seed import SCALES, seed_campus
+
+
+class ViewBenchmarkTests(TestCase):
+    """
+    Runs every scenario on the 'tiny' campus and fails if a view issues
+    more queries than its stored baseline (e.g. a template added an N+1).
+    Timings are left to ``manage.py benchmark_views``.
+    """
+
+    def setUp(self):
+        media_root = tempfile.TemporaryDirectory()
+        self.addCleanup(media_root.cleanup)
+        settings = override_settings(MEDIA_ROOT=media_root.name, JOBS_EXECUTOR='worker')
+        settings.enable()
+        self.addCleanup(settings.disable)
+
+    def test_every_url_has_a_scenario(self):
+        self.assertEqual(uncovered_url_names(), [])
+
+    def test_query_counts_within_baseline(self):
+        baseline = runner.load_baselines()['tiny']['results']
+        campus = seed_campus(**SCALES['tiny'])
+        results = runner.run_all(SCENARIOS, campus, repeat=1)
+
+        for name, row in results.items():
+            with self.subTest(scenario=name):
+                self.assertTrue(all(status < 400 for status in row['status']), row['status'])
+                self.assertLessEqual(row['queries'], baseline[name]['queries'])
+
+
+class SQLiteBackendTests(SimpleTestCase):
+    databases = {'default'}
+
+    def test_connections_are_tuned(self):
+        self.assertEqual(connection.transaction_mode, 'IMMEDIATE')
+        with connection.cursor() as cursor:
+            cursor.execute('PRAGMA busy_timeout')
+            self.assertEqual(cursor.fetchone()[0], 5000)
+            cursor.execute('PRAGMA synchronous')
+            self.assertEqual(cursor.fetchone()[0], 1)  # NORMAL
+
+    def test_file_databases_use_wal(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            wrapper = DatabaseWrapper({**connection.settings_dict, 'NAME': os.path.join(tmp, 'wal.sqlite3')})
+            try:
+                with wrapper.cursor() as cursor:
+                    cursor.execute('PRAGMA journal_mode')
+                    self.assertEqual(cursor.fetchone()[0], 'wal')
+            finally:
+                wrapper.close()
+
+    def test_retries_only_lock_errors(self):
+        attempts = []
+
+        def flaky(error):
+            attempts.append(error)
+            if len(attempts) < 3:
+                raise Database.OperationalError(error)
+            return 'ok'
+
+        self.assertEqual(retry_on_lock(flaky, 'database is locked', delay=0), 'ok')
+        self.assertEqual(len(attempts), 3)
+
+        attempts.clear()
+        with self.assertRaises(Database.OperationalError):
+            retry_on_lock(flaky, 'no such table: x', delay=0)
+        self.assertEqual(len(attempts), 1)
+
+    def test_concurrent_writers_never_fail(self):
+        """Runs in a subprocess: the stress test needs its own file database."""
+        result = subprocess.run(
+            [sys.executable, 'manage.py', 'stress_sqlite', '--threads', '8', '--writes', '20'],
+            cwd=Path(__file__).resolve().parent.parent, capture_output=True, text=True, timeout=300,
+        )
+        self.assertEqual(result.returncode, 0, result.stdout + result.stderr)
+        self.assertIn('No failed writes.', result.stdout)
@@ -2,15 +2,42 @@
 ASGI config for bingo_project project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
+HTTP requests go to Django; WebSocket connections under ``/ws/chat/``
+are handled by ``chat.consumers.ChatSocket``.
 
 For more information on this file, see
 https://docs.djangoproject.com/en/6.0/howto/deployment/asgi/
 """
 
+import logging
 import os
 
 from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'bingo_project.settings')
+# Read by settings: persistent connections default to off under ASGI
+os.environ['DJANGO_ASGI'] = '1'
 
-application = get_asgi_application()
+django_application = get_asgi_application()
+
+from django.conf import settings  # noqa: E402
+
+persistent = [alias for alias, db in settings.DATABASES.items() if db.get('CONN_MAX_AGE')]
+if persistent:
+    logging.getLogger(__name__).warning(
+        "CONN_MAX_AGE is set for %s under ASGI; executor threads will each keep "
+        "a connection open. Use CONN_MAX_AGE=0 (or a database connection pool).",
+        ', '.join(persistent),
+    )
+
+# Imported after Django is set up — the consumer touches models
+from chat.consumers import ChatSocket  # noqa: E402
+
+chat_socket = ChatSocket()
+
+
+async def application(scope, receive, send):
+    if scope['type'] == 'websocket':
+        await chat_socket(scope, receive, send)
+    else:
+        await django_application(scope, receive, send)
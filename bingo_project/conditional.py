@@ -0,0 +1,81 @@
+"""
+Conditional GET (ETag / Last-Modified) for server-rendered pages.
+
+``ConditionalGetMixin`` answers a repeat visit with ``304 Not Modified``
+before the view runs its queries or renders a template. Views return a
+few cheap validators from ``get_etag_parts()`` — the catalog version, an
+``updated_at``, a row count — and may add ``get_last_modified()``.
+
+Pages also show who is looking (navbar, unread badge, CSRF token), so
+every ETag covers the viewer as well. ETags are weak: the masked CSRF
+token makes two renders of the same page differ byte-for-byte.
+"""
+import hashlib
+import time
+
+from django.conf import settings
+from django.contrib.messages import get_messages
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date
+
+from .context_processors import unread_messages_count
+
+
+class ConditionalGetMixin:
+    """
+    Validates GET/HEAD requests against ``get_etag_parts()`` before
+    dispatching. Place before ``View`` in the bases.
+    """
+    # Relative times ("5 minutes ago") drift while the data stands still,
+    # so validators also roll over every ``etag_lifetime`` seconds.
+    etag_lifetime = 300
+
+    def get_etag_parts(self, request, *args, **kwargs):
+        """Values that change whenever the page would; None skips validation."""
+        raise NotImplementedError
+
+    def get_last_modified(self, request, *args, **kwargs):
+        return None
+
+    def get_viewer_parts(self, request):
+        user = request.user
+        return [
+            user.pk,
+            unread_messages_count(request)['unread_messages_count'],
+            request.META.get('CSRF_COOKIE', ''),
+        ]
+
+    def make_etag(self, request, parts):
+        parts = [*parts, *self.get_viewer_parts(request), int(time.time() // self.etag_lifetime)]
+        digest = hashlib.md5('|'.join(map(str, parts)).encode()).hexdigest()
+        return f'W/"{digest}"'
+
+    def dispatch(self, request, *args, **kwargs):
+        if (
+            request.method not in ('GET', 'HEAD')
+            or not getattr(settings, 'CONDITIONAL_GET_ENABLED', True)
+            # A pending flash message has to be rendered, not 304'd away
+            or len(get_messages(request))
+        ):
+            return super().dispatch(request, *args, **kwargs)
+
+        parts = self.get_etag_parts(request, *args, **kwargs)
+        if parts is None:
+            return super().dispatch(request, *args, **kwargs)
+
+        etag = self.make_etag(request, parts)
+        last_modified = self.get_last_modified(request, *args, **kwargs)
+        timestamp = int(last_modified.timestamp()) if last_modified else None
+
+        response = get_conditional_response(request, etag=etag, last_modified=timestamp)
+        if response is None:
+            response = super().dispatch(request, *args, **kwargs)
+            if response.status_code != 200:
+                return response
+
+        response.headers.setdefault('ETag', etag)
+        if timestamp is not None:
+            response.headers.setdefault('Last-Modified', http_date(timestamp))
+        # Personal pages: browsers may keep them but must revalidate
+        patch_cache_control(response, private=True, no_cache=True)
+        return response
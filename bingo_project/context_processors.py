@@ -1,25 +1,14 @@
-from django.db.models import Q
-
-
 def unread_messages_count(request):
     """
     Global context processor — injects unread message count
     into every template so the navbar badge always stays updated.
+    Reads the denormalized per-user counter (cached), so the badge
+    costs one primary-key lookup at most.
     """
     if request.user.is_authenticated:
         try:
-            from chat.models import Message
-            count = Message.objects.filter(
-                room__buyer=request.user,
-                is_read=False
-            ).exclude(sender=request.user).count()
-
-            count += Message.objects.filter(
-                room__seller=request.user,
-                is_read=False
-            ).exclude(sender=request.user).count()
-
-            return {'unread_messages_count': count}
+            from chat.models import UnreadCounter
+            return {'unread_messages_count': UnreadCounter.get_for_user(request.user.pk)}
         except Exception:
             pass
-    return {'unread_messages_count': 0}
\ No newline at end of file
+    return {'unread_messages_count': 0}
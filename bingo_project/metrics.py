@@ -0,0 +1,262 @@
+"""
+Per-request timing and SQL instrumentation.
+
+``RequestMetricsMiddleware`` times a sample of requests and, for those,
+wraps every database execute to record query count, SQL time, repeated
+statements and the slowest queries. Results are aggregated per resolved
+view in a bounded in-process store and exported as JSON or Prometheus
+text by the staff-only ``metrics`` view.
+
+Configure with ``settings.REQUEST_METRICS``::
+
+    REQUEST_METRICS = {
+        'ENABLED': True,
+        'SAMPLE_RATE': 0.05,      # fraction of requests instrumented
+        'BUFFER_SIZE': 200,       # recent samples kept per view
+        'SLOW_QUERIES': 5,        # slowest statements kept per view
+    }
+
+Each worker process keeps its own store; scrape every process (or sum
+the Prometheus series) when running several.
+"""
+import random
+import re
+import threading
+import time
+from collections import Counter, deque
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.db import connections
+
+
+DEFAULTS = {
+    'ENABLED': True,
+    'SAMPLE_RATE': 0.05,
+    'BUFFER_SIZE': 200,
+    'SLOW_QUERIES': 5,
+}
+SQL_PREVIEW_CHARS = 300
+SELECT_LIST = re.compile(r'^SELECT .*? FROM ', re.DOTALL)
+
+
+def get_config():
+    return {**DEFAULTS, **getattr(settings, 'REQUEST_METRICS', {})}
+
+
+# ─────────────────────────────────────────────
+# Query recording
+# ─────────────────────────────────────────────
+
+class QueryRecorder:
+    """``connection.execute_wrapper`` callable that times each statement."""
+
+    def __init__(self):
+        self.statements = []  # (sql, params, seconds)
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.statements.append((sql, params, time.perf_counter() - started))
+
+    @property
+    def count(self):
+        return len(self.statements)
+
+    @property
+    def total_seconds(self):
+        return sum(seconds for _, _, seconds in self.statements)
+
+    def duplicates(self):
+        """Statements run more than once with identical parameters."""
+        counts = Counter((sql, repr(params)) for sql, params, _ in self.statements)
+        return sum(n - 1 for n in counts.values() if n > 1)
+
+    def similar(self):
+        """Statements sharing SQL text but not parameters — the N+1 signature."""
+        counts = Counter(sql for sql, _, _ in self.statements)
+        return {sql: n for sql, n in counts.items() if n > 1}
+
+    def slowest(self, limit):
+        ranked = sorted(self.statements, key=lambda row: row[2], reverse=True)[:limit]
+        return [(sql, seconds) for sql, _, seconds in ranked]
+
+
+# ─────────────────────────────────────────────
+# Aggregation
+# ─────────────────────────────────────────────
+
+def _quantile(values, fraction):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(int(len(ordered) * fraction), len(ordered) - 1)]
+
+
+class ViewStats:
+    """Running totals plus a ring buffer of recent samples for one view."""
+
+    def __init__(self, buffer_size, slow_queries):
+        self.requests = 0
+        self.errors = 0
+        self.seconds = 0.0
+        self.queries = 0
+        self.sql_seconds = 0.0
+        self.duplicates = 0
+        self.repeated = 0
+        self.recent = deque(maxlen=buffer_size)  # (seconds, queries, sql_seconds)
+        self.slow_queries = slow_queries
+        self.slowest = []  # (seconds, sql), longest first
+
+    def add(self, seconds, status, recorder):
+        self.requests += 1
+        self.errors += status >= 500
+        self.seconds += seconds
+        self.queries += recorder.count
+        self.sql_seconds += recorder.total_seconds
+        self.duplicates += recorder.duplicates()
+        self.repeated += sum(n - 1 for n in recorder.similar().values())
+        self.recent.append((seconds, recorder.count, recorder.total_seconds))
+
+        for sql, sql_seconds in recorder.slowest(self.slow_queries):
+            self.slowest.append((sql_seconds, _preview(sql)))
+        self.slowest.sort(reverse=True)
+        del self.slowest[self.slow_queries:]
+
+    def as_dict(self):
+        times = [row[0] for row in self.recent]
+        return {
+            'requests': self.requests,
+            'errors': self.errors,
+            'avg_ms': round(self.seconds / self.requests * 1000, 2),
+            'p50_ms': round(_quantile(times, 0.5) * 1000, 2),
+            'p95_ms': round(_quantile(times, 0.95) * 1000, 2),
+            'max_ms': round(max(times) * 1000, 2) if times else 0.0,
+            'avg_queries': round(self.queries / self.requests, 2),
+            'avg_sql_ms': round(self.sql_seconds / self.requests * 1000, 2),
+            'duplicate_queries': self.duplicates,
+            'repeated_queries': self.repeated,
+            'slowest_queries': [
+                {'ms': round(seconds * 1000, 2), 'sql': sql} for seconds, sql in self.slowest
+            ],
+        }
+
+
+class MetricsStore:
+    """Thread-safe per-view statistics for this process."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._views = {}
+        self.started_at = time.time()
+
+    def record(self, view_name, seconds, status, recorder):
+        config = get_config()
+        with self._lock:
+            stats = self._views.get(view_name)
+            if stats is None:
+                stats = self._views[view_name] = ViewStats(
+                    config['BUFFER_SIZE'], config['SLOW_QUERIES'],
+                )
+            stats.add(seconds, status, recorder)
+
+    def reset(self):
+        with self._lock:
+            self._views.clear()
+            self.started_at = time.time()
+
+    def snapshot(self):
+        with self._lock:
+            views = {name: stats.as_dict() for name, stats in sorted(self._views.items())}
+        return {
+            'since': self.started_at,
+            'sample_rate': get_config()['SAMPLE_RATE'],
+            'views': views,
+        }
+
+    def to_prometheus(self):
+        """Prometheus text exposition format (version 0.0.4)."""
+        with self._lock:
+            items = [(_label(name), stats) for name, stats in sorted(self._views.items())]
+            lines = [
+                '# HELP bingo_request_duration_seconds Wall time of sampled requests.',
+                '# TYPE bingo_request_duration_seconds summary',
+            ]
+            for label, stats in items:
+                times = [row[0] for row in stats.recent]
+                for q in (0.5, 0.95):
+                    lines.append(
+                        f'bingo_request_duration_seconds{{view="{label}",quantile="{q}"}} '
+                        f'{_quantile(times, q):.6f}'
+                    )
+                lines.append(f'bingo_request_duration_seconds_sum{{view="{label}"}} {stats.seconds:.6f}')
+                lines.append(f'bingo_request_duration_seconds_count{{view="{label}"}} {stats.requests}')
+
+            for metric, help_text, value in PROMETHEUS_COUNTERS:
+                lines.append(f'# HELP {metric} {help_text}')
+                lines.append(f'# TYPE {metric} counter')
+                lines += [f'{metric}{{view="{label}"}} {value(stats)}' for label, stats in items]
+        return '\n'.join(lines) + '\n'
+
+
+# metric name, help text, value from ViewStats
+PROMETHEUS_COUNTERS = [
+    ('bingo_request_errors_total', 'Sampled requests that returned a 5xx.',
+     lambda s: s.errors),
+    ('bingo_db_queries_total', 'Queries issued by sampled requests.',
+     lambda s: s.queries),
+    ('bingo_db_duplicate_queries_total', 'Identical queries repeated within a sampled request.',
+     lambda s: s.duplicates),
+    ('bingo_db_repeated_queries_total', 'Same SQL with different parameters within a sampled request (N+1).',
+     lambda s: s.repeated),
+    ('bingo_db_seconds_total', 'SQL time of sampled requests.',
+     lambda s: f'{s.sql_seconds:.6f}'),
+]
+
+
+def _preview(sql):
+    """Drops the column list so the interesting part of the SQL fits."""
+    return SELECT_LIST.sub('SELECT … FROM ', sql, count=1)[:SQL_PREVIEW_CHARS]
+
+
+def _label(value):
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+store = MetricsStore()
+
+
+# ─────────────────────────────────────────────
+# Middleware
+# ─────────────────────────────────────────────
+
+class RequestMetricsMiddleware:
+    """
+    Instruments a random ``SAMPLE_RATE`` share of requests. Unsampled
+    requests pass straight through, so the cost at low rates is one
+    random() call. Place first in MIDDLEWARE to include session and
+    auth queries.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        config = get_config()
+        if not config['ENABLED'] or random.random() >= config['SAMPLE_RATE']:
+            return self.get_response(request)
+
+        recorder = QueryRecorder()
+        started = time.perf_counter()
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(recorder))
+            response = self.get_response(request)
+        elapsed = time.perf_counter() - started
+
+        match = getattr(request, 'resolver_match', None)
+        view_name = match.view_name if match else '<unresolved>'
+        store.record(view_name, elapsed, response.status_code, recorder)
+        return response
@@ -13,6 +13,8 @@ https://docs.djangoproject.com/en/6.0/ref/settings/
 from pathlib import Path
 import os
 
+from .database import parse_database_url
+
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
@@ -45,9 +47,13 @@ INSTALLED_APPS = [
     'accounts',
     'marketplace',
     'chat',
+    'jobs',
+    'benchmarks',
 ]
 
 MIDDLEWARE = [
+    'bingo_project.metrics.RequestMetricsMiddleware',
+    'bingo_project.database.ReplicaRoutingMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -81,19 +87,61 @@ WSGI_APPLICATION = 'bingo_project.wsgi.application'
 # ─────────────────────────────────────────────
 # DATABASE
 # Uses PostgreSQL on Render via DATABASE_URL
-# Falls back to SQLite locally
+# Falls back to SQLite locally, tuned for concurrent writers
+# (WAL, BEGIN IMMEDIATE, retry on lock) by bingo_project.sqlite
 # ─────────────────────────────────────────────
-# SQLite for local development
+# Connections are kept for CONN_MAX_AGE seconds and health-checked
+# before reuse instead of being opened on every request.
+# Not under ASGI (bingo_project.asgi sets DJANGO_ASGI): sync views and
+# socket ORM calls run on executor threads, each of which would keep a
+# connection of its own that is never closed, so Django recommends 0
+# there. bingo_project.asgi warns if it is set anyway.
+RUNNING_ASGI = os.environ.get('DJANGO_ASGI') == '1'
+CONN_MAX_AGE = int(os.environ.get('CONN_MAX_AGE', 0 if RUNNING_ASGI else 60))
+
 DATABASES = {
-    'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
-    }
+    'default': parse_database_url(
+        os.environ.get('DATABASE_URL', f"sqlite:///{BASE_DIR / 'db.sqlite3'}"),
+        conn_max_age=CONN_MAX_AGE,
+    ),
 }
 
+# Optional read replicas, comma separated. To try locally, copy the
+# database and point at the copy:
+#   DATABASE_REPLICA_URLS=sqlite:///replica.sqlite3
+for n, url in enumerate(filter(None, os.environ.get('DATABASE_REPLICA_URLS', '').split(',')), 1):
+    DATABASES[f'replica_{n}'] = parse_database_url(url.strip(), conn_max_age=CONN_MAX_AGE)
+
+# Views marked replica_reads (listing grid, detail, landing) read from
+# a replica; everything else, and any browser that wrote in the last
+# STICKY_SECONDS, stays on the primary (see bingo_project.database).
+READ_REPLICAS = {
+    'ALIASES': [alias for alias in DATABASES if alias != 'default'],
+    'STICKY_SECONDS': 5,
+}
+DATABASE_ROUTERS = ['bingo_project.database.ReplicaRouter']
+
+# Clears every cache before each test (see bingo_project.testing)
+TEST_RUNNER = 'bingo_project.testing.TestRunner'
+
 # Custom User Model — must be set before first migration
 AUTH_USER_MODEL = 'accounts.User'
 
+# request.user loads only the columns every page needs (User.SESSION_FIELDS).
+# Keep a single password-checking backend: each listed one re-hashes the
+# password on every failed login. Sessions signed in through ModelBackend
+# were moved over by accounts migration 0003.
+AUTHENTICATION_BACKENDS = [
+    'accounts.backends.SessionUserBackend',
+]
+
+# Sessions are read from the cache and written through to the database.
+# Needs a shared CACHES backend with several workers, or a logout in one
+# process goes unnoticed by the others until the entry expires.
+# 'django.contrib.sessions.backends.signed_cookies' skips the store
+# entirely, at the cost of not being able to revoke a session server-side.
+SESSION_ENGINE = 'django.contrib.sessions.backends.cached_db'
+
 # Password validation
 # https://docs.djangoproject.com/en/6.0/ref/settings/#auth-password-validators
 
@@ -134,4 +182,62 @@ LOGOUT_REDIRECT_URL = '/accounts/login/'
 
 # College email domains
 # Empty list = allow all emails during development
-ALLOWED_EMAIL_DOMAINS = []  
\ No newline at end of file
+ALLOWED_EMAIL_DOMAINS = []  
+
+# Listing search backend: 'fts5', 'tokens' or 'auto'
+# ('auto' uses SQLite FTS5 when available, else the portable token index)
+SEARCH_BACKEND = 'auto'
+
+# Live chat fan-out for WebSocket clients (served by bingo_project.asgi).
+# Use 'chat.pubsub.SQLiteBroker' when running several ASGI worker processes.
+CHAT_PUBSUB = {
+    'BACKEND': 'chat.pubsub.InMemoryBroker',
+}
+
+# Polling fallback for clients without a WebSocket. Requests are only
+# held open (long-polled) under ASGI; WSGI workers answer immediately
+# and the page polls again after RETRY_AFTER seconds (see chat.views).
+CHAT_POLL = {
+    'MAX_WAIT': 25,
+    'WSGI_MAX_WAIT': 0,
+}
+
+# Background jobs (image resizing, search indexing).
+# 'thread' runs them in-process for development; in production use
+# 'worker' and run `python manage.py run_jobs` alongside the web server.
+JOBS_EXECUTOR = 'thread'
+# Done and failed jobs are deleted this long after they finish (run_jobs --purge)
+JOBS_RETENTION_DAYS = 7
+
+# Per-view timing and SQL stats, served to staff at /admin/metrics/
+# (add ?format=prometheus for scraping). Only SAMPLE_RATE of requests
+# are instrumented, keeping the overhead negligible under load.
+REQUEST_METRICS = {
+    'SAMPLE_RATE': 1.0 if DEBUG else 0.05,
+}
+
+# Chat history older than this moves into compressed per-room archive
+# blocks (run `python manage.py archive_messages` daily; see chat.archive).
+CHAT_ARCHIVE = {
+    'AFTER_DAYS': 90,
+    'CLOSED_AFTER_DAYS': 7,     # rooms whose listing is sold or taken down
+}
+
+# Listing view counts are buffered per process and written in batches
+# (see marketplace.analytics) instead of one UPDATE per page view.
+VIEW_COUNTS = {
+    'FLUSH_INTERVAL': 30,
+}
+
+# ─────────────────────────────────────────────
+# CACHE
+# Local memory is per-process; point this at a shared backend
+# (Redis, Memcached, database) when running several workers.
+# ─────────────────────────────────────────────
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'bingo',
+    }
+}
+CATALOG_CACHE_ALIAS = 'default'
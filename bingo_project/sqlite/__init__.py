@@ -0,0 +1,5 @@
+"""
+SQLite backend tuned for a web server with concurrent writers.
+
+Use ``'ENGINE': 'bingo_project.sqlite'``; see ``base`` for the options.
+"""
@@ -0,0 +1,107 @@
+"""
+Django's SQLite backend with the settings a multi-threaded server needs.
+
+Out of the box every chat send or listing post takes SQLite's single
+writer lock with a rollback journal, so readers block behind writers
+and a deferred transaction that reads first and writes later can fail
+with ``database is locked`` without waiting at all. This wrapper:
+
+* opens every connection with ``PRAGMAS`` — WAL (readers never block
+  the writer or each other), ``synchronous=NORMAL`` (safe under WAL,
+  one fsync per checkpoint instead of per commit), a ``busy_timeout``,
+  a larger page cache and memory-mapped reads;
+* starts ``atomic()`` blocks with ``BEGIN IMMEDIATE``, taking the write
+  lock up front where waiting for it is safe;
+* retries a statement that still finds the database locked, with
+  jittered exponential backoff, when it runs outside a transaction
+  (``BEGIN`` itself, or an autocommit query) and so left nothing behind.
+
+Configure per database::
+
+    'OPTIONS': {
+        'transaction_mode': 'IMMEDIATE',     # the default here
+        'pragmas': {'cache_size': -64000},   # merged over PRAGMAS
+        'lock_retries': 4,
+    }
+"""
+import random
+import time
+
+from django.db.backends.sqlite3 import base
+from django.db.backends.sqlite3.base import Database
+
+
+PRAGMAS = {
+    'journal_mode': 'WAL',
+    'synchronous': 'NORMAL',
+    'busy_timeout': 5000,       # ms SQLite waits for a lock before giving up
+    'cache_size': -20000,       # negative = KiB, so ~20 MB per connection
+    'mmap_size': 128 * 2**20,
+    'temp_store': 'MEMORY',
+}
+LOCK_RETRIES = 4
+RETRY_DELAY = 0.05              # seconds; doubles on each attempt
+
+
+def is_lock_error(exc):
+    """``database is locked`` / ``database table is locked``."""
+    return isinstance(exc, Database.OperationalError) and 'locked' in str(exc)
+
+
+def retry_on_lock(func, *args, retries=LOCK_RETRIES, delay=RETRY_DELAY):
+    """
+    Calls ``func(*args)``, retrying up to ``retries`` times on a lock
+    error after a random pause of up to ``delay * 2**attempt`` seconds,
+    so contending writers don't all wake at once.
+    """
+    for attempt in range(retries + 1):
+        try:
+            return func(*args)
+        except Database.OperationalError as exc:
+            if attempt == retries or not is_lock_error(exc):
+                raise
+            time.sleep(random.uniform(0, delay * 2 ** attempt))
+
+
+class RetryingCursor(base.SQLiteCursorWrapper):
+    lock_retries = LOCK_RETRIES
+
+    def execute(self, query, params=None):
+        if self.connection.in_transaction:
+            # Part of the transaction may already have run; let it fail
+            return super().execute(query, params)
+        return retry_on_lock(super().execute, query, params, retries=self.lock_retries)
+
+    def executemany(self, query, param_list):
+        if self.connection.in_transaction:
+            return super().executemany(query, param_list)
+        return retry_on_lock(super().executemany, query, param_list, retries=self.lock_retries)
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+    def get_connection_params(self):
+        options = self.settings_dict['OPTIONS']
+        kwargs = super().get_connection_params()
+        self.pragmas = {**PRAGMAS, **kwargs.pop('pragmas', {})}
+        self.lock_retries = kwargs.pop('lock_retries', LOCK_RETRIES)
+        if 'transaction_mode' not in options:
+            self.transaction_mode = 'IMMEDIATE'
+        return kwargs
+
+    def get_new_connection(self, conn_params):
+        conn = super().get_new_connection(conn_params)
+        for name, value in self.pragmas.items():
+            if name == 'journal_mode':
+                # Persistent, and switching needs an exclusive lock: only when it differs
+                current = conn.execute('PRAGMA journal_mode').fetchone()[0]
+                if current.lower() in (str(value).lower(), 'memory'):
+                    continue
+                retry_on_lock(conn.execute, f'PRAGMA journal_mode = {value}')
+            else:
+                conn.execute(f'PRAGMA {name} = {value}')
+        return conn
+
+    def create_cursor(self, name=None):
+        cursor = self.connection.cursor(factory=RetryingCursor)
+        cursor.lock_retries = self.lock_retries
+        return cursor
@@ -0,0 +1,82 @@
+"""
+Shared test helpers.
+"""
+import re
+import unittest
+
+from django.core.cache import caches
+from django.db import connection
+from django.test.runner import DiscoverRunner, ParallelTestSuite, RemoteTestResult, RemoteTestRunner
+
+
+FULL_SCAN = re.compile(r'^SCAN (\S+)$')
+
+
+def query_plan(queryset):
+    """``EXPLAIN QUERY PLAN`` detail lines for a queryset (SQLite only)."""
+    sql, params = queryset.query.sql_with_params()
+    with connection.cursor() as cursor:
+        cursor.execute(f'EXPLAIN QUERY PLAN {sql}', params)
+        return [row[-1] for row in cursor.fetchall()]
+
+
+class QueryPlanAssertions:
+    """
+    Mixin for TestCase: fails when a hot query stops using an index.
+    Plans are database specific, so these tests only run on SQLite.
+    """
+
+    def setUp(self):
+        super().setUp()
+        if connection.vendor != 'sqlite':
+            raise unittest.SkipTest('query plan assertions target SQLite')
+
+    def assertUsesIndex(self, queryset, index_name=None, allow_sort=False):
+        plan = query_plan(queryset)
+        detail = '\n'.join(plan)
+        scans = [line for line in plan if FULL_SCAN.match(line.strip())]
+        self.assertFalse(scans, f'full table scan in plan:\n{detail}')
+        if index_name:
+            self.assertIn(index_name, detail, f'{index_name} not used:\n{detail}')
+        if not allow_sort:
+            self.assertNotIn('TEMP B-TREE', detail, f'extra sort step in plan:\n{detail}')
+        return plan
+
+
+# ─────────────────────────────────────────────
+# Test runner
+# ─────────────────────────────────────────────
+
+class CacheClearingResult:
+    """
+    Result mixin that empties every cache before each test. Catalog cache
+    versions are bumped on commit, which TestCase never reaches, so
+    entries would otherwise outlive the rolled-back data they came from.
+    """
+
+    def startTest(self, test):
+        for cache in caches.all():
+            cache.clear()
+        super().startTest(test)
+
+
+class _RemoteResult(CacheClearingResult, RemoteTestResult):
+    pass
+
+
+class _RemoteRunner(RemoteTestRunner):
+    resultclass = _RemoteResult
+
+
+class _ParallelSuite(ParallelTestSuite):
+    runner_class = _RemoteRunner
+
+
+class TestRunner(DiscoverRunner):
+    """``DiscoverRunner`` whose tests each start with empty caches (``--parallel`` too)."""
+
+    parallel_test_suite = _ParallelSuite
+
+    def get_resultclass(self):
+        base = super().get_resultclass() or unittest.TextTestResult
+        return type(f'CacheClearing{base.__name__}', (CacheClearingResult, base), {})
@@ -0,0 +1,174 @@
+import os
+import subprocess
+import sys
+
+from django.conf import settings
+from django.db import connection
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+
+from accounts.models import User
+from marketplace.models import Product
+
+from . import metrics
+
+
+def fake_recorder(*statements):
+    """A QueryRecorder holding ``(sql, params, seconds)`` statements."""
+    recorder = metrics.QueryRecorder()
+    recorder.statements = list(statements)
+    return recorder
+
+
+class RequestMetricsMiddlewareTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        seller = User.objects.create_user(email='seller@college.edu', username='seller', password=None)
+        Product.objects.create(title='Desk lamp', description='', price=10, seller=seller)
+
+    def setUp(self):
+        metrics.store.reset()
+        self.addCleanup(metrics.store.reset)
+
+    def test_unsampled_requests_are_not_recorded(self):
+        for config in ({'SAMPLE_RATE': 0.0}, {'SAMPLE_RATE': 1.0, 'ENABLED': False}):
+            with self.subTest(config=config), self.settings(REQUEST_METRICS=config):
+                self.client.get(reverse('marketplace:product_list'))
+                self.assertEqual(metrics.store.snapshot()['views'], {})
+
+    @override_settings(REQUEST_METRICS={'SAMPLE_RATE': 1.0})
+    def test_sampled_requests_are_aggregated_per_view(self):
+        self.client.get(reverse('marketplace:product_list'))
+        self.client.get(reverse('marketplace:product_list'), {'condition': 'good'})
+        self.client.get(reverse('marketplace:landing'))
+
+        views = metrics.store.snapshot()['views']
+        self.assertEqual(set(views), {'marketplace:product_list', 'marketplace:landing'})
+        listing = views['marketplace:product_list']
+        self.assertEqual((listing['requests'], listing['errors']), (2, 0))
+        self.assertGreater(listing['avg_queries'], 0)
+        self.assertLessEqual(len(listing['slowest_queries']), metrics.DEFAULTS['SLOW_QUERIES'])
+        self.assertEqual(views['marketplace:landing']['requests'], 1)
+
+
+class QueryRecorderTests(TestCase):
+    def test_duplicates_and_repeats_are_told_apart(self):
+        recorder = metrics.QueryRecorder()
+        with connection.execute_wrapper(recorder), connection.cursor() as cursor:
+            for value in (1, 1, 2):
+                cursor.execute('SELECT %s', [value])
+            cursor.execute('SELECT 0')
+
+        self.assertEqual(recorder.count, 4)
+        self.assertEqual(recorder.duplicates(), 1)  # SELECT 1 ran twice
+        self.assertEqual(recorder.similar(), {'SELECT %s': 3})
+
+    def test_slowest_statements_are_kept_across_requests(self):
+        stats = metrics.ViewStats(buffer_size=10, slow_queries=2)
+        stats.add(0.1, 200, fake_recorder(
+            ('SELECT "a"."id", "a"."title" FROM "a" WHERE id = %s', [1], 0.03),
+            ('SELECT 1', None, 0.01),
+        ))
+        stats.add(0.2, 500, fake_recorder(('UPDATE "b" SET n = 1', None, 0.05)))
+
+        data = stats.as_dict()
+        self.assertEqual((data['requests'], data['errors'], data['avg_queries']), (2, 1, 1.5))
+        self.assertEqual(data['slowest_queries'], [
+            {'ms': 50.0, 'sql': 'UPDATE "b" SET n = 1'},
+            {'ms': 30.0, 'sql': 'SELECT … FROM "a" WHERE id = %s'},
+        ])
+        self.assertEqual((data['p50_ms'], data['max_ms']), (200.0, 200.0))
+
+
+class MetricsExportTests(TestCase):
+    def setUp(self):
+        self.store = metrics.MetricsStore()
+        self.store.record('marketplace:product_list', 0.25, 200, fake_recorder(
+            ('SELECT %s', [1], 0.01), ('SELECT %s', [1], 0.01), ('SELECT %s', [2], 0.02),
+        ))
+        self.store.record('say "hi"', 0.5, 503, fake_recorder())
+
+    def test_json_snapshot(self):
+        snapshot = self.store.snapshot()
+        self.assertEqual(snapshot['sample_rate'], metrics.get_config()['SAMPLE_RATE'])
+        listing = snapshot['views']['marketplace:product_list']
+        self.assertEqual(
+            (listing['avg_ms'], listing['avg_queries'], listing['avg_sql_ms'],
+             listing['duplicate_queries'], listing['repeated_queries']),
+            (250.0, 3.0, 40.0, 1, 2),
+        )
+
+    def test_prometheus_text(self):
+        lines = self.store.to_prometheus().splitlines()
+        for line in [
+            '# TYPE bingo_request_duration_seconds summary',
+            'bingo_request_duration_seconds{view="marketplace:product_list",quantile="0.95"} 0.250000',
+            'bingo_request_duration_seconds_count{view="marketplace:product_list"} 1',
+            'bingo_db_queries_total{view="marketplace:product_list"} 3',
+            'bingo_db_duplicate_queries_total{view="marketplace:product_list"} 1',
+            'bingo_db_repeated_queries_total{view="marketplace:product_list"} 2',
+            'bingo_request_errors_total{view="say \\"hi\\""} 1',
+        ]:
+            self.assertIn(line, lines)
+
+
+@override_settings(REQUEST_METRICS={'SAMPLE_RATE': 0.0})  # keep these requests out of the store
+class RequestMetricsViewTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.staff = User.objects.create_user(
+            email='staff@college.edu', username='staff', password=None, is_staff=True,
+        )
+        cls.student = User.objects.create_user(email='student@college.edu', username='student', password=None)
+
+    def setUp(self):
+        metrics.store.reset()
+        self.addCleanup(metrics.store.reset)
+        metrics.store.record('marketplace:product_list', 0.1, 200, fake_recorder(('SELECT 1', None, 0.01)))
+        self.url = reverse('request_metrics')
+
+    def test_only_staff_can_read_the_metrics(self):
+        self.assertEqual(self.client.get(self.url).status_code, 302)
+        self.client.force_login(self.student)
+        self.assertEqual(self.client.get(self.url).status_code, 302)
+        self.assertEqual(self.client.post(self.url, {'reset': '1'}).status_code, 302)
+        self.assertIn('marketplace:product_list', metrics.store.snapshot()['views'])
+
+    def test_staff_get_json_prometheus_and_reset(self):
+        self.client.force_login(self.staff)
+        response = self.client.get(self.url)
+        self.assertEqual(response.json()['views']['marketplace:product_list']['requests'], 1)
+
+        response = self.client.get(self.url, {'format': 'prometheus'})
+        self.assertEqual(response['Content-Type'], 'text/plain; version=0.0.4; charset=utf-8')
+        self.assertIn(b'bingo_db_queries_total{view="marketplace:product_list"} 1', response.content)
+
+        self.client.post(self.url, {'reset': '1'})
+        self.assertEqual(metrics.store.snapshot()['views'], {})
+
+
+class AsgiConnectionTests(SimpleTestCase):
+    def load_asgi(self, **env):
+        """CONN_MAX_AGE and stderr of a fresh process that imports the ASGI app."""
+        inherited = {key: value for key, value in os.environ.items() if key not in ('CONN_MAX_AGE', 'DJANGO_ASGI')}
+        env = {**inherited, 'DJANGO_SETTINGS_MODULE': 'bingo_project.settings', **env}
+        code = (
+            'import bingo_project.asgi\n'
+            'from django.conf import settings\n'
+            'print(settings.DATABASES["default"]["CONN_MAX_AGE"])'
+        )
+        result = subprocess.run(
+            [sys.executable, '-c', code], env=env, cwd=settings.BASE_DIR,
+            capture_output=True, text=True, check=True,
+        )
+        return int(result.stdout), result.stderr
+
+    def test_persistent_connections_are_off_under_asgi(self):
+        max_age, stderr = self.load_asgi()
+        self.assertEqual(max_age, 0)
+        self.assertNotIn('CONN_MAX_AGE', stderr)
+
+    def test_forcing_them_on_warns(self):
+        max_age, stderr = self.load_asgi(CONN_MAX_AGE='60')
+        self.assertEqual(max_age, 60)
+        self.assertIn('CONN_MAX_AGE is set for default under ASGI', stderr)
@@ -1,5 +1,9 @@
+from django.contrib.admin.views.decorators import staff_member_required
+from django.http import HttpResponse, JsonResponse
 from django.shortcuts import render
 
+from . import metrics
+
 
 def error_404(request, exception):
     return render(request, '404.html', status=404)
@@ -10,4 +14,19 @@ def error_403(request, exception):
 
 
 def error_500(request):
-    return render(request, '404.html', status=500)
\ No newline at end of file
+    return render(request, '404.html', status=500)
+
+@staff_member_required
+def request_metrics(request):
+    """
+    Per-view request and SQL statistics from RequestMetricsMiddleware.
+    JSON by default; ?format=prometheus for the Prometheus text format.
+    POST with reset=1 clears the collected samples.
+    """
+    if request.method == 'POST' and request.POST.get('reset'):
+        metrics.store.reset()
+    if request.GET.get('format') == 'prometheus':
+        return HttpResponse(
+            metrics.store.to_prometheus(), content_type='text/plain; version=0.0.4; charset=utf-8',
+        )
+    return JsonResponse(metrics.store.snapshot())
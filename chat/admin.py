@@ -1,23 +1,39 @@
 from django.contrib import admin
-from .models import ChatRoom, Message
+from .models import ChatRoom, Message, MessageArchive, UnreadCounter
 
 
 class MessageInline(admin.TabularInline):
     model = Message
     extra = 0
-    readonly_fields = ['sender', 'body', 'is_read', 'created_at']
+    readonly_fields = ['sender', 'body', 'created_at']
 
 
 @admin.register(ChatRoom)
 class ChatRoomAdmin(admin.ModelAdmin):
     list_display = ['product', 'buyer', 'seller', 'created_at', 'updated_at']
     list_filter = ['created_at']
+    readonly_fields = ['buyer_read_through', 'seller_read_through', 'archived_through']
     search_fields = ['buyer__email', 'seller__email', 'product__title']
     inlines = [MessageInline]
 
 
 @admin.register(Message)
 class MessageAdmin(admin.ModelAdmin):
-    list_display = ['room', 'sender', 'body', 'is_read', 'created_at']
-    list_filter = ['is_read', 'created_at']
-    search_fields = ['sender__email', 'body']
\ No newline at end of file
+    list_display = ['room', 'sender', 'body', 'created_at']
+    list_filter = ['created_at']
+    search_fields = ['sender__email', 'body']
+
+
+@admin.register(MessageArchive)
+class MessageArchiveAdmin(admin.ModelAdmin):
+    list_display = ['room', 'first_message_id', 'last_message_id', 'message_count', 'updated_at']
+    search_fields = ['room__buyer__email', 'room__seller__email']
+    readonly_fields = ['room', 'first_message_id', 'last_message_id', 'message_count', 'created_at', 'updated_at']
+    exclude = ['data']
+
+
+@admin.register(UnreadCounter)
+class UnreadCounterAdmin(admin.ModelAdmin):
+    list_display = ['user', 'count', 'updated_at']
+    search_fields = ['user__email']
+    readonly_fields = ['updated_at']
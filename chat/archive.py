@@ -0,0 +1,186 @@
+"""
+Retention for chat history: old messages move out of the hot
+``Message`` table into compressed per-room ``MessageArchive`` blocks.
+
+A room's messages are archived once they are older than ``AFTER_DAYS``,
+or ``CLOSED_AFTER_DAYS`` when its listing is sold or taken down. The
+newest ``KEEP_RECENT`` messages of every room always stay in
+``Message``, so opening a chat, polling for new messages and the inbox
+preview never touch an archive; only scrolling back past them does
+(``older_messages``).
+
+Archived messages count as read: both read cursors move past them and
+any still unread come off the recipient's badge. Run ``manage.py archive_messages`` daily from cron.
+Configure with ``settings.CHAT_ARCHIVE``::
+
+    CHAT_ARCHIVE = {
+        'AFTER_DAYS': 90,
+        'CLOSED_AFTER_DAYS': 7,
+        'KEEP_RECENT': 50,      # newest messages per room never archived
+        'BLOCK_SIZE': 500,      # messages per compressed block
+    }
+"""
+import json
+import zlib
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import BooleanField, ExpressionWrapper, Max, Q
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from .models import ChatRoom, Message, MessageArchive, UnreadCounter
+
+
+DEFAULTS = {
+    'AFTER_DAYS': 90,
+    'CLOSED_AFTER_DAYS': 7,
+    'KEEP_RECENT': 50,
+    'BLOCK_SIZE': 500,
+}
+COMPRESSION_LEVEL = 6
+
+
+def get_config():
+    return {**DEFAULTS, **getattr(settings, 'CHAT_ARCHIVE', {})}
+
+
+# ─────────────────────────────────────────────
+# Block encoding
+# ─────────────────────────────────────────────
+
+def encode_block(messages):
+    """``Message`` instances (oldest first) to compressed JSON lines."""
+    lines = (
+        json.dumps({
+            'id': m.pk, 'sender_id': m.sender_id, 'body': m.body,
+            'created_at': m.created_at.isoformat(),
+        }, ensure_ascii=False)
+        for m in messages
+    )
+    return zlib.compress('\n'.join(lines).encode(), COMPRESSION_LEVEL)
+
+
+def decode_block(archive):
+    """Unsaved ``Message`` instances for a block, oldest first."""
+    return [
+        Message(
+            id=record['id'], room=archive.room, sender_id=record['sender_id'],
+            body=record['body'], created_at=parse_datetime(record['created_at']),
+        )
+        for record in map(json.loads, zlib.decompress(bytes(archive.data)).decode().split('\n'))
+    ]
+
+
+# ─────────────────────────────────────────────
+# Archiving
+# ─────────────────────────────────────────────
+
+def closed_room_q(prefix=''):
+    return Q(**{f'{prefix}product__is_sold': True}) | Q(**{f'{prefix}product__is_active': False})
+
+
+def archive_room(room, cutoff, keep_recent=None, block_size=None):
+    """
+    Moves ``room``'s messages created before ``cutoff`` into archive
+    blocks, leaving the newest ``keep_recent`` in place. Returns the
+    number of messages archived.
+    """
+    config = get_config()
+    keep_recent = config['KEEP_RECENT'] if keep_recent is None else keep_recent
+    block_size = block_size or config['BLOCK_SIZE']
+
+    with transaction.atomic():
+        recent = room.messages.order_by('-pk').values_list('pk', flat=True)
+        hot_floor = recent[keep_recent - 1:keep_recent].first() if keep_recent else None
+        if keep_recent and hot_floor is None:
+            return 0  # fewer than keep_recent messages in the room
+        candidates = room.messages.filter(created_at__lt=cutoff)
+        if hot_floor is not None:
+            candidates = candidates.filter(pk__lt=hot_floor)
+        # Archive a prefix by id, so every archived id stays below every hot one
+        last_id = candidates.aggregate(last=Max('pk'))['last']
+        if last_id is None:
+            return 0
+
+        moving = list(room.messages.filter(pk__lte=last_id).order_by('pk'))
+        _store_blocks(room, moving, block_size)
+
+        # Current cursors, locked so a concurrent mark_read can't count the same messages
+        cursors = ChatRoom.objects.select_for_update().filter(pk=room.pk).values(
+            'buyer_read_through', 'seller_read_through'
+        ).get()
+        for user_id, cursor in zip((room.buyer_id, room.seller_id), cursors.values()):
+            unread = sum(1 for m in moving if m.pk > cursor and m.sender_id != user_id)
+            UnreadCounter.adjust(user_id, -unread)
+        room.messages.filter(pk__lte=last_id).delete()
+        updates = {field: max(cursor, last_id) for field, cursor in cursors.items()}
+        updates['archived_through'] = last_id
+        # Not save(): that would bump updated_at and reorder the inbox
+        ChatRoom.objects.filter(pk=room.pk).update(**updates)
+        for field, value in updates.items():
+            setattr(room, field, value)
+    return len(moving)
+
+
+def _store_blocks(room, messages, block_size):
+    """Appends ``messages`` to the room's last block until full, then opens new ones."""
+    tail = room.archives.order_by('-last_message_id').first()
+    if tail is not None and tail.message_count < block_size:
+        fill = block_size - tail.message_count
+        combined = decode_block(tail) + messages[:fill]
+        tail.data = encode_block(combined)
+        tail.last_message_id = combined[-1].pk
+        tail.message_count = len(combined)
+        tail.save(update_fields=['data', 'last_message_id', 'message_count', 'updated_at'])
+        messages = messages[fill:]
+
+    MessageArchive.objects.bulk_create([
+        MessageArchive(
+            room=room, first_message_id=block[0].pk, last_message_id=block[-1].pk,
+            message_count=len(block), data=encode_block(block),
+        )
+        for block in (messages[i:i + block_size] for i in range(0, len(messages), block_size))
+    ])
+
+
+def archive_messages(now=None):
+    """Archives every room with messages past its retention; returns ``(rooms, messages)`` archived."""
+    config = get_config()
+    now = now or timezone.now()
+    open_cutoff = now - timedelta(days=config['AFTER_DAYS'])
+    closed_cutoff = now - timedelta(days=config['CLOSED_AFTER_DAYS'])
+
+    due = Message.objects.filter(
+        Q(created_at__lt=open_cutoff) | Q(closed_room_q('room__'), created_at__lt=closed_cutoff)
+    ).values_list('room_id', flat=True).distinct()
+    rooms = list(ChatRoom.objects.filter(pk__in=list(due)).annotate(
+        closed=ExpressionWrapper(closed_room_q(), output_field=BooleanField())
+    ).order_by('pk'))
+
+    counts = [archive_room(room, closed_cutoff if room.closed else open_cutoff) for room in rooms]
+    return sum(1 for n in counts if n), sum(counts)
+
+
+# ─────────────────────────────────────────────
+# Reading history back
+# ─────────────────────────────────────────────
+
+def older_messages(room, before, limit):
+    """
+    Up to ``limit`` messages with ids below ``before``, oldest first,
+    and whether there are more: from ``Message`` first, then from the
+    archive blocks once the hot rows run out.
+    """
+    older = list(
+        room.messages.filter(pk__lt=before).order_by('-created_at', '-pk')[:limit + 1]
+    )
+    if len(older) <= limit and room.archived_through:
+        floor = min([before] + [m.pk for m in older])
+        blocks = room.archives.filter(first_message_id__lt=floor).order_by('-last_message_id')
+        for block in blocks.iterator(chunk_size=2):
+            older.extend(m for m in reversed(decode_block(block)) if m.pk < floor)
+            if len(older) > limit:
+                break
+    return older[:limit][::-1], len(older) > limit
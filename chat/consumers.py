@@ -0,0 +1,149 @@
+"""
+WebSocket transport for chat rooms, served directly by the ASGI app
+(see ``bingo_project/asgi.py``) at ``/ws/chat/<room_pk>/``.
+
+Client → server frames: ``{"body": "..."}`` sends a message.
+Server → client frames: ``{"type": "message", "message": {...}}``.
+
+Messages are persisted through ``ChatRoom.post_message`` exactly like
+the HTTP form, which then publishes them on the room's pub/sub channel.
+Every ORM call goes through ``database_sync_to_async``, which closes
+the thread's connection afterwards (``CONN_MAX_AGE`` is 0 under ASGI),
+so a long-lived socket never holds one open between frames.
+If live delivery stops, the socket is closed and the page reconnects.
+"""
+import asyncio
+import json
+import logging
+import re
+from http.cookies import SimpleCookie
+from importlib import import_module
+from urllib.parse import urlsplit
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.auth import get_user
+from django.db import close_old_connections
+from django.http import HttpRequest
+
+from .models import ChatRoom
+from .pubsub import get_broker, room_channel
+
+
+ROOM_PATH = re.compile(r'^/ws/chat/(?P<room_pk>\d+)/$')
+# Server error: the page reconnects after a moment
+CLOSE_INTERNAL_ERROR = 1011
+
+logger = logging.getLogger(__name__)
+
+
+def database_sync_to_async(func):
+    """
+    ``sync_to_async`` with the connection housekeeping Django does around
+    each request: stale or broken connections are replaced before the
+    call and obsolete ones closed after it.
+    """
+    def run(*args, **kwargs):
+        close_old_connections()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            close_old_connections()
+    return sync_to_async(run)
+
+
+def _headers(scope):
+    return {name.decode('latin1'): value.decode('latin1') for name, value in scope.get('headers', [])}
+
+
+@database_sync_to_async
+def authenticate(scope):
+    """Resolves the Django session cookie on the handshake to a user."""
+    cookies = SimpleCookie(_headers(scope).get('cookie', ''))
+    morsel = cookies.get(settings.SESSION_COOKIE_NAME)
+    request = HttpRequest()
+    request.session = import_module(settings.SESSION_ENGINE).SessionStore(
+        morsel.value if morsel else None
+    )
+    return get_user(request)
+
+
+@database_sync_to_async
+def load_room(room_pk, user):
+    """The room if ``user`` takes part in it, else None."""
+    room = ChatRoom.objects.filter(pk=room_pk).first()
+    if room is None or user.pk not in (room.buyer_id, room.seller_id):
+        return None
+    return room
+
+
+def origin_allowed(scope):
+    """Rejects cross-site handshakes — browsers don't apply CSRF to sockets."""
+    headers = _headers(scope)
+    origin = headers.get('origin')
+    if not origin:
+        return True
+    return urlsplit(origin).netloc == headers.get('host')
+
+
+class ChatSocket:
+    """ASGI application handling one room's WebSocket connection."""
+
+    async def __call__(self, scope, receive, send):
+        match = ROOM_PATH.match(scope['path'])
+        event = await receive()
+        if event['type'] != 'websocket.connect':
+            return
+
+        user = await authenticate(scope)
+        room = None
+        if match and origin_allowed(scope) and user.is_authenticated:
+            room = await load_room(int(match['room_pk']), user)
+        if room is None:
+            await send({'type': 'websocket.close', 'code': 4403})
+            return
+
+        await send({'type': 'websocket.accept'})
+        subscription = get_broker().subscribe(room_channel(room.pk))
+        reader = asyncio.ensure_future(self.read_frames(receive, send, room, user))
+        forward = asyncio.ensure_future(self.forward_events(subscription, room, user, send))
+        try:
+            await asyncio.wait({reader, forward}, return_when=asyncio.FIRST_COMPLETED)
+            if forward.done():
+                # Live delivery stopped; a socket that only sends is worse than none
+                logger.error("Chat delivery for room %s stopped", room.pk, exc_info=forward.exception())
+                await send({'type': 'websocket.close', 'code': CLOSE_INTERNAL_ERROR})
+            else:
+                reader.result()
+        finally:
+            reader.cancel()
+            forward.cancel()
+            subscription.close()
+
+    async def read_frames(self, receive, send, room, user):
+        while True:
+            event = await receive()
+            if event['type'] == 'websocket.disconnect':
+                return
+            if event['type'] != 'websocket.receive':
+                continue
+            try:
+                body = str(json.loads(event.get('text') or '{}').get('body', '')).strip()
+            except (ValueError, AttributeError):
+                body = ''
+            if not body:
+                await send({'type': 'websocket.send', 'text': json.dumps(
+                    {'type': 'error', 'error': "Cannot send an empty message."}
+                )})
+                continue
+            await database_sync_to_async(room.post_message)(user, body)
+
+    async def forward_events(self, subscription, room, user, send):
+        while True:
+            event = await subscription.get()
+            message = dict(event.get('message', {}))
+            message['mine'] = message.get('sender_id') == user.pk
+            if not message['mine']:
+                # The recipient is looking at the room right now
+                await database_sync_to_async(room.mark_read)(user, message.get('id'))
+            await send({'type': 'websocket.send', 'text': json.dumps({**event, 'message': message})})
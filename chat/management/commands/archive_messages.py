@@ -0,0 +1,22 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from chat.archive import archive_messages, get_config
+
+
+class Command(BaseCommand):
+    help = (
+        "Moves chat messages past their retention (settings.CHAT_ARCHIVE) into "
+        "compressed per-room archive blocks; run daily from cron."
+    )
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        rooms, messages = archive_messages()
+        config = get_config()
+        self.stdout.write(self.style.SUCCESS(
+            f"Archived {messages} message{'s' if messages != 1 else ''} from {rooms} "
+            f"room{'s' if rooms != 1 else ''} (older than {config['AFTER_DAYS']} days, "
+            f"{config['CLOSED_AFTER_DAYS']} for closed listings) in {time.perf_counter() - started:.1f}s."
+        ))
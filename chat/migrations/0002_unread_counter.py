@@ -0,0 +1,46 @@
+# Generated by Django 6.0.2 on 2026-10-16 22:42
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def backfill_counters(apps, schema_editor):
+    """Seeds each participant's counter from the existing unread messages."""
+    Message = apps.get_model('chat', 'Message')
+    UnreadCounter = apps.get_model('chat', 'UnreadCounter')
+
+    totals = {}
+    for side in ('buyer', 'seller'):
+        rows = Message.objects.filter(is_read=False).exclude(
+            sender=models.F(f'room__{side}')
+        ).values(f'room__{side}').annotate(n=Count('pk'))
+        for row in rows:
+            user_id = row[f'room__{side}']
+            totals[user_id] = totals.get(user_id, 0) + row['n']
+
+    UnreadCounter.objects.bulk_create([
+        UnreadCounter(user_id=user_id, count=count)
+        for user_id, count in totals.items()
+    ])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('chat', '0001_initial'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='UnreadCounter',
+            fields=[
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='unread_counter', serialize=False, to=settings.AUTH_USER_MODEL)),
+                ('count', models.PositiveIntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.RunPython(backfill_counters, migrations.RunPython.noop),
+    ]
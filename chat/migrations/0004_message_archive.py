@@ -0,0 +1,36 @@
+# Generated by Django 6.0.2 on 2026-10-17 09:40
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('chat', '0003_hot_query_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='chatroom',
+            name='archived_through',
+            field=models.PositiveBigIntegerField(default=0, editable=False),
+        ),
+        migrations.CreateModel(
+            name='MessageArchive',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('first_message_id', models.PositiveBigIntegerField()),
+                ('last_message_id', models.PositiveBigIntegerField()),
+                ('message_count', models.PositiveIntegerField()),
+                ('data', models.BinaryField()),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('room', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='archives', to='chat.chatroom')),
+            ],
+            options={
+                'ordering': ['room', 'first_message_id'],
+                'indexes': [models.Index(fields=['room', '-last_message_id'], name='archive_room_last_idx')],
+            },
+        ),
+    ]
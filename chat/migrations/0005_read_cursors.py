@@ -0,0 +1,76 @@
+# Generated by Django 6.0.2 on 2026-10-17 11:05
+
+from django.db import migrations, models
+from django.db.models import Max
+
+
+def cursors_from_flags(apps, schema_editor):
+    """
+    Each participant's cursor becomes the newest message they had read
+    from the other side; badge counters are rebuilt from the cursors.
+    """
+    ChatRoom = apps.get_model('chat', 'ChatRoom')
+    Message = apps.get_model('chat', 'Message')
+    UnreadCounter = apps.get_model('chat', 'UnreadCounter')
+
+    newest_read = {
+        (row['room'], row['sender']): row['last']
+        for row in Message.objects.filter(is_read=True).values('room', 'sender').annotate(last=Max('pk'))
+    }
+    rooms = list(ChatRoom.objects.only('buyer_id', 'seller_id'))
+    for room in rooms:
+        room.buyer_read_through = newest_read.get((room.pk, room.seller_id), 0)
+        room.seller_read_through = newest_read.get((room.pk, room.buyer_id), 0)
+    ChatRoom.objects.bulk_update(rooms, ['buyer_read_through', 'seller_read_through'], batch_size=500)
+
+    totals = {}
+    for side in ('buyer', 'seller'):
+        rows = Message.objects.filter(
+            pk__gt=models.F(f'room__{side}_read_through')
+        ).exclude(
+            sender=models.F(f'room__{side}')
+        ).values(f'room__{side}').annotate(n=models.Count('pk'))
+        for row in rows:
+            user_id = row[f'room__{side}']
+            totals[user_id] = totals.get(user_id, 0) + row['n']
+    UnreadCounter.objects.exclude(user_id__in=totals).update(count=0)
+    for user_id, count in totals.items():
+        UnreadCounter.objects.update_or_create(user_id=user_id, defaults={'count': count})
+
+
+def flags_from_cursors(apps, schema_editor):
+    ChatRoom = apps.get_model('chat', 'ChatRoom')
+    Message = apps.get_model('chat', 'Message')
+
+    for room in ChatRoom.objects.only('buyer_id', 'seller_id', 'buyer_read_through', 'seller_read_through'):
+        Message.objects.filter(room=room, sender_id=room.seller_id, pk__lte=room.buyer_read_through).update(is_read=True)
+        Message.objects.filter(room=room, sender_id=room.buyer_id, pk__lte=room.seller_read_through).update(is_read=True)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('chat', '0004_message_archive'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='chatroom',
+            name='buyer_read_through',
+            field=models.PositiveBigIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='chatroom',
+            name='seller_read_through',
+            field=models.PositiveBigIntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(cursors_from_flags, flags_from_cursors),
+        migrations.RemoveIndex(
+            model_name='message',
+            name='message_room_unread_idx',
+        ),
+        migrations.RemoveField(
+            model_name='message',
+            name='is_read',
+        ),
+    ]
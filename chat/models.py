@@ -1,5 +1,10 @@
-from django.db import models
+from django.db import models, transaction
+from django.db.models import F, Q
+from django.db.models.functions import Greatest
 from django.conf import settings
+from django.core.cache import cache
+from django.utils.formats import date_format
+from django.utils.timezone import localtime
 from marketplace.models import Product
 
 
@@ -26,6 +31,13 @@ class ChatRoom(models.Model):
     )
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
+    # Id of the newest message moved to a MessageArchive (0: none), so
+    # pages know whether older history exists without querying for it
+    archived_through = models.PositiveBigIntegerField(default=0, editable=False)
+    # Read receipts: id of the newest message each participant has seen.
+    # Messages from the other side above a cursor are unread.
+    buyer_read_through = models.PositiveBigIntegerField(default=0, editable=False)
+    seller_read_through = models.PositiveBigIntegerField(default=0, editable=False)
 
     class Meta:
         # Each buyer can only have ONE chat room per product
@@ -35,6 +47,12 @@ class ChatRoom(models.Model):
     def __str__(self):
         return f"{self.buyer.username} ↔ {self.seller.username} | {self.product.title}"
 
+    def get_other_user_id(self, current_user):
+        """Id of the other participant, without loading either user."""
+        if current_user.pk == self.buyer_id:
+            return self.seller_id
+        return self.buyer_id
+
     def get_other_user(self, current_user):
         """Returns the other participant in the conversation."""
         if current_user == self.buyer:
@@ -45,9 +63,65 @@ class ChatRoom(models.Model):
         """Returns the most recent message in this room."""
         return self.messages.order_by('-created_at').first()
 
+    def read_cursor_field(self, user_id):
+        """Name of the participant's read-cursor column."""
+        return 'buyer_read_through' if user_id == self.buyer_id else 'seller_read_through'
+
+    def read_through(self, user_id):
+        """Id of the newest message the participant has read."""
+        return getattr(self, self.read_cursor_field(user_id))
+
     def get_unread_count(self, user):
         """Returns count of unread messages for the given user."""
-        return self.messages.filter(is_read=False).exclude(sender=user).count()
+        return self.messages.filter(pk__gt=self.read_through(user.pk)).exclude(sender=user).count()
+
+    def post_message(self, sender, body):
+        """
+        Saves a message, bumps the recipient's unread counter and the
+        room's updated_at, and announces it to live subscribers once
+        the transaction commits. Shared by the HTTP and WebSocket paths.
+        """
+        with transaction.atomic():
+            message = Message.objects.create(room=self, sender=sender, body=body)
+            UnreadCounter.adjust(self.get_other_user_id(sender), 1)
+            # Bump the room's updated_at so it appears at top of inbox
+            self.save(update_fields=['updated_at'])
+
+        from .pubsub import publish, room_channel
+        payload = {'type': 'message', 'message': message.to_dict()}
+        transaction.on_commit(lambda: publish(room_channel(self.pk), payload))
+        return message
+
+    def mark_read(self, user, through=None):
+        """
+        Moves the user's read cursor up to message ``through`` (default:
+        the newest message) and takes the newly read messages off their
+        badge counter. One single-row update, and no write at all unless
+        the cursor actually advances. Returns the number of messages marked.
+        """
+        field = self.read_cursor_field(user.pk)
+        if through is None:
+            through = self.messages.order_by('-pk').values_list('pk', flat=True).first()
+        if not through or through <= getattr(self, field):
+            return 0
+
+        with transaction.atomic():
+            # Locks the row, so concurrent readers (two tabs, HTTP and
+            # WebSocket) agree on where the cursor was and count each
+            # message off the badge exactly once
+            previous = ChatRoom.objects.select_for_update().filter(
+                pk=self.pk, **{f'{field}__lt': through}
+            ).values_list(field, flat=True).first()
+            if previous is None:
+                return 0  # someone else already moved it this far
+            # Not save(): that would bump updated_at and reorder the inbox
+            ChatRoom.objects.filter(pk=self.pk).update(**{field: through})
+            marked = self.messages.filter(
+                pk__gt=previous, pk__lte=through
+            ).exclude(sender=user).count()
+            UnreadCounter.adjust(user.pk, -marked)
+        setattr(self, field, through)
+        return marked
 
 
 class Message(models.Model):
@@ -65,11 +139,130 @@ class Message(models.Model):
         related_name='sent_messages'
     )
     body = models.TextField()
-    is_read = models.BooleanField(default=False)
     created_at = models.DateTimeField(auto_now_add=True)
 
     class Meta:
         ordering = ['created_at']
+        indexes = [
+            # Room history, "latest message" lookups and after/before polling
+            models.Index(fields=['room', 'created_at', 'id'], name='message_room_created_idx'),
+        ]
 
     def __str__(self):
-        return f"{self.sender.username}: {self.body[:50]}"
\ No newline at end of file
+        return f"{self.sender.username}: {self.body[:50]}"
+
+    @property
+    def is_read(self):
+        """Whether the recipient's read cursor has reached this message."""
+        room = self.room
+        recipient_id = room.seller_id if self.sender_id == room.buyer_id else room.buyer_id
+        return self.pk is not None and self.pk <= room.read_through(recipient_id)
+
+    def to_dict(self, viewer=None):
+        """Compact JSON form used by the polling and WebSocket APIs."""
+        data = {
+            'id': self.pk,
+            'body': self.body,
+            'sender_id': self.sender_id,
+            'is_read': self.is_read,
+            'created_at': self.created_at.isoformat(),
+            'time': date_format(localtime(self.created_at), 'g:i A'),
+        }
+        if viewer is not None:
+            data['mine'] = self.sender_id == viewer.pk
+        return data
+
+
+class MessageArchive(models.Model):
+    """
+    A zlib-compressed block of JSON lines holding a room's older
+    messages, moved out of ``Message`` by ``chat.archive``. Messages
+    keep their ids, and every archived id is lower than every id still
+    in ``Message``, so history pages by id straight across the two.
+    """
+    room = models.ForeignKey(
+        ChatRoom,
+        on_delete=models.CASCADE,
+        related_name='archives'
+    )
+    first_message_id = models.PositiveBigIntegerField()
+    last_message_id = models.PositiveBigIntegerField()
+    message_count = models.PositiveIntegerField()
+    data = models.BinaryField()
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        ordering = ['room', 'first_message_id']
+        indexes = [
+            # Scroll-back walks a room's blocks newest first
+            models.Index(fields=['room', '-last_message_id'], name='archive_room_last_idx'),
+        ]
+
+    def __str__(self):
+        return f"Room {self.room_id}: messages {self.first_message_id}–{self.last_message_id}"
+
+
+class UnreadCounter(models.Model):
+    """
+    Denormalized count of unread messages addressed to a user,
+    summed across all of their rooms. The navbar badge reads this on
+    every page, so it is keyed by user id (one primary-key lookup)
+    and cached between changes.
+    """
+    user = models.OneToOneField(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='unread_counter'
+    )
+    count = models.PositiveIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.user_id}: {self.count} unread"
+
+    @staticmethod
+    def cache_key(user_id):
+        return f'chat:unread:{user_id}'
+
+    @classmethod
+    def get_for_user(cls, user_id):
+        """Cached unread total for the badge — no query on a cache hit."""
+        key = cls.cache_key(user_id)
+        count = cache.get(key)
+        if count is None:
+            count = cls.objects.filter(pk=user_id).values_list('count', flat=True).first() or 0
+            cache.set(key, count, getattr(settings, 'UNREAD_COUNT_CACHE_TIMEOUT', 300))
+        return count
+
+    @classmethod
+    def adjust(cls, user_id, delta):
+        """
+        Adds ``delta`` (may be negative) to a user's counter in the
+        current transaction and drops the cached value once it commits.
+        """
+        if not delta:
+            return
+        with transaction.atomic():
+            updated = cls.objects.filter(pk=user_id).update(
+                count=Greatest(F('count') + delta, 0)
+            )
+            if not updated:
+                counter, created = cls.objects.get_or_create(
+                    pk=user_id, defaults={'count': max(delta, 0)}
+                )
+                if not created:  # lost a race with a concurrent insert
+                    cls.objects.filter(pk=user_id).update(count=Greatest(F('count') + delta, 0))
+        transaction.on_commit(lambda: cache.delete(cls.cache_key(user_id)))
+
+    @classmethod
+    def recompute(cls, user_id):
+        """Rebuilds a user's counter from the read cursors (repairs drift)."""
+        count = Message.objects.filter(
+            Q(room__buyer_id=user_id, pk__gt=F('room__buyer_read_through'))
+            | Q(room__seller_id=user_id, pk__gt=F('room__seller_read_through'))
+        ).exclude(sender_id=user_id).count()
+        cls.objects.update_or_create(pk=user_id, defaults={'count': count})
+        transaction.on_commit(lambda: cache.delete(cls.cache_key(user_id)))
+        return count
@@ -0,0 +1,199 @@
+"""
+Publish/subscribe fan-out for live chat delivery.
+
+Messages are always persisted through ``chat.models.Message`` first;
+the broker only tells connected WebSockets that something new exists.
+
+* ``InMemoryBroker`` — subscribers and publishers share one process.
+* ``SQLiteBroker``   — several worker processes on one host share an
+  append-only SQLite file; each process tails it and fans events out
+  to its own sockets.
+
+Choose one with ``settings.CHAT_PUBSUB``::
+
+    CHAT_PUBSUB = {
+        'BACKEND': 'chat.pubsub.SQLiteBroker',
+        'OPTIONS': {'path': BASE_DIR / 'chat_pubsub.sqlite3'},
+    }
+
+``publish()`` is synchronous and thread-safe so regular (sync) views can
+call it; subscriptions live on the asyncio loop that serves the socket.
+"""
+import asyncio
+import json
+import logging
+import sqlite3
+import threading
+import time
+from collections import defaultdict
+from functools import lru_cache
+
+from django.conf import settings
+from django.utils.module_loading import import_string
+
+logger = logging.getLogger(__name__)
+
+
+def room_channel(room_pk):
+    return f'room:{room_pk}'
+
+
+class Subscription:
+    """One socket's inbox for a channel, bound to the loop it was created on."""
+
+    def __init__(self, broker, channel, maxsize=100):
+        self.broker = broker
+        self.channel = channel
+        self.loop = asyncio.get_running_loop()
+        self.queue = asyncio.Queue(maxsize=maxsize)
+
+    def deliver(self, message):
+        self.loop.call_soon_threadsafe(self._put, message)
+
+    def _put(self, message):
+        # A stalled client drops events instead of growing without bound;
+        # it can resync through the polling API.
+        if not self.queue.full():
+            self.queue.put_nowait(message)
+
+    async def get(self):
+        return await self.queue.get()
+
+    def close(self):
+        self.broker.unsubscribe(self)
+
+
+class BaseBroker:
+
+    def __init__(self):
+        self._subscribers = defaultdict(set)
+        self._lock = threading.Lock()
+
+    def subscribe(self, channel):
+        """Must be called from the event loop that will read the subscription."""
+        subscription = Subscription(self, channel)
+        with self._lock:
+            self._subscribers[channel].add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            subscribers = self._subscribers.get(subscription.channel)
+            if subscribers is not None:
+                subscribers.discard(subscription)
+                if not subscribers:
+                    del self._subscribers[subscription.channel]
+
+    def publish(self, channel, message):
+        raise NotImplementedError
+
+    def _fan_out(self, channel, message):
+        with self._lock:
+            subscribers = list(self._subscribers.get(channel, ()))
+        for subscription in subscribers:
+            subscription.deliver(message)
+
+
+class InMemoryBroker(BaseBroker):
+    """Single-process broker: publishing delivers straight to local subscribers."""
+
+    def publish(self, channel, message):
+        self._fan_out(channel, message)
+
+
+class SQLiteBroker(BaseBroker):
+    """
+    Host-local broker for multiple worker processes. Publishers append
+    rows to a shared WAL-mode SQLite file; a daemon thread in every
+    process tails new rows and delivers them to that process's sockets.
+    Rows older than ``retention`` seconds are pruned.
+    """
+
+    def __init__(self, path=None, poll_interval=0.1, retention=60):
+        super().__init__()
+        self.path = str(path or settings.BASE_DIR / 'chat_pubsub.sqlite3')
+        self.poll_interval = poll_interval
+        self.retention = retention
+        self._local = threading.local()
+        self._tailer = None
+        self._stopped = threading.Event()
+
+        with self._connect() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS events ("
+                "id INTEGER PRIMARY KEY AUTOINCREMENT, "
+                "channel TEXT NOT NULL, payload TEXT NOT NULL, created REAL NOT NULL)"
+            )
+            # Only events published after this process started are relevant
+            self._last_id = conn.execute("SELECT COALESCE(MAX(id), 0) FROM events").fetchone()[0]
+
+    def _connect(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def publish(self, channel, message):
+        self._connect().execute(
+            "INSERT INTO events (channel, payload, created) VALUES (?, ?, ?)",
+            (channel, json.dumps(message), time.time()),
+        )
+
+    def subscribe(self, channel):
+        self._ensure_tailer()
+        return super().subscribe(channel)
+
+    def close(self):
+        """Stops the tailer thread; the broker delivers nothing afterwards."""
+        self._stopped.set()
+
+    def _ensure_tailer(self):
+        with self._lock:
+            if self._tailer is None or not self._tailer.is_alive():
+                self._tailer = threading.Thread(target=self._tail, name='chat-pubsub-tail', daemon=True)
+                self._tailer.start()
+
+    def _tail(self):
+        conn = self._connect()
+        last_prune = time.monotonic()
+        while not self._stopped.is_set():
+            try:
+                rows = conn.execute(
+                    "SELECT id, channel, payload FROM events WHERE id > ? ORDER BY id",
+                    (self._last_id,),
+                ).fetchall()
+                for event_id, channel, payload in rows:
+                    self._last_id = event_id
+                    if channel in self._subscribers:
+                        self._fan_out(channel, json.loads(payload))
+
+                if time.monotonic() - last_prune > self.retention:
+                    conn.execute("DELETE FROM events WHERE created < ?", (time.time() - self.retention,))
+                    last_prune = time.monotonic()
+            except sqlite3.OperationalError:
+                # Another process holds the write lock; try again next tick
+                pass
+
+            self._stopped.wait(self.poll_interval)
+
+
+@lru_cache(maxsize=None)
+def get_broker():
+    config = getattr(settings, 'CHAT_PUBSUB', {})
+    broker_class = import_string(config.get('BACKEND', 'chat.pubsub.InMemoryBroker'))
+    return broker_class(**config.get('OPTIONS', {}))
+
+
+def publish(channel, event):
+    """
+    Publishes from an ``on_commit`` hook. The message is already saved,
+    so a broker outage must not turn the request into an error: the event
+    is logged and clients pick the message up on their next poll.
+    """
+    try:
+        get_broker().publish(channel, event)
+    except Exception:
+        logger.exception("Could not publish event on %s", channel)
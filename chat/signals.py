@@ -0,0 +1,21 @@
+from django.db.models.signals import pre_delete
+from django.dispatch import receiver
+
+from .models import ChatRoom, UnreadCounter
+
+
+# ─────────────────────────────────────────────
+# Unread counter maintenance
+# ─────────────────────────────────────────────
+
+@receiver(pre_delete, sender=ChatRoom)
+def release_unread_messages(sender, instance, **kwargs):
+    """
+    Deleting a room (directly or via its product) takes its unread
+    messages with it, so both participants' counters drop accordingly.
+    """
+    for user_id in (instance.buyer_id, instance.seller_id):
+        unread = instance.messages.filter(
+            pk__gt=instance.read_through(user_id)
+        ).exclude(sender_id=user_id).count()
+        UnreadCounter.adjust(user_id, -unread)
@@ -1,3 +1,523 @@
-from django.test import TestCase
+import asyncio
+import json
+import os
+import tempfile
+import time
+from datetime import timedelta
+from unittest import mock
 
-# Create your tests here.
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from accounts.models import User
+from bingo_project.testing import QueryPlanAssertions
+from marketplace.models import Product
+from .archive import archive_messages, archive_room
+from .consumers import CLOSE_INTERNAL_ERROR, ChatSocket
+from .models import ChatRoom, Message, MessageArchive, UnreadCounter
+from .pubsub import InMemoryBroker, SQLiteBroker
+from .views import InboxView, get_poll_config
+
+
+def make_user(name):
+    return User.objects.create_user(
+        email=f'{name}@college.edu', username=name, password=None,
+        first_name=name.title(), last_name='Student',
+    )
+
+
+class InboxQueryCountTests(TestCase):
+    """The inbox must cost the same number of queries for 2 rooms or 20."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.seller = make_user('seller')
+
+    def add_rooms(self, count, messages_per_room=5):
+        for _ in range(count):
+            buyer = make_user(f'buyer{User.objects.count()}')
+            product = Product.objects.create(
+                title='Desk lamp', description='Barely used', price=10, seller=self.seller,
+            )
+            room = ChatRoom.objects.create(product=product, buyer=buyer, seller=self.seller)
+            Message.objects.bulk_create([
+                Message(room=room, sender=buyer if i % 2 else self.seller, body=f'msg {i}')
+                for i in range(messages_per_room)
+            ])
+
+    def count_inbox_queries(self):
+        self.client.force_login(self.seller)
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse('chat:inbox'))
+        self.assertEqual(response.status_code, 200)
+        return len(queries), response
+
+    def test_query_count_is_constant_in_number_of_rooms(self):
+        self.add_rooms(2)
+        self.count_inbox_queries()  # fill the catalog caches; both counts are warm
+        small, _ = self.count_inbox_queries()
+
+        self.add_rooms(18, messages_per_room=40)
+        large, response = self.count_inbox_queries()
+
+        self.assertEqual(len(response.context['rooms_data']), 20)
+        self.assertEqual(small, large)
+
+    def test_rooms_carry_last_message_and_unread_count(self):
+        self.add_rooms(1, messages_per_room=4)
+        _, response = self.count_inbox_queries()
+
+        item = response.context['rooms_data'][0]
+        room = item['room']
+        self.assertEqual(item['last_message']['body'], room.get_last_message().body)
+        self.assertEqual(item['unread_count'], room.get_unread_count(self.seller))
+        self.assertEqual(item['unread_count'], 2)
+
+    def test_inbox_is_paginated(self):
+        self.add_rooms(25, messages_per_room=1)
+        self.client.force_login(self.seller)
+        response = self.client.get(reverse('chat:inbox'), {'page': 2})
+        self.assertEqual(len(response.context['rooms_data']), 5)
+
+
+class UnreadCounterTests(TestCase):
+    """The navbar badge total must track posts, reads and deletions."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.seller, cls.buyer = make_user('seller'), make_user('buyer')
+        cls.product = Product.objects.create(title='Desk lamp', description='', price=10, seller=cls.seller)
+        cls.room = ChatRoom.objects.create(product=cls.product, buyer=cls.buyer, seller=cls.seller)
+
+    def setUp(self):
+        cache.clear()
+
+    def badge(self, user):
+        return UnreadCounter.get_for_user(user.pk)
+
+    def post(self, sender, body='hello'):
+        with self.captureOnCommitCallbacks(execute=True):
+            return self.room.post_message(sender, body)
+
+    def test_posting_counts_for_the_recipient_only(self):
+        self.assertEqual(self.badge(self.buyer), 0)
+        self.post(self.seller)
+        self.post(self.seller)
+        self.post(self.buyer)
+        self.assertEqual(self.badge(self.buyer), 2)
+        self.assertEqual(self.badge(self.seller), 1)
+
+    def test_badge_is_cached_until_the_count_changes(self):
+        self.post(self.seller)
+        self.assertEqual(self.badge(self.buyer), 1)
+        with self.assertNumQueries(0):
+            self.assertEqual(self.badge(self.buyer), 1)
+
+        self.post(self.seller)
+        self.assertEqual(self.badge(self.buyer), 2)
+
+    def test_reading_decrements(self):
+        first, second, third = (self.post(self.seller, f'msg {i}') for i in range(3))
+        with self.captureOnCommitCallbacks(execute=True):
+            self.room.mark_read(self.buyer, through=second.pk)
+        self.assertEqual(self.badge(self.buyer), 1)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.room.mark_read(self.buyer)
+        self.assertEqual(self.badge(self.buyer), 0)
+
+    def test_deleting_the_listing_releases_its_unread_messages(self):
+        other = ChatRoom.objects.create(
+            product=Product.objects.create(title='Chair', description='', price=5, seller=self.seller),
+            buyer=self.buyer, seller=self.seller,
+        )
+        with self.captureOnCommitCallbacks(execute=True):
+            other.post_message(self.seller, 'other listing')
+        self.post(self.seller)
+        self.post(self.buyer)
+        self.assertEqual(self.badge(self.buyer), 2)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.product.delete()
+        self.assertEqual(self.badge(self.buyer), 1)
+        self.assertEqual(self.badge(self.seller), 0)
+
+    def test_counter_never_goes_negative(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            UnreadCounter.adjust(self.buyer.pk, -3)
+        self.assertEqual(self.badge(self.buyer), 0)
+
+    def test_recompute_repairs_drift(self):
+        self.post(self.seller)
+        self.post(self.seller)
+        UnreadCounter.objects.filter(pk=self.buyer.pk).update(count=40)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertEqual(UnreadCounter.recompute(self.buyer.pk), 2)
+        self.assertEqual(self.badge(self.buyer), 2)
+
+
+class ReadCursorTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.seller, cls.buyer = make_user('seller'), make_user('buyer')
+        product = Product.objects.create(
+            title='Desk lamp', description='', price=10, seller=cls.seller,
+        )
+        cls.room = ChatRoom.objects.create(product=product, buyer=cls.buyer, seller=cls.seller)
+
+    def unread(self, user):
+        return UnreadCounter.objects.get(pk=user.pk).count
+
+    def test_opening_the_room_advances_the_cursor(self):
+        for i in range(3):
+            self.room.post_message(self.seller, f'still there? {i}')
+        reply = self.room.post_message(self.buyer, 'yes')
+        self.assertEqual(self.unread(self.buyer), 3)
+
+        self.client.force_login(self.buyer)
+        self.client.get(reverse('chat:chat_room', args=[self.room.pk]))
+        self.room.refresh_from_db()
+        self.assertEqual(self.room.buyer_read_through, reply.pk)
+        self.assertEqual(self.room.get_unread_count(self.buyer), 0)
+        self.assertEqual(self.unread(self.buyer), 0)
+
+        # The seller sees the receipt on their own messages
+        self.client.force_login(self.seller)
+        response = self.client.get(reverse('chat:chat_room', args=[self.room.pk]))
+        sent = [m.is_read for m in response.context['chat_messages'] if m.sender_id == self.seller.pk]
+        self.assertEqual(sent, [True, True, True])
+        self.assertEqual(self.unread(self.seller), 0)
+
+    def test_reopening_a_read_room_writes_nothing(self):
+        self.room.post_message(self.seller, 'hello')
+        self.client.force_login(self.buyer)
+        self.client.get(reverse('chat:chat_room', args=[self.room.pk]))
+
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get(reverse('chat:chat_room', args=[self.room.pk]))
+            self.client.get(reverse('chat:room_messages', args=[self.room.pk]), {'after': 0})
+        writes = [q['sql'] for q in queries if q['sql'].startswith(('UPDATE "chat_', 'INSERT INTO "chat_'))]
+        self.assertEqual(writes, [])
+
+    def test_stale_copies_count_each_message_once(self):
+        for i in range(4):
+            self.room.post_message(self.seller, f'message {i}')
+        first_tab = ChatRoom.objects.get(pk=self.room.pk)
+        second_tab = ChatRoom.objects.get(pk=self.room.pk)
+        newest = self.room.messages.order_by('-pk').first().pk
+
+        self.assertEqual(first_tab.mark_read(self.buyer, through=newest - 2), 2)
+        self.assertEqual(second_tab.mark_read(self.buyer), 2)
+        self.assertEqual(first_tab.mark_read(self.buyer, through=newest), 0)
+        self.assertEqual(self.unread(self.buyer), 0)
+
+
+class RoomPollTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.seller, cls.buyer = make_user('seller'), make_user('buyer')
+        product = Product.objects.create(title='Desk lamp', description='', price=10, seller=cls.seller)
+        cls.room = ChatRoom.objects.create(product=product, buyer=cls.buyer, seller=cls.seller)
+        cls.url = reverse('chat:room_messages', args=[cls.room.pk])
+
+    def setUp(self):
+        self.client.force_login(self.buyer)
+
+    def test_after_returns_only_newer_messages(self):
+        first, second, third = (self.room.post_message(self.seller, f'msg {i}') for i in range(3))
+        data = self.client.get(self.url, {'after': first.pk}).json()
+
+        self.assertEqual([m['id'] for m in data['messages']], [second.pk, third.pk])
+        self.assertEqual(data['latest_id'], third.pk)
+        self.assertEqual(data['retry_after'], 0)
+        self.room.refresh_from_db()
+        self.assertEqual(self.room.buyer_read_through, third.pk)
+
+    def test_invalid_params_fall_back_to_defaults(self):
+        message = self.room.post_message(self.seller, 'hello')
+        for params in ({'after': 'abc'}, {'after': '-5'}, {'after': 0, 'wait': 'soon'}, {'before': 'x'}):
+            with self.subTest(params=params):
+                data = self.client.get(self.url, params).json()
+                self.assertEqual([m['id'] for m in data['messages']], [message.pk])
+
+        self.client.force_login(make_user('outsider'))
+        self.assertEqual(self.client.get(self.url, {'after': 0}).status_code, 404)
+
+    def test_wsgi_requests_are_never_held(self):
+        message = self.room.post_message(self.seller, 'hello')
+        with mock.patch('chat.views.time', wraps=time) as clock:
+            data = self.client.get(self.url, {'after': message.pk, 'wait': 25}).json()
+        clock.sleep.assert_not_called()
+        self.assertEqual(data['messages'], [])
+        self.assertEqual(data['latest_id'], message.pk)
+        self.assertEqual(data['retry_after'], get_poll_config()['RETRY_AFTER'])
+
+    @override_settings(CHAT_POLL={'WSGI_MAX_WAIT': 5})
+    def test_long_poll_returns_as_soon_as_a_message_arrives(self):
+        message = self.room.post_message(self.seller, 'hello')
+        replies = []
+        with mock.patch('chat.views.time', wraps=time) as clock:
+            clock.sleep.side_effect = lambda seconds: replies.append(self.room.post_message(self.seller, 'hi'))
+            data = self.client.get(self.url, {'after': message.pk, 'wait': 25}).json()
+        self.assertEqual(clock.sleep.call_count, 1)
+        self.assertEqual([m['id'] for m in data['messages']], [replies[0].pk])
+
+    @override_settings(CHAT_POLL={'MAX_WAIT': 1, 'INTERVAL': 0.05})
+    async def test_asgi_long_poll_times_out_empty(self):
+        message = await sync_to_async(self.room.post_message)(self.seller, 'hello')
+        await self.async_client.aforce_login(self.buyer)
+
+        started = time.monotonic()
+        response = await self.async_client.get(self.url, {'after': message.pk, 'wait': 25})
+        elapsed = time.monotonic() - started
+
+        self.assertEqual(response.json(), {'messages': [], 'latest_id': message.pk, 'has_more': False, 'retry_after': 0})
+        self.assertGreaterEqual(elapsed, 1)  # capped at MAX_WAIT, not the 25 asked for
+        self.assertLess(elapsed, 5)
+
+
+@override_settings(CHAT_ARCHIVE={'AFTER_DAYS': 90, 'CLOSED_AFTER_DAYS': 7, 'KEEP_RECENT': 10, 'BLOCK_SIZE': 40})
+class MessageArchiveTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.seller, cls.buyer = make_user('seller'), make_user('buyer')
+
+    def make_room(self, messages, **product):
+        listing = Product.objects.create(
+            title='Desk lamp', description='', price=10, seller=self.seller, **product,
+        )
+        room = ChatRoom.objects.create(product=listing, buyer=self.buyer, seller=self.seller)
+        for i in range(messages):
+            room.post_message(self.seller if i % 2 else self.buyer, f'message {i} ✓')
+        return room
+
+    def scroll_back(self, room):
+        """Every message the chat page can reach, oldest first."""
+        self.client.force_login(self.buyer)
+        response = self.client.get(reverse('chat:chat_room', args=[room.pk]))
+        seen = [m.pk for m in response.context['chat_messages']]
+        has_more = response.context['has_older']
+        while has_more:
+            data = self.client.get(
+                reverse('chat:room_messages', args=[room.pk]), {'before': seen[0]}
+            ).json()
+            seen = [m['id'] for m in data['messages']] + seen
+            has_more = data['has_more']
+        return seen
+
+    def test_history_is_served_across_hot_rows_and_archive(self):
+        room = self.make_room(130)
+        everything = list(room.messages.order_by('pk').values_list('pk', flat=True))
+
+        self.assertEqual(archive_room(room, cutoff=timezone.now()), 120)
+        self.assertEqual(room.messages.count(), 10)
+        self.assertEqual(list(room.archives.values_list('message_count', flat=True)), [40, 40, 40])
+        self.assertEqual(self.scroll_back(room), everything)
+
+        body = self.client.get(
+            reverse('chat:room_messages', args=[room.pk]), {'before': everything[1]}
+        ).json()['messages'][0]['body']
+        self.assertEqual(body, 'message 0 ✓')
+
+    def test_new_archives_fill_the_last_block_first(self):
+        room = self.make_room(30)
+        archive_room(room, cutoff=timezone.now())
+        for i in range(25):
+            room.post_message(self.buyer, f'later {i}')
+        archive_room(room, cutoff=timezone.now())
+        self.assertEqual(list(room.archives.values_list('message_count', flat=True)), [40, 5])
+        self.assertEqual(len(self.scroll_back(room)), 55)
+
+    def test_retention_depends_on_the_listing(self):
+        open_room = self.make_room(20)
+        sold_room = self.make_room(20, is_sold=True)
+        self.assertEqual(UnreadCounter.objects.get(pk=self.buyer.pk).count, 20)
+
+        self.assertEqual(archive_messages(now=timezone.now() + timedelta(days=8)), (1, 10))
+        self.assertFalse(open_room.archives.exists())
+        self.assertEqual(sold_room.messages.count(), 10)
+        # archived messages count as read
+        self.assertEqual(UnreadCounter.objects.get(pk=self.buyer.pk).count, 15)
+
+        self.assertEqual(archive_messages(now=timezone.now() + timedelta(days=91)), (1, 10))
+        self.assertEqual(MessageArchive.objects.count(), 2)
+
+
+class ChatQueryPlanTests(QueryPlanAssertions, TestCase):
+    """Room history, polling and the inbox must stay on their indexes."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.seller = make_user('seller')
+        cls.buyer = make_user('buyer')
+        product = Product.objects.create(
+            title='Desk lamp', description='Barely used', price=10, seller=cls.seller,
+        )
+        cls.room = ChatRoom.objects.create(product=product, buyer=cls.buyer, seller=cls.seller)
+
+    def test_room_history(self):
+        history = self.room.messages.order_by('-created_at', '-pk')[:51]
+        self.assertUsesIndex(history, 'message_room_created_idx')
+
+    def test_poll_for_newer_messages(self):
+        # Seeks on (room_id, id) and sorts only the handful of new rows
+        newer = self.room.messages.filter(pk__gt=100).order_by('created_at', 'pk')[:100]
+        self.assertUsesIndex(newer, allow_sort=True)
+
+    def test_unread_messages_above_read_cursor(self):
+        # A range seek on (room_id, id), no flag to scan for
+        unread = self.room.messages.filter(pk__gt=100).exclude(sender=self.seller).order_by()
+        self.assertUsesIndex(unread)
+
+    def test_inbox(self):
+        # The OR over buyer/seller is merged from the two FK indexes,
+        # which leaves a small sort of the user's own rooms.
+        plan = self.assertUsesIndex(InboxView().get_rooms(self.seller), allow_sort=True)
+        detail = '\n'.join(plan)
+        self.assertIn('MULTI-INDEX OR', detail)
+        self.assertIn('message_room_created_idx', detail)
+        self.assertIn('(room_id=? AND rowid>?)', detail)
+
+
+class BrokerTests(TestCase):
+    """Brokers only fan events out; delivery happens on the subscriber's loop."""
+
+    async def receive_one(self, subscription):
+        return await asyncio.wait_for(subscription.get(), timeout=2)
+
+    async def test_in_memory_broker_delivers_until_unsubscribed(self):
+        broker = InMemoryBroker()
+        subscription = broker.subscribe('room:1')
+        other_room = broker.subscribe('room:2')
+
+        broker.publish('room:1', {'type': 'message', 'n': 1})
+        self.assertEqual(await self.receive_one(subscription), {'type': 'message', 'n': 1})
+        self.assertTrue(other_room.queue.empty())
+
+        subscription.close()
+        broker.publish('room:1', {'type': 'message', 'n': 2})
+        await asyncio.sleep(0)
+        self.assertTrue(subscription.queue.empty())
+        self.assertNotIn('room:1', broker._subscribers)
+
+    async def test_sqlite_broker_delivers_across_instances(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, 'pubsub.sqlite3')
+            subscriber = SQLiteBroker(path=path, poll_interval=0.01)
+            self.addCleanup(subscriber.close)
+            publisher = SQLiteBroker(path=path)
+            subscription = subscriber.subscribe('room:1')
+
+            publisher.publish('room:2', {'type': 'message', 'n': 0})
+            publisher.publish('room:1', {'type': 'message', 'n': 1})
+            self.assertEqual(await self.receive_one(subscription), {'type': 'message', 'n': 1})
+            subscription.close()
+
+    def test_publish_failure_is_logged_not_raised(self):
+        seller, buyer = make_user('seller'), make_user('buyer')
+        product = Product.objects.create(title='Desk lamp', description='', price=10, seller=seller)
+        room = ChatRoom.objects.create(product=product, buyer=buyer, seller=seller)
+
+        with mock.patch.object(InMemoryBroker, 'publish', side_effect=OSError('broker down')):
+            with self.assertLogs('chat.pubsub', 'ERROR'):
+                with self.captureOnCommitCallbacks(execute=True):
+                    message = room.post_message(buyer, 'still available?')
+        self.assertTrue(Message.objects.filter(pk=message.pk).exists())
+
+
+class SocketClient:
+    """Drives ``ChatSocket`` through the ASGI interface, like a browser would."""
+
+    def __init__(self, path, cookie='', origin=None):
+        headers = [(b'host', b'testserver'), (b'cookie', cookie.encode())]
+        if origin:
+            headers.append((b'origin', origin.encode()))
+        self.scope = {'type': 'websocket', 'path': path, 'headers': headers}
+        self.incoming = asyncio.Queue()
+        self.outgoing = asyncio.Queue()
+        self.task = None
+
+    async def connect(self):
+        self.task = asyncio.ensure_future(ChatSocket()(self.scope, self.incoming.get, self.outgoing.put))
+        await self.incoming.put({'type': 'websocket.connect'})
+        return await self.receive()
+
+    async def receive(self):
+        return await asyncio.wait_for(self.outgoing.get(), timeout=2)
+
+    async def receive_json(self):
+        return json.loads((await self.receive())['text'])
+
+    async def send_json(self, data):
+        await self.incoming.put({'type': 'websocket.receive', 'text': json.dumps(data)})
+
+    async def disconnect(self):
+        await self.incoming.put({'type': 'websocket.disconnect', 'code': 1000})
+        await asyncio.wait_for(self.task, timeout=2)
+
+
+class ChatSocketTests(TransactionTestCase):
+    """
+    Transaction test case: the socket's ORM calls run in worker threads and
+    close their connections afterwards, which a wrapping atomic block forbids.
+    """
+
+    def setUp(self):
+        self.seller, self.buyer = make_user('seller'), make_user('buyer')
+        product = Product.objects.create(title='Desk lamp', description='', price=10, seller=self.seller)
+        self.room = ChatRoom.objects.create(product=product, buyer=self.buyer, seller=self.seller)
+        self.path = f'/ws/chat/{self.room.pk}/'
+
+    def session_cookie(self, user):
+        self.client.force_login(user)
+        return f'{settings.SESSION_COOKIE_NAME}={self.client.cookies[settings.SESSION_COOKIE_NAME].value}'
+
+    async def test_sent_frame_is_saved_and_echoed(self):
+        socket = SocketClient(self.path, await sync_to_async(self.session_cookie)(self.buyer))
+        self.assertEqual(await socket.connect(), {'type': 'websocket.accept'})
+
+        await socket.send_json({'body': 'still available?'})
+        event = await socket.receive_json()
+        self.assertEqual(event['type'], 'message')
+        self.assertEqual(event['message']['body'], 'still available?')
+        self.assertTrue(event['message']['mine'])
+        await socket.disconnect()
+
+        self.assertEqual(await Message.objects.filter(room=self.room).acount(), 1)
+        self.assertEqual((await UnreadCounter.objects.aget(pk=self.seller.pk)).count, 1)
+
+    async def test_empty_body_returns_an_error_frame(self):
+        socket = SocketClient(self.path, await sync_to_async(self.session_cookie)(self.buyer))
+        await socket.connect()
+        await socket.send_json({'body': '   '})
+        self.assertEqual((await socket.receive_json())['type'], 'error')
+        await socket.disconnect()
+        self.assertFalse(await Message.objects.aexists())
+
+    async def test_outsiders_and_cross_site_handshakes_are_refused(self):
+        outsider = await sync_to_async(make_user)('outsider')
+        refused = {'type': 'websocket.close', 'code': 4403}
+
+        socket = SocketClient(self.path, await sync_to_async(self.session_cookie)(outsider))
+        self.assertEqual(await socket.connect(), refused)
+        socket = SocketClient(self.path)
+        self.assertEqual(await socket.connect(), refused)
+        socket = SocketClient(
+            self.path, await sync_to_async(self.session_cookie)(self.buyer), origin='https://evil.example',
+        )
+        self.assertEqual(await socket.connect(), refused)
+
+    async def test_socket_closes_when_delivery_stops(self):
+        socket = SocketClient(self.path, await sync_to_async(self.session_cookie)(self.buyer))
+        with mock.patch.object(ChatSocket, 'forward_events', side_effect=RuntimeError('subscription lost')):
+            with self.assertLogs('chat.consumers', 'ERROR'):
+                await socket.connect()
+                self.assertEqual(await socket.receive(), {'type': 'websocket.close', 'code': CLOSE_INTERNAL_ERROR})
+                await asyncio.wait_for(socket.task, timeout=2)
@@ -12,4 +12,7 @@ urlpatterns = [
 
     # Chat room — read and send messages
     path('room/<int:room_pk>/', views.ChatRoomView.as_view(), name='chat_room'),
+
+    # JSON polling / history API for a chat room
+    path('room/<int:room_pk>/messages/', views.RoomMessagesView.as_view(), name='room_messages'),
 ]
\ No newline at end of file
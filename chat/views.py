@@ -1,12 +1,22 @@
+import time
+
+from django.conf import settings
 from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
 from django.utils.decorators import method_decorator
 from django.views import View
-from django.http import Http404
-from django.db.models import Q
+from django.http import Http404, JsonResponse
+from django.core.handlers.asgi import ASGIRequest
+from django.core.paginator import Paginator
+from django.db.models import Case, Count, F, IntegerField, Max, OuterRef, Q, Subquery, When
+from django.db.models.functions import Coalesce
 
-from .models import ChatRoom, Message
+from .archive import older_messages
+from .models import ChatRoom, Message, UnreadCounter
+from accounts.models import User
+from bingo_project.conditional import ConditionalGetMixin
+from marketplace import cache as catalog_cache
 from marketplace.models import Product
 
 
@@ -45,36 +55,50 @@ def start_chat(request, product_pk):
 # Chat Room View
 # ─────────────────────────────────────────────
 
+class RoomParticipantMixin:
+    """Loads a chat room, restricted to its buyer and seller."""
+
+    def get_room(self, room_pk, user):
+        """Fetch room and verify the user is a participant."""
+        room = get_object_or_404(
+            ChatRoom.objects.select_related('buyer', 'seller', 'product__cover_image'), pk=room_pk
+        )
+        if user != room.buyer and user != room.seller:
+            raise Http404("You do not have access to this conversation.")
+        return room
+
+
 @method_decorator(login_required, name='dispatch')
-class ChatRoomView(View):
+class ChatRoomView(RoomParticipantMixin, View):
     """
-    Displays all messages in a chat room and handles
+    Displays the latest messages in a chat room and handles
     sending new messages. Only the buyer and seller
     of that specific room can access it.
     """
     template_name = 'chat/chat_room.html'
 
-    def get_room(self, room_pk, user):
-        """Fetch room and verify the user is a participant."""
-        room = get_object_or_404(ChatRoom, pk=room_pk)
-        if user != room.buyer and user != room.seller:
-            raise Http404("You do not have access to this conversation.")
-        return room
+    # Older history is fetched on demand through RoomMessagesView
+    history_limit = 50
 
     def get(self, request, room_pk):
         room = self.get_room(room_pk, request.user)
 
-        # Mark all messages from the OTHER user as read
-        room.messages.filter(
-            is_read=False
-        ).exclude(sender=request.user).update(is_read=True)
-
-        chat_messages = room.messages.select_related('sender').all()
+        chat_messages = list(
+            room.messages.select_related('sender').order_by('-created_at', '-pk')[:self.history_limit + 1]
+        )
+        has_older = len(chat_messages) > self.history_limit or bool(room.archived_through)
+        chat_messages = chat_messages[:self.history_limit][::-1]
+        if chat_messages:
+            # No write at all when the viewer's cursor is already there
+            room.mark_read(request.user, through=chat_messages[-1].pk)
         other_user = room.get_other_user(request.user)
 
         context = {
             'room': room,
             'chat_messages': chat_messages,
+            'has_older': has_older,
+            'oldest_id': chat_messages[0].pk if chat_messages else 0,
+            'latest_id': chat_messages[-1].pk if chat_messages else 0,
             'other_user': other_user,
             'product': room.product,
         }
@@ -84,60 +108,185 @@ class ChatRoomView(View):
         room = self.get_room(room_pk, request.user)
         body = request.POST.get('body', '').strip()
 
+        wants_json = 'application/json' in request.headers.get('Accept', '')
+
         if body:
-            Message.objects.create(
-                room=room,
-                sender=request.user,
-                body=body
-            )
-            # Bump the room's updated_at so it appears at top of inbox
-            room.save()
+            message = room.post_message(request.user, body)
+            if wants_json:
+                return JsonResponse({'message': message.to_dict(request.user)}, status=201)
         else:
+            if wants_json:
+                return JsonResponse({'error': "Cannot send an empty message."}, status=400)
             messages.warning(request, "Cannot send an empty message.")
 
         return redirect('chat:chat_room', room_pk=room.pk)
 
 
+# ─────────────────────────────────────────────
+# Incremental Message API (polling)
+# ─────────────────────────────────────────────
+
+# Long-polling holds a thread for the whole wait. Under ASGI that is an
+# executor thread; under WSGI it would be one of a handful of worker
+# processes, so WSGI requests are answered at once and the client is
+# told to come back after RETRY_AFTER seconds instead.
+POLL_DEFAULTS = {
+    'MAX_WAIT': 25,         # longest hold under ASGI, seconds
+    'WSGI_MAX_WAIT': 0,     # longest hold under WSGI
+    'INTERVAL': 1.0,        # database checks while holding
+    'RETRY_AFTER': 3,       # client pause after a poll that could not wait
+}
+
+
+def get_poll_config():
+    return {**POLL_DEFAULTS, **getattr(settings, 'CHAT_POLL', {})}
+
+
+@method_decorator(login_required, name='dispatch')
+class RoomMessagesView(RoomParticipantMixin, View):
+    """
+    JSON feed of a room's messages so the chat page only transfers
+    what changed:
+
+    * ``?after=<id>``            — messages newer than ``id`` (oldest first)
+    * ``?after=<id>&wait=<s>``   — long-poll: hold the request up to ``s``
+                                   seconds until something newer arrives
+                                   (ASGI only, see ``POLL_DEFAULTS``)
+    * ``?before=<id>``           — the page of history just older than ``id``,
+                                   archived messages included
+
+    ``retry_after`` in the response is how long the client should pause
+    before polling again.
+    """
+    page_size = 50
+
+    def get(self, request, room_pk):
+        room = self.get_room(room_pk, request.user)
+        before = parse_int_param(request.GET.get('before'))
+
+        if before is not None:
+            # Continues into the compressed archive (chat.archive) when needed
+            chat_messages, has_more = older_messages(room, before, self.page_size)
+            return JsonResponse({
+                'messages': [m.to_dict(request.user) for m in chat_messages],
+                'has_more': has_more,
+            })
+
+        config = get_poll_config()
+        after = parse_int_param(request.GET.get('after')) or 0
+        requested = parse_int_param(request.GET.get('wait')) or 0
+        max_wait = config['MAX_WAIT'] if isinstance(request, ASGIRequest) else config['WSGI_MAX_WAIT']
+        wait = min(requested, max_wait)
+        newer = room.messages.filter(pk__gt=after)
+
+        deadline = time.monotonic() + wait
+        while not newer.exists() and time.monotonic() < deadline:
+            time.sleep(config['INTERVAL'])
+
+        chat_messages = list(newer.order_by('created_at', 'pk')[:self.page_size])
+        if chat_messages:
+            room.mark_read(request.user, through=chat_messages[-1].pk)
+
+        return JsonResponse({
+            'messages': [m.to_dict(request.user) for m in chat_messages],
+            'latest_id': chat_messages[-1].pk if chat_messages else after,
+            'has_more': len(chat_messages) == self.page_size,
+            # A long-poll this server could not hold: don't spin on it
+            'retry_after': config['RETRY_AFTER'] if requested and not wait and not chat_messages else 0,
+        })
+
+
+def parse_int_param(value):
+    """Non-negative integer from a query parameter, or None."""
+    try:
+        value = int(value)
+    except (TypeError, ValueError):
+        return None
+    return value if value >= 0 else None
+
+
+
 # ─────────────────────────────────────────────
 # Inbox View
 # ─────────────────────────────────────────────
 
 @method_decorator(login_required, name='dispatch')
-class InboxView(View):
+class InboxView(ConditionalGetMixin, View):
     """
     Shows all chat conversations for the logged-in user —
     both as a buyer and as a seller.
+    Built from one annotated queryset (last message + unread count per
+    room as subqueries), so the query count does not grow with the
+    number of conversations.
     """
     template_name = 'chat/inbox.html'
+    paginate_by = 20
 
-    def get(self, request):
-        user = request.user
-
-        # Get all rooms where the user is either buyer or seller
+    def get_etag_parts(self, request):
+        # New messages touch their room's updated_at; reading them changes
+        # the viewer's unread count, which every ETag already covers
         rooms = ChatRoom.objects.filter(
+            Q(buyer=request.user) | Q(seller=request.user)
+        ).aggregate(latest=Max('updated_at'), count=Count('pk'))
+        # Product titles and photos come from the catalog
+        return [rooms['latest'], rooms['count'], catalog_cache.get_version(catalog_cache.LISTINGS)]
+
+    def get_rooms(self, user):
+        latest = Message.objects.filter(
+            room=OuterRef('pk')
+        ).order_by('-created_at', '-pk')
+
+        # Messages from the other side above the user's read cursor
+        unread = Message.objects.filter(
+            room=OuterRef('pk'), pk__gt=OuterRef('viewer_read_through')
+        ).exclude(sender=user).order_by().values('room').annotate(
+            n=Count('pk')
+        ).values('n')
+
+        return ChatRoom.objects.filter(
             Q(buyer=user) | Q(seller=user)
         ).select_related(
-            'buyer', 'seller', 'product'
-        ).prefetch_related(
-            'messages', 'product__images'
-        ).order_by('-updated_at')
+            'buyer', 'seller', 'product__cover_image'
+        ).defer(
+            *User.deferred_profile('buyer'), *User.deferred_profile('seller')
+        ).annotate(
+            viewer_read_through=Case(
+                When(buyer=user, then=F('buyer_read_through')),
+                default=F('seller_read_through'),
+            ),
+            last_message_id=Subquery(latest.values('pk')[:1]),
+            last_message_body=Subquery(latest.values('body')[:1]),
+            last_message_at=Subquery(latest.values('created_at')[:1]),
+            last_message_sender_id=Subquery(latest.values('sender_id')[:1]),
+            unread_count=Coalesce(Subquery(unread, output_field=IntegerField()), 0),
+        ).order_by('-updated_at', '-pk')
+
+    def get(self, request):
+        user = request.user
+        page = Paginator(self.get_rooms(user), self.paginate_by).get_page(request.GET.get('page'))
 
-        # Annotate each room with unread count for template use
         rooms_data = []
-        total_unread = 0
-        for room in rooms:
-            unread = room.get_unread_count(user)
-            total_unread += unread
+        for room in page:
+            last_message = None
+            if room.last_message_id:
+                last_message = {
+                    'pk': room.last_message_id,
+                    'body': room.last_message_body,
+                    'created_at': room.last_message_at,
+                    'sender_id': room.last_message_sender_id,
+                }
             rooms_data.append({
                 'room': room,
                 'other_user': room.get_other_user(user),
-                'last_message': room.get_last_message(),
-                'unread_count': unread,
+                'last_message': last_message,
+                'unread_count': room.unread_count,
+                'product_image': room.product.cover_image,
             })
 
         context = {
             'rooms_data': rooms_data,
-            'total_unread': total_unread,
+            'page_obj': page,
+            'total_unread': UnreadCounter.get_for_user(user.pk),
             'has_conversations': len(rooms_data) > 0,
         }
-        return render(request, self.template_name, context)
\ No newline at end of file
+        return render(request, self.template_name, context)
@@ -0,0 +1,16 @@
+from django.contrib import admin
+from .models import Job
+
+
+@admin.register(Job)
+class JobAdmin(admin.ModelAdmin):
+    list_display = ['task', 'status', 'attempts', 'max_attempts', 'run_at', 'updated_at']
+    list_filter = ['status', 'task']
+    search_fields = ['task', 'last_error']
+    readonly_fields = ['created_at', 'updated_at', 'locked_by', 'locked_at']
+    actions = ['requeue']
+
+    @admin.action(description="Re-queue selected jobs now")
+    def requeue(self, request, queryset):
+        from django.utils import timezone
+        queryset.update(status=Job.QUEUED, run_at=timezone.now(), attempts=0, locked_by='', locked_at=None)
@@ -0,0 +1,37 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from jobs.queue import purge_finished, run_pending
+
+
+class Command(BaseCommand):
+    help = "Processes queued background jobs. Run one or more of these next to the web server."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--once', action='store_true', help="Drain due jobs and exit.")
+        parser.add_argument('--sleep', type=float, default=1.0, help="Idle poll interval in seconds.")
+        parser.add_argument('--batch', type=int, default=50, help="Jobs to run between connection checks.")
+        parser.add_argument(
+            '--purge', action='store_true',
+            help="Delete finished jobs older than JOBS_RETENTION_DAYS and exit (run daily from cron).",
+        )
+
+    def handle(self, *args, **options):
+        if options['purge']:
+            deleted = purge_finished()
+            self.stdout.write(self.style.SUCCESS(f"Deleted {deleted} finished job(s)."))
+            return
+
+        total = 0
+        while True:
+            close_old_connections()
+            ran = run_pending(limit=options['batch'])
+            total += ran
+            if options['once'] and not ran:
+                break
+            if not ran:
+                time.sleep(options['sleep'])
+
+        self.stdout.write(self.style.SUCCESS(f"Processed {total} job(s)."))
@@ -0,0 +1,220 @@
+"""
+A small database-backed job queue.
+
+Declare work with ``@task`` and enqueue it with ``func.delay(*args)``::
+
+    @task(max_attempts=3)
+    def build_image_derivatives(image_id):
+        ...
+
+    build_image_derivatives.delay(image.pk)
+
+Jobs are stored in ``jobs.Job`` when the surrounding transaction commits
+and are executed according to ``settings.JOBS_EXECUTOR``:
+
+* ``'worker'``    — rows only; ``manage.py run_jobs`` processes them.
+* ``'thread'``    — an in-process thread pool runs them (development).
+* ``'immediate'`` — run inline right after commit (tests, scripts).
+
+Failed jobs are retried with exponential backoff plus jitter until they
+reach ``max_attempts``, then kept as ``failed`` with the last traceback.
+A job whose worker died counts that run as an attempt too. Finished
+jobs are deleted after ``settings.JOBS_RETENTION_DAYS`` by
+``manage.py run_jobs --purge``.
+"""
+import os
+import random
+import socket
+import threading
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import connections, transaction
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+from .models import Job
+
+
+BACKOFF_BASE_SECONDS = 5
+BACKOFF_MAX_SECONDS = 3600
+# A running job whose worker vanished is handed out again after this long
+STALE_LOCK_SECONDS = 600
+RETENTION_DAYS = 7
+
+
+def task(max_attempts=5):
+    """Marks a function as runnable by the queue and adds ``.delay()``."""
+    def decorator(func):
+        func.task_name = f'{func.__module__}.{func.__name__}'
+        func.max_attempts = max_attempts
+        func.delay = lambda *args, **kwargs: enqueue(func, *args, **kwargs)
+        return func
+    return decorator
+
+
+def enqueue(func, *args, **kwargs):
+    """Stores a job for ``func`` and hands it to the executor after commit."""
+    job = Job.objects.create(
+        task=func.task_name,
+        args=list(args),
+        kwargs=kwargs,
+        max_attempts=func.max_attempts,
+    )
+    transaction.on_commit(_dispatch)
+    return job
+
+
+def worker_id():
+    return f'{socket.gethostname()}:{os.getpid()}:{threading.get_ident()}'
+
+
+def claim_next(worker=None):
+    """
+    Atomically takes the next due job. The conditional UPDATE means two
+    workers can race for the same row and only one of them wins.
+
+    A job still marked running after ``STALE_LOCK_SECONDS`` lost its
+    worker; taking it over counts the lost run as an attempt, and one
+    that has used up its attempts that way is marked failed instead.
+    """
+    worker = worker or worker_id()
+    now = timezone.now()
+    stale = now - timedelta(seconds=STALE_LOCK_SECONDS)
+
+    for _ in range(5):
+        candidate = (
+            Job.objects.filter(status=Job.QUEUED, run_at__lte=now).order_by('run_at', 'pk').first()
+            or Job.objects.filter(status=Job.RUNNING, locked_at__lt=stale).order_by('locked_at').first()
+        )
+        if candidate is None:
+            return None
+        # Matching the lock too means only one worker takes over a stale job
+        unchanged = Job.objects.filter(
+            pk=candidate.pk, status=candidate.status,
+            attempts=candidate.attempts, locked_at=candidate.locked_at,
+        )
+        attempts = candidate.attempts
+        if candidate.status == Job.RUNNING:
+            attempts += 1
+            if attempts >= candidate.max_attempts:
+                unchanged.update(
+                    status=Job.FAILED, attempts=attempts, locked_by='', locked_at=None, updated_at=now,
+                    last_error=f"Worker {candidate.locked_by} stopped while running this job.",
+                )
+                continue
+        claimed = unchanged.update(
+            status=Job.RUNNING, attempts=attempts, locked_by=worker, locked_at=now, updated_at=now,
+        )
+        if claimed:
+            candidate.refresh_from_db()
+            return candidate
+    return None
+
+
+def purge_finished(days=None):
+    """Deletes done and failed jobs last updated over ``days`` ago. Returns the count."""
+    if days is None:
+        days = getattr(settings, 'JOBS_RETENTION_DAYS', RETENTION_DAYS)
+    cutoff = timezone.now() - timedelta(days=days)
+    deleted, _ = Job.objects.filter(
+        status__in=[Job.DONE, Job.FAILED], updated_at__lt=cutoff,
+    ).delete()
+    return deleted
+
+
+def backoff_delay(attempts):
+    delay = min(BACKOFF_BASE_SECONDS * 2 ** (attempts - 1), BACKOFF_MAX_SECONDS)
+    return delay * random.uniform(0.8, 1.2)
+
+
+def run_job(job):
+    """Executes a claimed job and records the outcome. Returns True on success."""
+    try:
+        func = import_string(job.task)
+        if getattr(func, 'task_name', None) != job.task:
+            raise ImportError(f"{job.task} is not a registered task")
+        func(*job.args, **job.kwargs)
+    except Exception:
+        job.attempts += 1
+        job.last_error = traceback.format_exc()
+        if job.attempts >= job.max_attempts:
+            job.status = Job.FAILED
+        else:
+            job.status = Job.QUEUED
+            job.run_at = timezone.now() + timedelta(seconds=backoff_delay(job.attempts))
+        job.locked_by = ''
+        job.locked_at = None
+        job.save()
+        if job.status == Job.QUEUED:
+            _schedule_retry(job.run_at)
+        return False
+
+    job.attempts += 1
+    job.status = Job.DONE
+    job.locked_by = ''
+    job.locked_at = None
+    job.save()
+    return True
+
+
+def run_pending(limit=None):
+    """Runs due jobs until none are left (or ``limit`` ran). Returns the count."""
+    ran = 0
+    worker = worker_id()
+    while limit is None or ran < limit:
+        job = claim_next(worker)
+        if job is None:
+            break
+        run_job(job)
+        ran += 1
+    return ran
+
+
+# ─────────────────────────────────────────────
+# Executors
+# ─────────────────────────────────────────────
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def _executor_mode():
+    return getattr(settings, 'JOBS_EXECUTOR', 'worker')
+
+
+def _get_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ThreadPoolExecutor(
+                max_workers=getattr(settings, 'JOBS_THREADS', 2),
+                thread_name_prefix='jobs',
+            )
+        return _pool
+
+
+def _run_in_thread():
+    try:
+        run_pending()
+    finally:
+        connections.close_all()  # this thread's connections only
+
+
+def _dispatch():
+    mode = _executor_mode()
+    if mode == 'immediate':
+        run_pending()
+    elif mode == 'thread':
+        _get_pool().submit(_run_in_thread)
+
+
+def _schedule_retry(run_at):
+    if _executor_mode() != 'thread':
+        return  # the worker command polls for due retries itself
+    delay = max((run_at - timezone.now()).total_seconds(), 0)
+    timer = threading.Timer(delay, lambda: _get_pool().submit(_run_in_thread))
+    timer.daemon = True
+    timer.start()
@@ -0,0 +1,102 @@
+from datetime import timedelta
+from io import StringIO
+
+from django.core.management import call_command
+from django.test import TestCase
+from django.utils import timezone
+
+from accounts.models import User
+from marketplace.models import Product
+from .models import Job
+from .queue import STALE_LOCK_SECONDS, claim_next, purge_finished, run_job, task
+
+
+calls = []
+
+
+@task(max_attempts=2)
+def flaky(fail):
+    calls.append(fail)
+    if fail:
+        raise ValueError('boom')
+
+
+class JobQueueTests(TestCase):
+    def setUp(self):
+        calls.clear()
+
+    def test_claim_runs_a_job_once(self):
+        job = flaky.delay(False)
+        claimed = claim_next('worker-1')
+        self.assertEqual(claimed.pk, job.pk)
+        self.assertEqual((claimed.status, claimed.locked_by), (Job.RUNNING, 'worker-1'))
+        self.assertIsNone(claim_next('worker-2'))
+
+        self.assertTrue(run_job(claimed))
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts, calls), (Job.DONE, 1, [False]))
+
+    def test_failures_back_off_then_fail(self):
+        job = flaky.delay(True)
+        before = timezone.now()
+        self.assertFalse(run_job(claim_next()))
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts), (Job.QUEUED, 1))
+        self.assertGreaterEqual(job.run_at, before + timedelta(seconds=4))
+        self.assertIn('ValueError: boom', job.last_error)
+        self.assertIsNone(claim_next())  # not due yet
+
+        Job.objects.filter(pk=job.pk).update(run_at=timezone.now())
+        self.assertFalse(run_job(claim_next()))
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts), (Job.FAILED, 2))
+        self.assertIsNone(claim_next())
+
+    def test_stale_job_is_taken_over_once_and_counted(self):
+        job = flaky.delay(False)
+        claim_next('dead-worker')
+        stale = timezone.now() - timedelta(seconds=STALE_LOCK_SECONDS + 1)
+        Job.objects.filter(pk=job.pk).update(locked_at=stale)
+
+        taken = claim_next('worker-1')
+        self.assertEqual((taken.locked_by, taken.attempts), ('worker-1', 1))
+        self.assertIsNone(claim_next('worker-2'))  # locked afresh
+
+        # worker-1 died too, on the last allowed attempt
+        Job.objects.filter(pk=job.pk).update(locked_at=stale)
+        self.assertIsNone(claim_next('worker-3'))
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts), (Job.FAILED, 2))
+        self.assertIn('stopped while running', job.last_error)
+
+    def test_purge_deletes_only_old_finished_jobs(self):
+        old = timezone.now() - timedelta(days=8)
+        done, failed, queued, recent = [flaky.delay(False) for _ in range(4)]
+        Job.objects.filter(pk=done.pk).update(status=Job.DONE, updated_at=old)
+        Job.objects.filter(pk=failed.pk).update(status=Job.FAILED, updated_at=old)
+        Job.objects.filter(pk=queued.pk).update(updated_at=old)
+        Job.objects.filter(pk=recent.pk).update(status=Job.DONE)
+
+        self.assertEqual(purge_finished(), 2)
+        self.assertEqual(set(Job.objects.values_list('pk', flat=True)), {queued.pk, recent.pk})
+        out = StringIO()
+        call_command('run_jobs', purge=True, stdout=out)
+        self.assertIn('Deleted 0 finished job(s).', out.getvalue())
+
+
+class SearchIndexJobTests(TestCase):
+    def test_only_searchable_changes_enqueue_an_index_job(self):
+        seller = User.objects.create_user(email='seller@college.edu', username='seller', password=None)
+        product = Product.objects.create(title='Desk lamp', description='', price=10, seller=seller)
+        self.assertEqual(Job.objects.count(), 1)
+
+        product = Product.objects.get(pk=product.pk)
+        product.price = 8
+        product.save()
+        self.assertEqual(Job.objects.count(), 1)
+
+        product.title = 'Reading lamp'
+        product.save()
+        product.is_sold = True  # leaves the index
+        product.save()
+        self.assertEqual(Job.objects.count(), 3)
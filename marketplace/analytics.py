@@ -0,0 +1,263 @@
+"""
+Listing view counts with write-behind aggregation.
+
+``ProductDetailView`` records each view in a per-process buffer instead
+of writing to the database, which on SQLite would take the single writer
+lock on every page view. A background thread flushes the buffer every
+``FLUSH_INTERVAL`` seconds, the request that brings it to
+``MAX_PENDING`` views flushes it early, and it is flushed once more
+when the process exits:
+
+* totals go out as one ``UPDATE ... SET view_count = view_count + n``
+  per distinct ``n``, however many listings were viewed;
+* unique viewers are tracked per listing per day in a 1 KB HyperLogLog
+  sketch (``ProductViewDay``), merged into the stored sketch on flush;
+* ``Product.recent_viewer_count`` is re-estimated from the last
+  ``RECENT_DAYS`` sketches of the listings touched.
+
+A flush that fails (database down, lock timeout) is logged and its
+views go back into the buffer for the next one; it never fails the page.
+Only a process killed outright loses what it had buffered, at the
+default interval at most half a minute of views. Configure with
+``settings.VIEW_COUNTS``::
+
+    VIEW_COUNTS = {
+        'ENABLED': True,
+        'FLUSH_INTERVAL': 30,   # seconds
+        'MAX_PENDING': 1000,    # buffered views that force a flush
+    }
+"""
+import atexit
+import hashlib
+import logging
+import math
+import threading
+import time
+from collections import defaultdict
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import DatabaseError, connection, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .models import Product, ProductViewDay
+
+
+DEFAULTS = {
+    'ENABLED': True,
+    'FLUSH_INTERVAL': 30,
+    'MAX_PENDING': 1000,
+}
+RECENT_DAYS = 30
+HLL_PRECISION = 10  # 1024 one-byte registers, ~3% standard error
+
+logger = logging.getLogger(__name__)
+
+
+def get_config():
+    return {**DEFAULTS, **getattr(settings, 'VIEW_COUNTS', {})}
+
+
+# ─────────────────────────────────────────────
+# HyperLogLog
+# ─────────────────────────────────────────────
+
+class HyperLogLog:
+    """Cardinality sketch: estimates distinct values added in fixed space."""
+
+    def __init__(self, registers=None, precision=HLL_PRECISION):
+        self.precision = precision
+        self.size = 1 << precision
+        self.registers = bytearray(registers) if registers else bytearray(self.size)
+
+    @classmethod
+    def from_bytes(cls, data):
+        return cls(data, precision=int(math.log2(len(data))))
+
+    def to_bytes(self):
+        return bytes(self.registers)
+
+    def add(self, value):
+        digest = hashlib.blake2b(str(value).encode(), digest_size=8).digest()
+        h = int.from_bytes(digest, 'big')
+        bits = 64 - self.precision
+        index = h >> bits
+        rest = h & ((1 << bits) - 1)
+        rank = bits - rest.bit_length() + 1  # position of the first 1 bit
+        if rank > self.registers[index]:
+            self.registers[index] = rank
+
+    def merge(self, other):
+        """In-place union with another sketch of the same precision."""
+        self.registers = bytearray(map(max, self.registers, other.registers))
+
+    def count(self):
+        m = self.size
+        alpha = 0.7213 / (1 + 1.079 / m)
+        estimate = alpha * m * m / sum(2.0 ** -r for r in self.registers)
+        zeros = self.registers.count(0)
+        if estimate <= 2.5 * m and zeros:
+            estimate = m * math.log(m / zeros)  # small-range correction
+        return round(estimate)
+
+
+# ─────────────────────────────────────────────
+# Buffer
+# ─────────────────────────────────────────────
+
+def viewer_key(request):
+    """Stable identity for dedup: the user, else the session, else IP + agent."""
+    if request.user.is_authenticated:
+        return f'u{request.user.pk}'
+    if request.session.session_key:
+        return f's{request.session.session_key}'
+    return f"a{request.META.get('REMOTE_ADDR', '')}|{request.META.get('HTTP_USER_AGENT', '')}"
+
+
+class ViewBuffer:
+    """Thread-safe per-process buffer of (listing, day) -> views and viewers."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._pending = {}
+        self._views = 0
+        self._last_flush = time.monotonic()
+        self._flusher = None
+
+    def record(self, product_id, viewer):
+        config = get_config()
+        if not config['ENABLED']:
+            return
+        key = (product_id, timezone.localdate())
+        with self._lock:
+            entry = self._pending.get(key)
+            if entry is None:
+                entry = self._pending[key] = [0, HyperLogLog()]
+            entry[0] += 1
+            entry[1].add(viewer)
+            self._views += 1
+            due = self._views >= config['MAX_PENDING']
+            self._start_flusher()
+        if due:
+            self.flush()
+
+    def _start_flusher(self):
+        # Started lazily, so each worker forked from a preloaded parent gets its own
+        if self._flusher is None or not self._flusher.is_alive():
+            self._flusher = threading.Thread(
+                target=self._run_flusher, name='view-count-flusher', daemon=True,
+            )
+            self._flusher.start()
+
+    def _run_flusher(self):
+        while True:
+            interval = get_config()['FLUSH_INTERVAL']
+            time.sleep(max(interval - (time.monotonic() - self._last_flush), 1))
+            if time.monotonic() - self._last_flush >= interval:
+                self.flush()
+                connection.close()  # this thread's own connection
+
+    def take(self):
+        with self._lock:
+            pending, self._pending = self._pending, {}
+            self._views = 0
+            self._last_flush = time.monotonic()
+        return pending
+
+    def restore(self, pending):
+        """Puts views from a failed flush back, merged with any recorded since."""
+        with self._lock:
+            for key, (views, sketch) in pending.items():
+                entry = self._pending.get(key)
+                if entry is None:
+                    self._pending[key] = [views, sketch]
+                else:
+                    entry[0] += views
+                    entry[1].merge(sketch)
+                self._views += views
+
+    def flush(self):
+        """Writes everything buffered so far; returns the number of listings touched."""
+        pending = self.take()
+        if not pending:
+            return 0
+        try:
+            write_views(pending)
+        except DatabaseError:
+            logger.exception("Could not write %d buffered listing views; retrying on the next flush",
+                             sum(views for views, _ in pending.values()))
+            self.restore(pending)
+            return 0
+        return len({product_id for product_id, _ in pending})
+
+    def clear(self):
+        self.take()
+
+
+view_buffer = ViewBuffer()
+atexit.register(view_buffer.flush)
+
+
+def record_view(request, product_id):
+    view_buffer.record(product_id, viewer_key(request))
+
+
+# ─────────────────────────────────────────────
+# Writing
+# ─────────────────────────────────────────────
+
+def write_views(pending):
+    """Applies buffered ``{(product_id, day): [views, sketch]}`` in one transaction."""
+    totals = defaultdict(int)
+    for (product_id, _), (views, _) in pending.items():
+        totals[product_id] += views
+
+    with transaction.atomic():
+        # Listings deleted since they were viewed are dropped
+        existing = set(Product.objects.filter(pk__in=totals).values_list('pk', flat=True))
+        by_increment = defaultdict(list)
+        for product_id in existing:
+            by_increment[totals[product_id]].append(product_id)
+        for increment, product_ids in by_increment.items():
+            Product.objects.filter(pk__in=product_ids).update(view_count=F('view_count') + increment)
+
+        # Make sure every (listing, day) row exists, then lock and merge into
+        # them: two processes flushing a listing's first views of the day
+        # must not both try to insert it
+        keys = [key for key in pending if key[0] in existing]
+        ProductViewDay.objects.bulk_create([
+            ProductViewDay(product_id=product_id, day=day, views=0, sketch=HyperLogLog().to_bytes())
+            for product_id, day in keys
+        ], ignore_conflicts=True)
+        stored = {
+            (row.product_id, row.day): row
+            for row in ProductViewDay.objects.select_for_update().filter(
+                product_id__in=existing, day__in={day for _, day in keys},
+            )
+        }
+        for key in keys:
+            views, sketch = pending[key]
+            row = stored[key]
+            sketch.merge(HyperLogLog.from_bytes(row.sketch))
+            row.views += views
+            row.sketch = sketch.to_bytes()
+        ProductViewDay.objects.bulk_update([stored[key] for key in keys], ['views', 'sketch'])
+
+        refresh_recent_viewers(existing)
+
+
+def refresh_recent_viewers(product_ids):
+    """Re-estimates unique viewers over the last RECENT_DAYS for ``product_ids``."""
+    since = timezone.localdate() - timedelta(days=RECENT_DAYS - 1)
+    union = defaultdict(HyperLogLog)
+    rows = ProductViewDay.objects.filter(
+        product_id__in=product_ids, day__gte=since
+    ).values_list('product_id', 'sketch')
+    for product_id, sketch in rows:
+        union[product_id].merge(HyperLogLog.from_bytes(sketch))
+    Product.objects.bulk_update(
+        [Product(pk=product_id, recent_viewer_count=sketch.count())
+         for product_id, sketch in union.items()],
+        ['recent_viewer_count'],
+    )
@@ -3,4 +3,7 @@ from django.apps import AppConfig
 
 class MarketplaceConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
-    name = 'marketplace'
\ No newline at end of file
+    name = 'marketplace'
+
+    def ready(self):
+        from . import signals  # noqa: F401  (registers receivers)
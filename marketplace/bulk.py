@@ -0,0 +1,401 @@
+"""
+Bulk listing import and export.
+
+Imports read CSV or JSON Lines one row at a time, validate each row with
+the same rules as ``ProductForm`` and insert valid rows in batches with
+``bulk_create``. Memory use depends on the batch size, not the file.
+
+Rows use the export columns, so an export can be edited and re-imported::
+
+    title, description, price, condition, category, location, images
+
+``category`` is a category slug or name, ``condition`` a condition key
+(``like_new``) or label (``Like New``), and ``images`` a ``|``-separated
+list of photo file names looked up in the import's image source.
+"""
+import csv
+import io
+import json
+import logging
+import os
+from collections import Counter
+from contextlib import nullcontext
+
+from django import forms
+from django.core.files.storage import default_storage
+from django.db import transaction
+
+from . import tasks
+from .cache import LISTINGS, bump_versions
+from .forms import ProductForm
+from .models import Category, Product, ProductImage
+
+
+IMPORT_FORMATS = ('csv', 'jsonl')
+EXPORT_COLUMNS = [
+    'id', 'title', 'description', 'price', 'condition', 'category', 'location',
+    'images', 'is_sold', 'is_active', 'seller', 'created_at',
+]
+IMAGE_SEPARATOR = '|'
+DEFAULT_BATCH_SIZE = 200
+# Only the first errors are kept in full; the rest are just counted
+MAX_REPORTED_ERRORS = 100
+
+logger = logging.getLogger(__name__)
+
+
+class ImportFileError(ValueError):
+    """Raised when the file as a whole cannot be read."""
+
+
+# ─────────────────────────────────────────────
+# Reading
+# ─────────────────────────────────────────────
+
+def detect_format(filename, default='csv'):
+    ext = os.path.splitext(filename or '')[1].lower().lstrip('.')
+    if ext in ('jsonl', 'ndjson'):
+        return 'jsonl'
+    if ext == 'csv':
+        return 'csv'
+    return default
+
+
+def read_rows(stream, fmt):
+    """
+    Yields ``(line_number, row_dict)`` from a text stream, lazily.
+    Malformed JSON lines are yielded as ``(line_number, None)``.
+    """
+    if fmt == 'csv':
+        reader = csv.DictReader(stream)
+        if not reader.fieldnames or 'title' not in reader.fieldnames:
+            raise ImportFileError("CSV needs a header row with at least a 'title' column.")
+        for row in reader:
+            yield reader.line_num, row
+    elif fmt == 'jsonl':
+        for line_number, line in enumerate(stream, start=1):
+            if not line.strip():
+                continue
+            try:
+                row = json.loads(line)
+            except ValueError:
+                row = None
+            yield line_number, row if isinstance(row, dict) else None
+    else:
+        raise ImportFileError(f"Unsupported format '{fmt}'.")
+
+
+def text_stream(binary_file, encoding='utf-8-sig'):
+    """Wraps an uploaded or opened binary file for line-by-line decoding."""
+    return io.TextIOWrapper(binary_file, encoding=encoding, newline='')
+
+
+# ─────────────────────────────────────────────
+# Image sources
+# ─────────────────────────────────────────────
+
+class DirectoryImageSource:
+    """Photos referenced by name from a local directory (management command)."""
+
+    def __init__(self, path):
+        self.path = os.path.abspath(path)
+
+    def _resolve(self, name):
+        full = os.path.abspath(os.path.join(self.path, name))
+        if full.startswith(self.path + os.sep) and os.path.isfile(full):
+            return full
+        return None
+
+    def exists(self, name):
+        return self._resolve(name) is not None
+
+    def open(self, name):
+        return open(self._resolve(name), 'rb')
+
+
+class UploadedImageSource:
+    """Photos uploaded alongside the listing file (web endpoint)."""
+
+    def __init__(self, files):
+        self.files = {os.path.basename(f.name): f for f in files}
+
+    def exists(self, name):
+        return os.path.basename(name) in self.files
+
+    def open(self, name):
+        # The same upload may back several rows, so leave it open
+        upload = self.files[os.path.basename(name)]
+        upload.seek(0)
+        return nullcontext(upload)
+
+
+# ─────────────────────────────────────────────
+# Validation
+# ─────────────────────────────────────────────
+
+class ProductImportForm(ProductForm):
+    """
+    ProductForm's rules for one imported row. Categories are matched by
+    slug or name against a preloaded map, so rows cost no lookups.
+    """
+    images = None
+
+    def __init__(self, *args, categories=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.categories = categories or {}
+        self.fields['category'] = forms.CharField(required=False)
+
+    def clean_category(self):
+        value = (self.cleaned_data.get('category') or '').strip()
+        if not value:
+            return None
+        category = self.categories.get(value.lower())
+        if category is None:
+            raise forms.ValidationError(f"Unknown category '{value}'.")
+        return category
+
+    def _get_validation_exclusions(self):
+        # clean_category() already resolved the category; skip the model's
+        # per-row "does this foreign key exist" query.
+        exclusions = super()._get_validation_exclusions()
+        exclusions.add('category')
+        return exclusions
+
+
+def _condition_lookup():
+    lookup = {}
+    for key, label in Product.CONDITION_CHOICES:
+        lookup[key] = key
+        lookup[label.lower()] = key
+    return lookup
+
+
+def _category_lookup():
+    lookup = {}
+    for category in Category.objects.all():
+        lookup[category.slug.lower()] = category
+        lookup[category.name.lower()] = category
+    return lookup
+
+
+def _image_names(value):
+    if isinstance(value, list):
+        names = value
+    else:
+        names = (value or '').split(IMAGE_SEPARATOR)
+    return [str(name).strip() for name in names if str(name).strip()]
+
+
+# ─────────────────────────────────────────────
+# Import
+# ─────────────────────────────────────────────
+
+class ImportReport:
+    def __init__(self):
+        self.created = 0
+        self.images = 0
+        self.error_count = 0
+        self.errors = []  # (line, message), first MAX_REPORTED_ERRORS only
+
+    def add_error(self, line, message):
+        self.error_count += 1
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append((line, message))
+
+    @property
+    def ok(self):
+        return self.error_count == 0
+
+
+class ListingImporter:
+    """
+    Validates rows and inserts them in batches for one seller.
+    With ``dry_run`` nothing is written, but every row is still checked.
+
+    Photos are copied to storage inside each batch's transaction; if the
+    batch (or an enclosing transaction the error escapes through) rolls
+    back, the copied files are deleted again.
+    """
+
+    def __init__(self, seller, image_source=None, batch_size=DEFAULT_BATCH_SIZE, dry_run=False):
+        self.seller = seller
+        self.image_source = image_source
+        self.batch_size = batch_size
+        self.dry_run = dry_run
+        self.report = ImportReport()
+        self.categories = _category_lookup()
+        self.conditions = _condition_lookup()
+        self._batch = []  # (product, [image names])
+        self._uncommitted = set()  # stored photo files not yet committed
+
+    def run(self, rows):
+        try:
+            for line, row in rows:
+                self.add_row(line, row)
+            self.flush()
+        except Exception:
+            # Earlier batches still waiting on a caller's transaction go
+            # down with it
+            _delete_photos(self._uncommitted)
+            raise
+        if self.report.created and not self.dry_run:
+            bump_versions(LISTINGS)  # new listings have no detail pages cached yet
+        return self.report
+
+    def add_row(self, line, row):
+        if row is None:
+            self.report.add_error(line, 'Not a valid JSON object.')
+            return
+
+        data = {key: (value if value is not None else '') for key, value in row.items() if key}
+        condition = str(data.get('condition', '')).strip().lower()
+        data['condition'] = self.conditions.get(condition, condition or 'good')
+
+        form = ProductImportForm(data, categories=self.categories)
+        if not form.is_valid():
+            for field, errors in form.errors.items():
+                label = 'row' if field == '__all__' else field
+                self.report.add_error(line, f"{label}: {' '.join(errors)}")
+            return
+
+        names = _image_names(row.get('images'))
+        if names and self.image_source is None:
+            self.report.add_error(line, 'images: no photos were supplied with this import.')
+            return
+        missing = [name for name in names if not self.image_source.exists(name)]
+        if missing:
+            self.report.add_error(line, f"images: {', '.join(missing)} not found.")
+            return
+
+        product = form.save(commit=False)
+        product.seller = self.seller
+        self._batch.append((product, names))
+        if len(self._batch) >= self.batch_size:
+            self.flush()
+
+    def flush(self):
+        batch, self._batch = self._batch, []
+        if not batch:
+            return
+        if self.dry_run:
+            self.report.created += len(batch)
+            self.report.images += sum(len(names) for _, names in batch)
+            return
+
+        stored = []
+        try:
+            with transaction.atomic():
+                products = Product.objects.bulk_create([product for product, _ in batch])
+                images = []
+                for product, names in batch:
+                    for name in names:
+                        stored.append(self.store_photo(name))
+                        images.append(ProductImage(product=product, image=stored[-1]))
+                images = ProductImage.objects.bulk_create(images)
+                if images:
+                    Product.refresh_cover_images({image.product_id for image in images})
+
+                # bulk_create skips signals; do their bookkeeping once per batch
+                per_category = Counter(product.category_id for product in products)
+                for category_id, count in per_category.items():
+                    Category.adjust_active_count(category_id, count)
+                tasks.index_products.delay([product.pk for product in products])
+                for image in images:
+                    tasks.build_image_derivatives.delay(image.pk)
+
+                self._uncommitted.update(stored)
+                transaction.on_commit(lambda: self._uncommitted.difference_update(stored))
+        except Exception:
+            # The batch's rows were rolled back; don't leave its photos behind
+            _delete_photos(stored)
+            raise
+
+        self.report.created += len(products)
+        self.report.images += len(images)
+
+
+    def store_photo(self, name):
+        with self.image_source.open(name) as photo:
+            return default_storage.save(f'product_images/{os.path.basename(name)}', photo)
+
+
+def _delete_photos(names):
+    for name in list(names):
+        try:
+            default_storage.delete(name)
+        except Exception:
+            logger.exception("Could not delete imported photo %s", name)
+
+
+def import_listings(stream, fmt, seller, **options):
+    """Imports listings from a text stream. Returns an ``ImportReport``."""
+    return ListingImporter(seller, **options).run(read_rows(stream, fmt))
+
+
+# ─────────────────────────────────────────────
+# Export
+# ─────────────────────────────────────────────
+
+class _Echo:
+    """File-like object whose write() hands the line back to the caller."""
+
+    def write(self, value):
+        return value
+
+
+EXPORT_FIELDS = {
+    # column -> queryset value path
+    'id': 'pk',
+    'title': 'title',
+    'description': 'description',
+    'price': 'price',
+    'condition': 'condition',
+    'category': 'category__slug',
+    'location': 'location',
+    'is_sold': 'is_sold',
+    'is_active': 'is_active',
+    'seller': 'seller__email',
+    'created_at': 'created_at',
+}
+
+
+def _export_chunks(queryset, chunk_size):
+    """Plain row dicts in chunks, each with its photos fetched in one query."""
+    values = queryset.values_list(*EXPORT_FIELDS.values()).iterator(chunk_size=chunk_size)
+    chunk = []
+    for record in values:
+        chunk.append(dict(zip(EXPORT_FIELDS, record)))
+        if len(chunk) == chunk_size:
+            yield _with_images(chunk)
+            chunk = []
+    if chunk:
+        yield _with_images(chunk)
+
+
+def _with_images(chunk):
+    names = {row['id']: [] for row in chunk}
+    images = ProductImage.objects.filter(product_id__in=names).order_by('uploaded_at', 'pk')
+    for product_id, name in images.values_list('product_id', 'image'):
+        names[product_id].append(os.path.basename(name))
+    for row in chunk:
+        row['images'] = IMAGE_SEPARATOR.join(names[row['id']])
+        row['price'] = str(row['price'])
+        row['category'] = row['category'] or ''
+        row['location'] = row['location'] or ''
+        row['created_at'] = row['created_at'].isoformat()
+    return chunk
+
+
+def export_listings(queryset, fmt='csv', chunk_size=500):
+    """Yields the listings in ``queryset`` as CSV or JSONL text chunks."""
+    rows = (row for chunk in _export_chunks(queryset, chunk_size) for row in chunk)
+
+    if fmt == 'jsonl':
+        for row in rows:
+            yield json.dumps(row, ensure_ascii=False) + '\n'
+        return
+
+    writer = csv.DictWriter(_Echo(), fieldnames=EXPORT_COLUMNS)
+    yield writer.writeheader()
+    for row in rows:
+        yield writer.writerow(row)
@@ -0,0 +1,171 @@
+"""
+Versioned cache for catalog-derived data and rendered fragments.
+
+Every cached entry is keyed by the versions of the *scopes* it was built
+from. Writers bump only the scopes they change, which orphans exactly the
+entries that depended on them — no key tracking or explicit deletes:
+
+* ``LISTINGS``   — listing grids, facets and dashboards; bumped when a
+  listing or one of its photos is saved or deleted.
+* ``CATEGORIES`` — category names, icons and live-listing counts.
+* ``RELATED``    — every stored suggestion list; bumped by a full
+  ``refresh_recommendations`` only.
+* ``product_scope(pk)`` — one listing's detail page: the listing and its
+  photos, its suggestion list and the listings that list shows.
+
+Background work (suggestion refreshes, photo renditions) bumps only the
+product scopes it touched, so it never empties the landing page or the
+facet cache.
+
+Bumps wait for the surrounding transaction to commit. Bumping earlier
+would let a concurrent reader rebuild an entry from the uncommitted
+state's predecessor and cache it under the new version, where it would
+stay until the next bump.
+
+Uses the cache alias named by ``settings.CATALOG_CACHE_ALIAS`` (default
+``'default'``): local memory out of the box, or any shared backend
+(Redis, Memcached, database, file) when running several processes.
+"""
+import threading
+import time
+from collections import Counter
+from functools import partial
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+
+
+VERSION_PREFIX = 'catalog:version'
+STATS_PREFIX = 'catalog:stats'
+DEFAULT_TIMEOUT = 60 * 15
+# Hit/miss counters are written to the cache in batches of this many
+STATS_FLUSH_EVERY = 100
+
+LISTINGS = 'listings'
+CATEGORIES = 'categories'
+RELATED = 'related'
+
+
+def product_scope(pk):
+    return f'product:{pk}'
+
+
+def get_cache():
+    return caches[getattr(settings, 'CATALOG_CACHE_ALIAS', 'default')]
+
+
+def _version_key(scope):
+    return f'{VERSION_PREFIX}:{scope}'
+
+
+def get_versions(*scopes):
+    """Current version of each scope, in order, read in one round trip."""
+    cache = get_cache()
+    keys = [_version_key(scope) for scope in scopes]
+    versions = cache.get_many(keys)
+    missing = [key for key in keys if key not in versions]
+    if missing:
+        # Seed from the clock so an evicted counter never reuses old keys
+        seed = int(time.time() * 1000)
+        for key in missing:
+            cache.add(key, seed, timeout=None)
+        versions.update(cache.get_many(missing))
+    return [versions.get(key, 0) for key in keys]
+
+
+def get_version(scope=LISTINGS):
+    return get_versions(scope)[0]
+
+
+def bump_versions(*scopes):
+    """Bumps ``scopes`` once the current transaction commits (at once outside one)."""
+    transaction.on_commit(partial(_bump_now, set(scopes)))
+
+
+def _bump_now(scopes):
+    cache = get_cache()
+    for scope in scopes:
+        key = _version_key(scope)
+        try:
+            cache.incr(key)
+        except ValueError:
+            # Key missing (first write or evicted) — start a fresh series
+            cache.set(key, int(time.time() * 1000), timeout=None)
+
+
+# ─────────────────────────────────────────────
+# Hit/miss counters
+# ─────────────────────────────────────────────
+
+_tally = Counter()
+_tally_lock = threading.Lock()
+
+
+def _count(name, outcome):
+    """
+    Tallies in process; a miss (which already pays for a rebuild) or
+    every ``STATS_FLUSH_EVERY`` events writes the tally to the cache.
+    """
+    with _tally_lock:
+        _tally[name, outcome] += 1
+        if outcome == 'hits' and _tally.total() < STATS_FLUSH_EVERY:
+            return
+    flush_stats()
+
+
+def flush_stats():
+    with _tally_lock:
+        pending = dict(_tally)
+        _tally.clear()
+    cache = get_cache()
+    for (name, outcome), n in pending.items():
+        key = f'{STATS_PREFIX}:{name}:{outcome}'
+        if not cache.add(key, n, timeout=None):
+            try:
+                cache.incr(key, n)
+            except ValueError:
+                cache.set(key, n, timeout=None)
+
+
+# ─────────────────────────────────────────────
+# Cached entries
+# ─────────────────────────────────────────────
+
+def get_or_build(name, builder, scopes=(LISTINGS,), timeout=DEFAULT_TIMEOUT, key=None):
+    """
+    Returns the cached value for ``name`` at the current versions of
+    ``scopes``, calling ``builder()`` and storing its result on a miss.
+    ``key`` distinguishes variants (e.g. per search query) that share one
+    set of hit/miss counters. A hit costs two cache reads.
+    """
+    cache = get_cache()
+    variant = f':{key}' if key else ''
+    versions = '.'.join(str(version) for version in get_versions(*scopes))
+    key = f'catalog:{name}{variant}:v{versions}'
+    value = cache.get(key)
+    if value is not None:
+        _count(name, 'hits')
+        return value
+
+    _count(name, 'misses')
+    value = builder()
+    cache.set(key, value, timeout)
+    return value
+
+
+def stats(names):
+    """Hit/miss counters for the given entry names."""
+    flush_stats()
+    cache = get_cache()
+    result = {}
+    for name in names:
+        hits = cache.get(f'{STATS_PREFIX}:{name}:hits', 0)
+        misses = cache.get(f'{STATS_PREFIX}:{name}:misses', 0)
+        total = hits + misses
+        result[name] = {
+            'hits': hits,
+            'misses': misses,
+            'hit_ratio': round(hits / total, 3) if total else None,
+        }
+    return result
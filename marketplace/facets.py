@@ -0,0 +1,258 @@
+"""
+Facet filters and counts for the listing page.
+
+One grouped query returns how many live listings share each combination
+of (category, condition, price bucket, location, age). Every facet count
+is then derived from those rows in Python, including the usual rule that
+a facet's own selection is ignored when counting its alternatives — so
+picking "Good" still shows how many "Like New" items there are.
+
+The grouped rows depend only on the search query, not on the selected
+facets, so they are cached (per query, at the current catalog version)
+and shared by every filter combination.
+"""
+import hashlib
+from collections import Counter, defaultdict
+from datetime import timedelta
+from decimal import Decimal
+
+from django.db.models import Case, CharField, Count, IntegerField, Q, Value, When
+from django.http import Http404
+from django.utils import timezone
+
+from .models import Product
+
+
+# key, label, lower bound (inclusive), upper bound (exclusive)
+PRICE_BUCKETS = [
+    ('under-10', 'Under $10', None, 10),
+    ('10-25', '$10 – $25', 10, 25),
+    ('25-50', '$25 – $50', 25, 50),
+    ('50-100', '$50 – $100', 50, 100),
+    ('100-plus', '$100 & up', 100, None),
+]
+# key, label, days
+POSTED_WITHIN = [
+    ('today', 'Last 24 hours', 1),
+    ('week', 'This week', 7),
+    ('month', 'This month', 30),
+]
+LOCATION_LIMIT = 10
+FACETS_CACHE_TIMEOUT = 60 * 5
+
+_PRICE_KEYS = {key for key, *_ in PRICE_BUCKETS}
+_POSTED_DAYS = {key: days for key, _, days in POSTED_WITHIN}
+_CONDITIONS = dict(Product.CONDITION_CHOICES)
+
+
+class FacetSelection:
+    """The facet filters chosen in the query string, already validated."""
+
+    FIELDS = ('category', 'condition', 'price', 'location', 'posted')
+
+    def __init__(self, category=None, condition='', price='', location='', posted=''):
+        self.category = category
+        self.condition = condition
+        self.price = price
+        self.location = location
+        self.posted = posted
+
+    @classmethod
+    def from_query(cls, params, categories):
+        """
+        Reads ?category=&condition=&price=&location=&posted=. Unknown
+        values are ignored, except an unknown category, which is a 404.
+        """
+        slug = params.get('category', '').strip()
+        category = None
+        if slug:
+            category = next((c for c in categories if c.slug == slug), None)
+            if category is None:
+                raise Http404("No such category.")
+
+        condition = params.get('condition', '').strip()
+        price = params.get('price', '').strip()
+        posted = params.get('posted', '').strip()
+        return cls(
+            category=category,
+            condition=condition if condition in _CONDITIONS else '',
+            price=price if price in _PRICE_KEYS else '',
+            location=params.get('location', '').strip()[:150],
+            posted=posted if posted in _POSTED_DAYS else '',
+        )
+
+    def __bool__(self):
+        return any(getattr(self, name) for name in self.FIELDS)
+
+    # ── database filtering ───────────────────
+
+    def q(self):
+        q = Q()
+        if self.category:
+            q &= Q(category=self.category)
+        if self.condition:
+            q &= Q(condition=self.condition)
+        if self.price:
+            _, _, low, high = next(b for b in PRICE_BUCKETS if b[0] == self.price)
+            if low is not None:
+                q &= Q(price__gte=low)
+            if high is not None:
+                q &= Q(price__lt=high)
+        if self.location:
+            q &= Q(location__iexact=self.location)
+        if self.posted:
+            q &= Q(created_at__gte=timezone.now() - timedelta(days=_POSTED_DAYS[self.posted]))
+        return q
+
+    def apply(self, queryset):
+        return queryset.filter(self.q())
+
+    # ── matching grouped rows ────────────────
+
+    def matches(self, row, ignore=None):
+        """Whether a grouped row satisfies every selected facet but ``ignore``."""
+        if self.category and ignore != 'category' and row['category_id'] != self.category.pk:
+            return False
+        if self.condition and ignore != 'condition' and row['condition'] != self.condition:
+            return False
+        if self.price and ignore != 'price' and row['price_bucket'] != self.price:
+            return False
+        if self.location and ignore != 'location' and _location_key(row['location']) != self.location.lower():
+            return False
+        if self.posted and ignore != 'posted' and (row['age'] is None or row['age'] > _POSTED_DAYS[self.posted]):
+            return False
+        return True
+
+
+class FacetValue:
+    def __init__(self, value, label, count, selected, query, item=None):
+        self.value = value
+        self.label = label
+        self.count = count
+        self.selected = selected
+        self.query = query  # query string that toggles this value
+        self.item = item  # e.g. the Category, for its icon
+
+
+class ListingFacets:
+    """Facet counts for one listing request; ``total`` matches the page."""
+
+    def __init__(self, total, categories, conditions, prices, locations, posted):
+        self.total = total
+        self.categories = categories
+        self.conditions = conditions
+        self.prices = prices
+        self.locations = locations
+        self.posted = posted
+
+
+def _location_key(location):
+    return (location or '').strip().lower()
+
+
+def _price_bucket():
+    whens = []
+    for key, _, _, high in PRICE_BUCKETS:
+        if high is not None:
+            whens.append(When(price__lt=Decimal(high), then=Value(key)))
+    return Case(*whens, default=Value(PRICE_BUCKETS[-1][0]), output_field=CharField())
+
+
+def _age_bucket(now):
+    return Case(
+        *[When(created_at__gte=now - timedelta(days=days), then=Value(days))
+          for _, _, days in POSTED_WITHIN],
+        default=None, output_field=IntegerField(),
+    )
+
+
+def facet_rows(queryset):
+    """
+    The single grouped query: one row per distinct (category, condition,
+    price bucket, location, age) combination with its listing count.
+    """
+    return list(
+        queryset.order_by()
+        .annotate(price_bucket=_price_bucket(), age=_age_bucket(timezone.now()))
+        .values('category_id', 'condition', 'price_bucket', 'location', 'age')
+        .annotate(n=Count('pk'))
+    )
+
+
+def rows_cache_key(query):
+    return hashlib.md5(query.strip().lower().encode()).hexdigest() if query else 'all'
+
+
+def build_facets(rows, selection, categories, params):
+    """
+    Turns grouped ``rows`` into facet counts for ``selection``.
+    ``params`` is the current query string, used for toggle links.
+    """
+    total = 0
+    by_field = defaultdict(Counter)
+    location_labels = {}
+
+    for row in rows:
+        n = row['n']
+        if selection.matches(row):
+            total += n
+        for field in FacetSelection.FIELDS:
+            if not selection.matches(row, ignore=field):
+                continue
+            if field == 'category':
+                by_field[field][row['category_id']] += n
+            elif field == 'condition':
+                by_field[field][row['condition']] += n
+            elif field == 'price':
+                by_field[field][row['price_bucket']] += n
+            elif field == 'location':
+                key = _location_key(row['location'])
+                if key:
+                    by_field[field][key] += n
+                    location_labels.setdefault(key, row['location'].strip())
+            elif field == 'posted' and row['age'] is not None:
+                for key, _, days in POSTED_WITHIN:
+                    if row['age'] <= days:
+                        by_field[field][key] += n
+
+    def values(field, choices, current):
+        result = []
+        for value, label in choices:
+            count = by_field[field][value]
+            selected = value == current
+            if count or selected:
+                result.append(FacetValue(
+                    value, label, count, selected,
+                    _toggle_query(params, field, value, selected),
+                ))
+        return result
+
+    top_locations = [key for key, _ in by_field['location'].most_common(LOCATION_LIMIT)]
+    current_location = selection.location.lower()
+    if current_location and current_location not in top_locations:
+        top_locations.append(current_location)
+        location_labels.setdefault(current_location, selection.location)
+
+    return ListingFacets(
+        total=total,
+        categories=[
+            FacetValue(c.slug, c.name, by_field['category'][c.pk], selection.category == c,
+                       _toggle_query(params, 'category', c.slug, selection.category == c), item=c)
+            for c in categories
+        ],
+        conditions=values('condition', Product.CONDITION_CHOICES, selection.condition),
+        prices=values('price', [(key, label) for key, label, *_ in PRICE_BUCKETS], selection.price),
+        locations=values('location', [(key, location_labels[key]) for key in top_locations], current_location),
+        posted=values('posted', [(key, label) for key, label, _ in POSTED_WITHIN], selection.posted),
+    )
+
+
+def _toggle_query(params, field, value, selected):
+    """Query string with ``field`` set to ``value``, or cleared if already selected."""
+    params = params.copy()
+    params.pop('cursor', None)
+    if selected:
+        params.pop(field, None)
+    else:
+        params[field] = value
+    return params.urlencode()
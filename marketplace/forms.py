@@ -73,4 +73,22 @@ class ProductForm(forms.ModelForm):
             'title': 'Product Title',
             'price': 'Price (₹)',
             'location': 'Pickup Location (optional)',
-        }
\ No newline at end of file
+        }
+
+
+class ListingImportForm(forms.Form):
+    file = forms.FileField(
+        label='Listings file',
+        help_text="CSV with a header row, or JSON Lines (.jsonl) — one listing per line.",
+        widget=forms.ClearableFileInput(attrs={'class': 'form-control', 'accept': '.csv,.jsonl,.ndjson'}),
+    )
+    photos = MultipleFileField(
+        required=False,
+        label='Photos',
+        help_text="Photos named in the file's images column (separate several with |).",
+    )
+    dry_run = forms.BooleanField(
+        required=False,
+        label='Check the file only, without posting anything',
+        widget=forms.CheckboxInput(attrs={'class': 'form-check-input'}),
+    )
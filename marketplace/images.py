@@ -0,0 +1,120 @@
+"""
+Responsive derivatives for product photos.
+
+Phone uploads are often multi-megabyte JPEGs; listing grids should never
+serve them directly. Every ``ProductImage`` gets WebP renditions at a few
+fixed widths, with EXIF orientation applied and metadata stripped.
+
+Derivative file names are derived from a hash of the original file's
+bytes plus the rendition's size and ``PIPELINE_VERSION``, so a given URL
+always points at the same pixels and can be cached forever by browsers
+and CDNs.
+
+Originals above Pillow's ``MAX_IMAGE_PIXELS`` are refused with
+``ImageTooLarge`` instead of being decoded: a small compressed file can
+expand to gigabytes of pixels.
+"""
+import hashlib
+import warnings
+from io import BytesIO
+
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from PIL import Image, ImageOps
+
+
+# size name -> longest edge in pixels
+DERIVATIVE_SIZES = {
+    'thumb': 160,
+    'card': 480,
+    'detail': 1200,
+}
+WEBP_QUALITY = 80
+DERIVATIVE_DIR = 'product_images/derivatives'
+
+# Part of every derivative name: bump to regenerate every derivative
+# after changing the pipeline (quality, encoder settings). Changing a
+# size in DERIVATIVE_SIZES renames that rendition on its own.
+PIPELINE_VERSION = 1
+
+
+class ImageTooLarge(ValueError):
+    """The original has more pixels than Pillow is allowed to decode."""
+
+
+def content_hash(field_file):
+    """SHA-256 of the stored original, read in chunks."""
+    digest = hashlib.sha256()
+    field_file.open('rb')
+    try:
+        for chunk in field_file.chunks():
+            digest.update(chunk)
+    finally:
+        field_file.close()
+    return digest.hexdigest()
+
+
+def derivative_name(digest, size):
+    return f'{DERIVATIVE_DIR}/{digest[:20]}-{size}-{DERIVATIVE_SIZES[size]}-v{PIPELINE_VERSION}.webp'
+
+
+def load_normalized(field_file):
+    """Opens the original upright (EXIF rotation applied) in an RGB(A) mode."""
+    field_file.open('rb')
+    try:
+        with warnings.catch_warnings():
+            # Pillow only warns between MAX_IMAGE_PIXELS and twice that
+            warnings.simplefilter('error', Image.DecompressionBombWarning)
+            image = Image.open(field_file)
+            image = ImageOps.exif_transpose(image)
+            if image.mode not in ('RGB', 'RGBA'):
+                image = image.convert('RGBA' if 'A' in image.getbands() else 'RGB')
+            image.load()
+    except (Image.DecompressionBombError, Image.DecompressionBombWarning) as exc:
+        raise ImageTooLarge(str(exc)) from exc
+    finally:
+        field_file.close()
+    return image
+
+
+def render_webp(image, longest_edge):
+    copy = image.copy()
+    copy.thumbnail((longest_edge, longest_edge), Image.Resampling.LANCZOS)
+    buffer = BytesIO()
+    copy.save(buffer, 'WEBP', quality=WEBP_QUALITY, method=4)
+    return buffer.getvalue(), copy.size
+
+
+def generate_derivatives(product_image, storage=default_storage, force=False):
+    """
+    Writes every missing derivative of ``product_image`` and records them
+    on the instance. Returns the ``derivatives`` mapping.
+    Safe to call repeatedly; existing files are reused unless ``force``,
+    which rehashes the original and overwrites every rendition.
+    """
+    digest = (not force and product_image.content_hash) or content_hash(product_image.image)
+    derivatives = {}
+    source = None
+
+    for size, longest_edge in DERIVATIVE_SIZES.items():
+        name = derivative_name(digest, size)
+        known = product_image.derivatives.get(size)
+        if not force and known and known.get('name') == name and storage.exists(name):
+            derivatives[size] = known
+            continue
+
+        if source is None:
+            source = load_normalized(product_image.image)
+        data, (width, height) = render_webp(source, longest_edge)
+        if force and storage.exists(name):
+            storage.delete(name)  # save() would pick a new name rather than overwrite
+        if not storage.exists(name):
+            storage.save(name, ContentFile(data))
+        derivatives[size] = {'name': name, 'width': width, 'height': height}
+
+    product_image.content_hash = digest
+    product_image.derivatives = derivatives
+    type(product_image).objects.filter(pk=product_image.pk).update(
+        content_hash=digest, derivatives=derivatives,
+    )
+    return derivatives
@@ -0,0 +1,19 @@
+import json
+
+from django.core.management.base import BaseCommand
+
+from marketplace import cache as catalog_cache
+from marketplace.views import LandingView, ListingFilterMixin, ProductDetailView
+
+
+class Command(BaseCommand):
+    help = "Prints hit/miss counters for the catalog fragment cache as JSON."
+
+    def handle(self, *args, **options):
+        scopes = (catalog_cache.LISTINGS, catalog_cache.CATEGORIES, catalog_cache.RELATED)
+        self.stdout.write(json.dumps({
+            'versions': dict(zip(scopes, catalog_cache.get_versions(*scopes))),
+            'fragments': catalog_cache.stats(
+                LandingView.fragments + ListingFilterMixin.fragments + ProductDetailView.fragments
+            ),
+        }, indent=2))
@@ -0,0 +1,30 @@
+from django.core.management.base import BaseCommand
+
+from marketplace.images import generate_derivatives
+from marketplace.models import ProductImage
+
+
+class Command(BaseCommand):
+    help = "Builds missing WebP renditions for existing product images."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--force', action='store_true',
+            help="Rehash and re-render every image, overwriting existing derivative files.",
+        )
+
+    def handle(self, *args, **options):
+        images = ProductImage.objects.order_by('pk')
+        if not options['force']:
+            images = images.filter(derivatives={})
+
+        done = failed = 0
+        for image in images.iterator(chunk_size=200):
+            try:
+                generate_derivatives(image, force=options['force'])
+                done += 1
+            except (OSError, ValueError) as exc:
+                failed += 1
+                self.stderr.write(f"Image {image.pk}: {exc}")
+
+        self.stdout.write(self.style.SUCCESS(f"Generated derivatives for {done} image(s), {failed} failed."))
@@ -0,0 +1,64 @@
+import sys
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+
+from marketplace.bulk import (
+    DEFAULT_BATCH_SIZE, IMPORT_FORMATS, DirectoryImageSource, ImportFileError,
+    detect_format, import_listings, text_stream,
+)
+
+
+class Command(BaseCommand):
+    help = (
+        "Bulk-imports listings for one seller from a CSV or JSON Lines file. "
+        "Rows are validated with the listing form rules and inserted in batches."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help="CSV or .jsonl file ('-' reads stdin).")
+        parser.add_argument('--seller', required=True, help="Seller's email address.")
+        parser.add_argument('--format', choices=IMPORT_FORMATS,
+                            help='Defaults to the file extension, else csv.')
+        parser.add_argument('--images-dir', help="Directory holding the photos named in the 'images' column.")
+        parser.add_argument('--batch-size', type=int, default=DEFAULT_BATCH_SIZE)
+        parser.add_argument('--dry-run', action='store_true', help='Validate only; write nothing.')
+
+    def handle(self, *args, **options):
+        User = get_user_model()
+        try:
+            seller = User.objects.get(email__iexact=options['seller'])
+        except User.DoesNotExist:
+            raise CommandError(f"No user with email {options['seller']}.")
+
+        fmt = options['format'] or detect_format(options['path'])
+        image_source = DirectoryImageSource(options['images_dir']) if options['images_dir'] else None
+
+        if options['path'] == '-':
+            binary = sys.stdin.buffer
+        else:
+            try:
+                binary = open(options['path'], 'rb')
+            except OSError as exc:
+                raise CommandError(str(exc))
+
+        with binary:
+            try:
+                report = import_listings(
+                    text_stream(binary), fmt, seller, image_source=image_source,
+                    batch_size=options['batch_size'], dry_run=options['dry_run'],
+                )
+            except (ImportFileError, UnicodeDecodeError) as exc:
+                raise CommandError(f"Could not read {options['path']}: {exc}")
+
+        for line, message in report.errors:
+            self.stderr.write(f"  line {line}: {message}")
+        if report.error_count > len(report.errors):
+            self.stderr.write(f"  ... and {report.error_count - len(report.errors)} more error(s)")
+
+        verb = 'Would import' if options['dry_run'] else 'Imported'
+        summary = (
+            f"{verb} {report.created} listing(s) with {report.images} photo(s); "
+            f"{report.error_count} row error(s)."
+        )
+        self.stdout.write(self.style.SUCCESS(summary) if report.ok else self.style.WARNING(summary))
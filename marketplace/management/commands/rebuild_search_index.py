@@ -0,0 +1,22 @@
+from django.core.management.base import BaseCommand
+
+from marketplace.models import Product
+from marketplace.search import get_backend
+
+
+class Command(BaseCommand):
+    help = (
+        "Rebuilds the listing search index from scratch. "
+        "Run after bulk imports or queryset.update() calls, which bypass signals."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500)
+
+    def handle(self, *args, **options):
+        backend = get_backend()
+        products = Product.objects.filter(is_active=True, is_sold=False).order_by('pk')
+        indexed = backend.rebuild(products, batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(
+            f"Indexed {indexed} listing(s) using the '{backend.name}' backend."
+        ))
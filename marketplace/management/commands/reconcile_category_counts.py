@@ -0,0 +1,18 @@
+from django.core.management.base import BaseCommand
+
+from marketplace.models import Category
+
+
+class Command(BaseCommand):
+    help = (
+        "Recomputes Category.active_product_count from the products table. "
+        "Run after bulk imports or queryset.update() calls, which bypass signals."
+    )
+
+    def handle(self, *args, **options):
+        drifted = Category.reconcile_active_counts()
+        for category, stored, expected in drifted:
+            self.stdout.write(f"  {category.name}: {stored} -> {expected}")
+        self.stdout.write(self.style.SUCCESS(
+            f"Reconciled {len(drifted)} categor{'y' if len(drifted) == 1 else 'ies'}."
+        ))
@@ -0,0 +1,32 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from marketplace.recommendations import last_refreshed_at, refresh_recommendations, stale_product_ids
+
+
+class Command(BaseCommand):
+    help = (
+        "Refreshes the precomputed related-listing suggestions. By default only "
+        "listings changed or newly chatted about since the last run; run from cron."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--full', action='store_true',
+            help='Recompute every active listing instead of only stale ones.',
+        )
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        since = None if options['full'] else last_refreshed_at()
+
+        if since is None:
+            count = refresh_recommendations()
+        else:
+            count = refresh_recommendations(stale_product_ids(since))
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Refreshed suggestions for {count} listing{'s' if count != 1 else ''} "
+            f"in {time.perf_counter() - started:.1f}s."
+        ))
@@ -0,0 +1,60 @@
+# Generated by Django 6.0.2 on 2026-10-16 22:41
+
+import django.db.models.deletion
+from django.db import migrations, models, OperationalError
+
+
+FTS_TABLE = 'marketplace_product_fts'
+
+
+def create_fts_table(apps, schema_editor):
+    """FTS5 is optional: skipped on other databases or SQLite builds without it."""
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    try:
+        schema_editor.execute(
+            f"CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5("
+            f"title, description, category, location, "
+            f"tokenize = 'unicode61 remove_diacritics 2')"
+        )
+    except OperationalError:
+        return
+
+    Product = apps.get_model('marketplace', 'Product')
+    rows = Product.objects.filter(is_active=True, is_sold=False).values_list(
+        'pk', 'title', 'description', 'category__name', 'location'
+    )
+    with schema_editor.connection.cursor() as cursor:
+        cursor.executemany(
+            f"INSERT INTO {FTS_TABLE} (rowid, title, description, category, location) "
+            f"VALUES (%s, %s, %s, %s, %s)",
+            [(pk, t or '', d or '', c or '', l or '') for pk, t, d, c, l in rows.iterator()],
+        )
+
+
+def drop_fts_table(apps, schema_editor):
+    if schema_editor.connection.vendor == 'sqlite':
+        schema_editor.execute(f"DROP TABLE IF EXISTS {FTS_TABLE}")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('marketplace', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SearchToken',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('term', models.CharField(max_length=64)),
+                ('weight', models.FloatField(default=1.0)),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='search_tokens', to='marketplace.product')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['term', 'product'], name='searchtoken_term_idx')],
+            },
+        ),
+        migrations.RunPython(create_fts_table, drop_fts_table),
+    ]
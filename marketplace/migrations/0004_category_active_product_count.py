@@ -0,0 +1,31 @@
+# Generated by Django 6.0.2 on 2026-10-16 23:40
+
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def backfill_counts(apps, schema_editor):
+    Category = apps.get_model('marketplace', 'Category')
+    Product = apps.get_model('marketplace', 'Product')
+    counts = (
+        Product.objects.filter(is_active=True, is_sold=False, category__isnull=False)
+        .values('category').annotate(n=Count('pk'))
+    )
+    for row in counts:
+        Category.objects.filter(pk=row['category']).update(active_product_count=row['n'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('marketplace', '0003_image_derivatives'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='category',
+            name='active_product_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(backfill_counts, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,30 @@
+# Generated by Django 6.0.2 on 2026-10-16 23:58
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import OuterRef, Subquery
+
+
+def backfill_cover_images(apps, schema_editor):
+    Product = apps.get_model('marketplace', 'Product')
+    ProductImage = apps.get_model('marketplace', 'ProductImage')
+    first_image = ProductImage.objects.filter(
+        product=OuterRef('pk')
+    ).order_by('uploaded_at', 'pk').values('pk')[:1]
+    Product.objects.update(cover_image=Subquery(first_image))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('marketplace', '0005_hot_query_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='product',
+            name='cover_image',
+            field=models.ForeignKey(blank=True, editable=False, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='marketplace.productimage'),
+        ),
+        migrations.RunPython(backfill_cover_images, migrations.RunPython.noop),
+    ]
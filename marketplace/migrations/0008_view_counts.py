@@ -0,0 +1,38 @@
+# Generated by Django 6.0.2 on 2026-10-17 01:05
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('marketplace', '0007_related_products'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='product',
+            name='recent_viewer_count',
+            field=models.PositiveIntegerField(default=0, editable=False, help_text='Estimated unique viewers over the last 30 days.'),
+        ),
+        migrations.AddField(
+            model_name='product',
+            name='view_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.CreateModel(
+            name='ProductViewDay',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField()),
+                ('views', models.PositiveIntegerField(default=0)),
+                ('sketch', models.BinaryField()),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='view_days', to='marketplace.product')),
+            ],
+            options={
+                'ordering': ['product', '-day'],
+                'constraints': [models.UniqueConstraint(fields=('product', 'day'), name='productviewday_unique')],
+            },
+        ),
+    ]
@@ -0,0 +1,81 @@
+# Generated by Django 6.0.2 on 2026-10-17 12:10
+
+import re
+from collections import defaultdict
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+FTS_TABLE = 'marketplace_product_fts'
+FIELD_WEIGHTS = {'title': 3.0, 'description': 1.0, 'category': 2.0, 'location': 2.0}
+TOKEN_RE = re.compile(r'\w+', re.UNICODE)
+MAX_TERM_LENGTH = 64
+
+
+def uses_token_index(connection):
+    """Mirrors marketplace.search.get_backend() at migration time."""
+    choice = getattr(settings, 'SEARCH_BACKEND', 'auto')
+    if choice != 'auto':
+        return choice == 'tokens'
+    return FTS_TABLE not in connection.introspection.table_names()
+
+
+def configure_fts_rank(apps, schema_editor):
+    """The FTS5 ``rank`` column becomes bm25() with the field weights."""
+    if FTS_TABLE not in schema_editor.connection.introspection.table_names():
+        return
+    weights = ', '.join(str(w) for w in FIELD_WEIGHTS.values())
+    schema_editor.execute(
+        f"INSERT INTO {FTS_TABLE} ({FTS_TABLE}, rank) VALUES ('rank', %s)", [f'bm25({weights})'],
+    )
+
+
+def backfill_tokens(apps, schema_editor):
+    """0002 only filled the FTS5 table; the token index started out empty."""
+    if not uses_token_index(schema_editor.connection):
+        return
+    Product = apps.get_model('marketplace', 'Product')
+    SearchToken = apps.get_model('marketplace', 'SearchToken')
+    if SearchToken.objects.exists():
+        return
+
+    rows = Product.objects.filter(is_active=True, is_sold=False).values_list(
+        'pk', 'title', 'description', 'category__name', 'location'
+    )
+    batch = []
+    for pk, *texts in rows.iterator():
+        weights = defaultdict(float)
+        for field, text in zip(FIELD_WEIGHTS, texts):
+            for term in TOKEN_RE.findall((text or '').lower()):
+                weights[term[:MAX_TERM_LENGTH]] += FIELD_WEIGHTS[field]
+        batch.extend(SearchToken(term=term, product_id=pk, weight=w) for term, w in weights.items())
+        if len(batch) >= 2000:
+            SearchToken.objects.bulk_create(batch)
+            batch = []
+    SearchToken.objects.bulk_create(batch)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('marketplace', '0008_view_counts'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SearchDocument',
+            fields=[
+                ('product', models.OneToOneField(db_column='rowid', db_constraint=False, on_delete=django.db.models.deletion.DO_NOTHING, primary_key=True, related_name='search_document', serialize=False, to='marketplace.product')),
+                ('document', models.TextField(db_column='marketplace_product_fts')),
+                ('rank', models.FloatField()),
+            ],
+            options={
+                'db_table': 'marketplace_product_fts',
+                'managed': False,
+            },
+        ),
+        migrations.RunPython(configure_fts_rank, migrations.RunPython.noop),
+        migrations.RunPython(backfill_tokens, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 6.0.2 on 2026-10-17 14:10
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('marketplace', '0009_search_documents'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(condition=models.Q(('is_active', True), ('is_sold', False)), fields=['category', 'price', 'id'], name='product_live_cat_price_idx'),
+        ),
+    ]
@@ -0,0 +1,25 @@
+# Generated by Django 6.0.2 on 2026-10-17 16:40
+
+from django.db import migrations
+
+
+def strip_locations(apps, schema_editor):
+    """Product.save() now strips locations; clean up rows written before."""
+    Product = apps.get_model('marketplace', 'Product')
+    padded = Product.objects.filter(location__regex=r'^\s|\s$').only('location')
+    products = []
+    for product in padded.iterator(chunk_size=500):
+        product.location = product.location.strip()
+        products.append(product)
+    Product.objects.bulk_update(products, ['location'], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('marketplace', '0010_category_price_index'),
+    ]
+
+    operations = [
+        migrations.RunPython(strip_locations, migrations.RunPython.noop),
+    ]
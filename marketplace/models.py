@@ -1,8 +1,14 @@
 from django.db import models
+from django.db.models import Count, F, OuterRef, Subquery
+from django.db.models.functions import Greatest
 from django.conf import settings
+from django.core.files.storage import default_storage
 from django.urls import reverse
 from typing import TYPE_CHECKING
 
+from .cache import CATEGORIES, bump_versions
+from .search import FTS_TABLE
+
 
 if TYPE_CHECKING:
     from django.db.models.manager import RelatedManager 
@@ -15,6 +21,10 @@ class Category(models.Model):
     description = models.TextField(blank=True, null=True)
     created_at = models.DateTimeField(auto_now_add=True)
 
+    # Denormalized number of active, unsold listings in this category.
+    # Maintained by marketplace.signals; repair with reconcile_category_counts.
+    active_product_count = models.PositiveIntegerField(default=0, editable=False)
+
     class Meta:
         verbose_name_plural = "Categories"
         ordering = ['name']
@@ -25,6 +35,34 @@ class Category(models.Model):
     def get_absolute_url(self):
         return reverse('marketplace:product_list') + f'?category={self.slug}'
 
+    @classmethod
+    def adjust_active_count(cls, category_id, delta):
+        if category_id and delta:
+            cls.objects.filter(pk=category_id).update(
+                active_product_count=Greatest(F('active_product_count') + delta, 0)
+            )
+            bump_versions(CATEGORIES)
+
+    @classmethod
+    def reconcile_active_counts(cls):
+        """
+        Recomputes every category's count from the products table.
+        Returns the categories whose stored count had drifted.
+        """
+        actual = dict(
+            Product.objects.filter(is_active=True, is_sold=False, category__isnull=False)
+            .values('category').annotate(n=Count('pk')).values_list('category', 'n')
+        )
+        drifted = []
+        for category in cls.objects.only('pk', 'name', 'active_product_count'):
+            expected = actual.get(category.pk, 0)
+            if category.active_product_count != expected:
+                drifted.append((category, category.active_product_count, expected))
+                cls.objects.filter(pk=category.pk).update(active_product_count=expected)
+        if drifted:
+            bump_versions(CATEGORIES)
+        return drifted
+
 
 class Product(models.Model):
     CONDITION_CHOICES = [
@@ -58,27 +96,136 @@ class Product(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    # Written in batches by marketplace.analytics, never on save() (see COUNTER_FIELDS)
+    view_count = models.PositiveIntegerField(default=0, editable=False)
+    recent_viewer_count = models.PositiveIntegerField(
+        default=0, editable=False,
+        help_text="Estimated unique viewers over the last 30 days."
+    )
+
+    # The earliest photo, kept current by signals so listing grids can
+    # select_related() it instead of loading every image per card
+    cover_image = models.ForeignKey(
+        'ProductImage',
+        on_delete=models.SET_NULL,
+        null=True, blank=True, editable=False,
+        related_name='+'
+    )
+
     # Helps Pylance resolve the reverse relation from ProductImage
     if TYPE_CHECKING:
         images: RelatedManager['ProductImage']
 
     class Meta:
         ordering = ['-created_at']
+        # Partial indexes cover only live listings, matching the
+        # is_active=True, is_sold=False filter every public page applies.
+        indexes = [
+            models.Index(
+                fields=['-created_at', '-id'], name='product_live_newest_idx',
+                condition=models.Q(is_active=True, is_sold=False),
+            ),
+            models.Index(
+                fields=['price', 'id'], name='product_live_price_idx',
+                condition=models.Q(is_active=True, is_sold=False),
+            ),
+            models.Index(
+                fields=['category', '-created_at', '-id'], name='product_live_category_idx',
+                condition=models.Q(is_active=True, is_sold=False),
+            ),
+            # Price-sorted category pages and related-listing price windows
+            models.Index(
+                fields=['category', 'price', 'id'], name='product_live_cat_price_idx',
+                condition=models.Q(is_active=True, is_sold=False),
+            ),
+            models.Index(fields=['seller', '-created_at'], name='product_seller_newest_idx'),
+        ]
+
+    # Maintained with F() updates by marketplace.analytics; saving a copy
+    # loaded before a flush must not write the old values back
+    COUNTER_FIELDS = ('view_count', 'recent_viewer_count')
+    # Kept current by ProductImage signals with UPDATEs; same rule
+    SIGNAL_FIELDS = ('cover_image',)
+    # What the search index holds for a listing (marketplace.search)
+    SEARCH_FIELDS = ('title', 'description', 'category_id', 'location', 'is_active', 'is_sold')
 
     def __str__(self):
         return f"{self.title} — {self.seller.username}"
 
+    def save(self, *args, **kwargs):
+        # Facets group locations by their stripped, lower-cased text and
+        # filter with iexact, so stored values must carry no padding
+        if self.location:
+            self.location = self.location.strip()
+        if not self._state.adding and not kwargs.get('force_insert') and kwargs.get('update_fields') is None:
+            kwargs['update_fields'] = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key and field.name not in self.COUNTER_FIELDS + self.SIGNAL_FIELDS
+            ]
+        super().save(*args, **kwargs)
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Remember what was loaded so signals can tell what changed
+        instance._counted_category_id = instance.counted_category_id()
+        instance._search_state = instance.search_state()
+        return instance
+
+    def search_state(self):
+        """Values of SEARCH_FIELDS, or None when some weren't loaded."""
+        loaded = self.__dict__
+        if any(field not in loaded for field in self.SEARCH_FIELDS):
+            return None
+        return tuple(loaded[field] for field in self.SEARCH_FIELDS)
+
+    def counted_category_id(self):
+        """Category whose active_product_count includes this listing, if any."""
+        if self.is_active and not self.is_sold:
+            return self.category_id
+        return None
+
+    @classmethod
+    def refresh_cover_images(cls, product_ids=None, only_missing=False):
+        """
+        Points cover_image at each product's earliest remaining photo, in
+        one UPDATE. ``product_ids=None`` refreshes every product.
+        """
+        first_image = ProductImage.objects.filter(
+            product=OuterRef('pk')
+        ).order_by('uploaded_at', 'pk').values('pk')[:1]
+        products = cls.objects.all()
+        if product_ids is not None:
+            products = products.filter(pk__in=product_ids)
+        if only_missing:
+            products = products.filter(cover_image__isnull=True)
+        return products.update(cover_image=Subquery(first_image))
+
     def get_absolute_url(self):
         return reverse('marketplace:product_detail', kwargs={'pk': self.pk})
 
     def get_primary_image(self):
-        """Returns the first uploaded image or None."""
-        return self.images.first()
+        """
+        Returns the cover image or None. Uses prefetched ``images`` when
+        present, otherwise ``cover_image`` (select_related it in grids).
+        """
+        if 'images' in getattr(self, '_prefetched_objects_cache', {}):
+            images = self.images.all()
+            return images[0] if images else None
+        return self.cover_image
 
     @property
     def is_available(self):
         return self.is_active and not self.is_sold
 
+    @property
+    def photos_processing(self):
+        """True while any uploaded photo is still waiting for its renditions."""
+        pending = getattr(self, 'pending_photo_count', None)  # annotated by list views
+        if pending is not None:
+            return pending > 0
+        return any(not image.derivatives for image in self.images.all())
+
 
 class ProductImage(models.Model):
     product = models.ForeignKey(
@@ -89,8 +236,155 @@ class ProductImage(models.Model):
     image = models.ImageField(upload_to='product_images/')
     uploaded_at = models.DateTimeField(auto_now_add=True)
 
+    # Resized WebP renditions, see marketplace.images
+    content_hash = models.CharField(max_length=64, blank=True, editable=False)
+    derivatives = models.JSONField(default=dict, blank=True, editable=False)
+
     class Meta:
         ordering = ['uploaded_at']
 
     def __str__(self):
-        return f"Image for {self.product.title}"
\ No newline at end of file
+        return f"Image for {self.product.title}"
+
+    def get_url(self, size):
+        """
+        URL of the ``size`` rendition ('thumb', 'card' or 'detail').
+        Until it exists, points at a view that generates it on first request.
+        """
+        info = self.derivatives.get(size)
+        if info:
+            return default_storage.url(info['name'])
+        return reverse('marketplace:image_derivative', kwargs={'image_id': self.pk, 'size': size})
+
+    @property
+    def thumb_url(self):
+        return self.get_url('thumb')
+
+    @property
+    def card_url(self):
+        return self.get_url('card')
+
+    @property
+    def detail_url(self):
+        return self.get_url('detail')
+
+    @property
+    def srcset(self):
+        """Ready for ``<img srcset>``: every rendition with its pixel width."""
+        from .images import DERIVATIVE_SIZES
+        return ', '.join(
+            f"{self.get_url(size)} {self.derivatives.get(size, {}).get('width', edge)}w"
+            for size, edge in DERIVATIVE_SIZES.items()
+        )
+
+class ProductViewDay(models.Model):
+    """
+    Views of one listing on one day, with a HyperLogLog sketch of the
+    distinct viewers (see marketplace.analytics).
+    """
+    product = models.ForeignKey(
+        Product,
+        on_delete=models.CASCADE,
+        related_name='view_days'
+    )
+    day = models.DateField()
+    views = models.PositiveIntegerField(default=0)
+    sketch = models.BinaryField()
+
+    class Meta:
+        ordering = ['product', '-day']
+        constraints = [
+            models.UniqueConstraint(fields=['product', 'day'], name='productviewday_unique'),
+        ]
+
+    def __str__(self):
+        return f"{self.product_id} on {self.day}: {self.views} views"
+
+
+class RelatedProduct(models.Model):
+    """
+    One precomputed "you might also like" neighbour of a product, ranked
+    by score (see marketplace.recommendations). Rebuilt in the background
+    by ``manage.py refresh_recommendations``.
+    """
+    product = models.ForeignKey(
+        Product,
+        on_delete=models.CASCADE,
+        related_name='recommendations'
+    )
+    related = models.ForeignKey(
+        Product,
+        on_delete=models.CASCADE,
+        related_name='recommended_for'
+    )
+    rank = models.PositiveSmallIntegerField()
+    score = models.FloatField()
+    computed_at = models.DateTimeField()
+
+    class Meta:
+        ordering = ['product', 'rank']
+        constraints = [
+            models.UniqueConstraint(fields=['product', 'rank'], name='relatedproduct_rank_unique'),
+        ]
+
+    def __str__(self):
+        return f"{self.product_id} → {self.related_id} (#{self.rank})"
+
+
+class Match(models.Lookup):
+    """``field__match='...'``: an SQLite FTS5 full-text MATCH."""
+    lookup_name = 'match'
+
+    def as_sql(self, compiler, connection):
+        lhs, lhs_params = self.process_lhs(compiler, connection)
+        rhs, rhs_params = self.process_rhs(compiler, connection)
+        return f'{lhs} MATCH {rhs}', [*lhs_params, *rhs_params]
+
+
+class SearchDocument(models.Model):
+    """
+    A listing's row in the SQLite FTS5 index. The virtual table is
+    created and written with raw SQL (see marketplace.search); this
+    model only lets listing queries join it, filter on
+    ``search_document__document__match`` and order by its bm25 ``rank``.
+    """
+    product = models.OneToOneField(
+        Product,
+        on_delete=models.DO_NOTHING,
+        primary_key=True, db_column='rowid', db_constraint=False,
+        related_name='search_document'
+    )
+    # FTS5's hidden column named after the table: the whole row, for MATCH
+    document = models.TextField(db_column=FTS_TABLE)
+    # bm25() with the field weights set by FTS5Backend.configure()
+    rank = models.FloatField()
+
+    class Meta:
+        managed = False
+        db_table = FTS_TABLE
+
+
+SearchDocument._meta.get_field('document').register_lookup(Match)
+
+
+class SearchToken(models.Model):
+    """
+    One row of the portable inverted search index: a term that appears
+    in a product's searchable text, weighted by the field it came from.
+    Only used when SQLite FTS5 is unavailable (see marketplace.search).
+    """
+    term = models.CharField(max_length=64)
+    product = models.ForeignKey(
+        Product,
+        on_delete=models.CASCADE,
+        related_name='search_tokens'
+    )
+    weight = models.FloatField(default=1.0)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['term', 'product'], name='searchtoken_term_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.term} → {self.product_id}"
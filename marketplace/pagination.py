@@ -0,0 +1,159 @@
+"""
+Keyset (cursor) pagination for product listings.
+
+Instead of OFFSET/LIMIT, every page remembers the sort key of its last
+row and the next page asks for rows strictly after it. The database can
+walk the (sort column, pk) order from that point, so page 500 costs the
+same as page 1 no matter how large the catalog grows.
+"""
+import base64
+import binascii
+import json
+import math
+from decimal import Decimal, InvalidOperation
+
+from django.conf import settings
+from django.db.models import Q
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+
+# sort name -> (model field, descending?)
+SORT_KEYS = {
+    'newest': ('created_at', True),
+    'price_low': ('price', False),
+    'price_high': ('price', True),
+    # Only valid on querysets annotated by search.filter_by_search()
+    'relevance': ('search_rank', False),
+}
+DEFAULT_SORT = 'newest'
+
+
+class InvalidCursor(ValueError):
+    """Raised when a cursor is malformed or belongs to another sort order."""
+
+
+class KeysetPage:
+    """A single page of results plus the cursor for the page after it."""
+
+    def __init__(self, object_list, next_cursor, cursor=None):
+        self.object_list = object_list
+        self.next_cursor = next_cursor
+        self.cursor = cursor
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    @property
+    def has_next(self):
+        return self.next_cursor is not None
+
+    @property
+    def is_first(self):
+        return self.cursor is None
+
+
+class KeysetPaginator:
+    """
+    Paginates a queryset ordered by ``(sort field, pk)``.
+    The pk acts as a tiebreaker so rows sharing a price or timestamp
+    are never skipped or repeated between pages.
+    """
+
+    def __init__(self, queryset, sort=DEFAULT_SORT, per_page=24):
+        if sort not in SORT_KEYS:
+            sort = DEFAULT_SORT
+        self.sort = sort
+        self.field, self.descending = SORT_KEYS[sort]
+        self.per_page = per_page
+        self.queryset = queryset
+
+    def ordered(self):
+        if self.descending:
+            return self.queryset.order_by(f'-{self.field}', '-pk')
+        return self.queryset.order_by(self.field, 'pk')
+
+    # ── cursor encoding ──────────────────────
+
+    def encode_cursor(self, obj):
+        value = getattr(obj, self.field)
+        if hasattr(value, 'isoformat'):
+            value = value.isoformat()
+        elif not isinstance(value, float):  # search ranks round-trip exactly as JSON numbers
+            value = str(value)
+        payload = json.dumps([self.sort, value, obj.pk], separators=(',', ':'))
+        return base64.urlsafe_b64encode(payload.encode()).decode().rstrip('=')
+
+    def decode_cursor(self, cursor):
+        try:
+            padded = cursor + '=' * (-len(cursor) % 4)
+            sort, raw_value, pk = json.loads(base64.urlsafe_b64decode(padded))
+        except (ValueError, TypeError, binascii.Error):
+            raise InvalidCursor("Malformed cursor.")
+
+        if sort != self.sort or not isinstance(pk, int) or isinstance(pk, bool):
+            raise InvalidCursor("Cursor does not match the current sort order.")
+
+        if self.field == 'created_at':
+            try:
+                value = parse_datetime(raw_value) if isinstance(raw_value, str) else None
+            except ValueError:  # well-formed but impossible, e.g. February 30th
+                value = None
+            if value is not None and timezone.is_naive(value):
+                value = None
+        elif self.field == 'search_rank':
+            value = raw_value if isinstance(raw_value, float) and math.isfinite(raw_value) else None
+        else:
+            try:
+                value = Decimal(raw_value) if isinstance(raw_value, str) else None
+            except InvalidOperation:
+                value = None
+            if value is not None and not value.is_finite():  # NaN and Infinity parse fine
+                value = None
+        if value is None:
+            raise InvalidCursor("Malformed cursor value.")
+        return value, pk
+
+    # ── paging ───────────────────────────────
+
+    def after(self, cursor=None):
+        """Ordered queryset of the rows that follow ``cursor``."""
+        queryset = self.ordered()
+        if cursor:
+            value, pk = self.decode_cursor(cursor)
+            lookup = 'lt' if self.descending else 'gt'
+            queryset = queryset.filter(
+                Q(**{f'{self.field}__{lookup}': value}) |
+                Q(**{self.field: value, f'pk__{lookup}': pk})
+            )
+        return queryset
+
+    def page(self, cursor=None):
+        """
+        Returns the page that follows ``cursor`` (or the first page).
+        Fetches one extra row to learn whether another page exists
+        without running a COUNT.
+        """
+        rows = list(self.after(cursor)[:self.per_page + 1])
+        next_cursor = None
+        if len(rows) > self.per_page:
+            rows = rows[:self.per_page]
+            next_cursor = self.encode_cursor(rows[-1])
+        return KeysetPage(rows, next_cursor, cursor or None)
+
+
+def approximate_count(queryset, cap=None):
+    """
+    Counts at most ``cap`` matching rows.
+    Returns ``(count, is_capped)`` — when capped, the real total is
+    "cap or more" and the database stopped scanning early.
+    """
+    if cap is None:
+        cap = getattr(settings, 'LISTINGS_COUNT_CAP', 1000)
+    count = queryset.order_by()[:cap + 1].count()
+    if count > cap:
+        return cap, True
+    return count, False
@@ -0,0 +1,300 @@
+"""
+Precomputed "related products" for the listing detail page.
+
+Every active listing gets up to ``STORED_NEIGHBOURS`` live neighbours,
+scored on four signals (see ``WEIGHTS``):
+
+* ``category`` — listed in the same category,
+* ``price``    — how close the prices are (1 when equal),
+* ``title``    — overlap of the title words (Jaccard),
+* ``chat``     — buyers who opened a chat about one also chatted about
+  the other.
+
+Scoring every pair would be quadratic, so a listing is only compared
+with a candidate pool: the nearest-priced listings in its category,
+listings sharing an uncommon title word, and co-messaged listings.
+
+Lists are stored in ``RelatedProduct`` and refreshed in the background
+by ``manage.py refresh_recommendations`` — incrementally by default,
+from scratch with ``--full``. An incremental refresh only loads the
+changed listings' neighbourhoods (their categories, the search index's
+matches for their uncommon title words, co-messaged listings) and only
+invalidates the cached cards of the listings it refreshed. The detail
+page reads the lists with one indexed join and caches the rendered cards.
+"""
+import heapq
+from bisect import bisect_left
+from collections import Counter, defaultdict
+
+from django.db import transaction
+from django.db.models import Max, Q
+from django.utils import timezone
+
+from chat.models import ChatRoom
+from .cache import RELATED, bump_versions, product_scope
+from .models import Product, RelatedProduct
+from .search import get_backend, tokenize
+
+
+WEIGHTS = {'category': 1.0, 'price': 1.0, 'title': 2.0, 'chat': 1.5}
+STORED_NEIGHBOURS = 8       # kept per listing, so a few can sell without a refresh
+SHOWN_NEIGHBOURS = 4
+PRICE_WINDOW = 15           # nearest-priced listings taken from the same category
+COMMON_WORD_LIMIT = 200     # words on more listings than this don't suggest candidates
+CHAT_SATURATION = 3         # shared buyers beyond this add nothing
+BUYER_ROOM_LIMIT = 50       # buyers with more chats than this are ignored as noise
+BATCH_SIZE = 500
+
+STOP_WORDS = frozenset({
+    'a', 'an', 'and', 'for', 'in', 'of', 'on', 'the', 'to', 'with',
+    'new', 'used', 'good', 'condition', 'sale', 'selling',
+})
+
+
+def title_words(title):
+    return frozenset(w for w in tokenize(title) if len(w) > 1 and w not in STOP_WORDS)
+
+
+# ─────────────────────────────────────────────
+# Scoring
+# ─────────────────────────────────────────────
+
+class Catalog:
+    """
+    In-memory snapshot of the active listings (or of the part of them a
+    few listings' neighbourhoods span), indexed for candidate lookup.
+    """
+
+    def __init__(self, listings, rooms, common_words=frozenset()):
+        # pk -> (category_id, price, title words, live)
+        self.listings = listings
+        # Words known to be on more than COMMON_WORD_LIMIT listings, for
+        # snapshots that don't hold every listing carrying them
+        self.common_words = common_words
+        self.by_category = defaultdict(list)  # category_id -> [(price, pk)], sorted
+        self.by_word = defaultdict(list)
+        for pk, (category_id, price, words, live) in listings.items():
+            if not live:
+                continue
+            if category_id:
+                self.by_category[category_id].append((price, pk))
+            for word in words:
+                self.by_word[word].append(pk)
+        for entries in self.by_category.values():
+            entries.sort()
+        self.category_prices = {
+            category_id: [price for price, _ in entries]
+            for category_id, entries in self.by_category.items()
+        }
+        self.co_messaged = self._co_messaged(rooms)
+
+    @classmethod
+    def load(cls, product_ids=None, include=()):
+        """
+        The whole catalog, or only what scoring ``product_ids`` needs: live
+        listings in their categories, listings sharing one of their
+        uncommon title words and listings co-messaged with them, plus the
+        ``include`` listings (which the search index may not hold yet).
+        """
+        active = Product.objects.filter(is_active=True)
+        rooms = ChatRoom.objects.all()
+        common_words = frozenset()
+        if product_ids is not None:
+            targets = active.filter(pk__in=product_ids).values_list('category_id', 'price', 'title')
+            windows, words = set(), set()
+            for category_id, price, title in targets:
+                if category_id:
+                    windows.update(cls._price_window(category_id, price))
+                words.update(title_words(title))
+            common_words, word_matches = cls._title_word_matches(words)
+            # Every room of the buyers involved, so BUYER_ROOM_LIMIT still applies
+            rooms = rooms.filter(
+                buyer_id__in=ChatRoom.objects.filter(product_id__in=product_ids).values('buyer_id')
+            )
+            active = active.filter(
+                Q(pk__in=product_ids) | Q(pk__in=include) | Q(pk__in=windows)
+                | Q(pk__in=word_matches) | Q(pk__in=rooms.values('product_id'))
+            )
+
+        rows = active.values_list('pk', 'category_id', 'price', 'title', 'is_sold')
+        listings = {
+            pk: (category_id, float(price), title_words(title), not is_sold)
+            for pk, category_id, price, title, is_sold in rows.iterator(chunk_size=2000)
+        }
+        rooms = rooms.values_list('buyer_id', 'product_id')
+        return cls(listings, rooms.iterator(chunk_size=2000), common_words)
+
+    @staticmethod
+    def _price_window(category_id, price):
+        """
+        The same-category candidates ``candidates()`` takes from a full
+        snapshot: the PRICE_WINDOW live listings on either side of ``price``.
+        """
+        live = Product.objects.filter(is_active=True, is_sold=False, category_id=category_id)
+        below = live.filter(price__lt=price).order_by('-price', '-pk')[:PRICE_WINDOW]
+        above = live.filter(price__gte=price).order_by('price', 'pk')[:PRICE_WINDOW]
+        return [*below.values_list('pk', flat=True), *above.values_list('pk', flat=True)]
+
+    @staticmethod
+    def _title_word_matches(words):
+        """``(common words, ids of listings with any other word in their title)``."""
+        backend = get_backend()
+        common = frozenset(
+            word for word in words
+            if backend.title_matches([word])[:COMMON_WORD_LIMIT + 1].count() > COMMON_WORD_LIMIT
+        )
+        uncommon = words - common
+        if not uncommon:
+            return common, []
+        return common, backend.title_matches(uncommon)
+
+    @staticmethod
+    def _co_messaged(rooms):
+        by_buyer = defaultdict(set)
+        for buyer_id, product_id in rooms:
+            by_buyer[buyer_id].add(product_id)
+        shared = defaultdict(Counter)
+        for products in by_buyer.values():
+            if len(products) > BUYER_ROOM_LIMIT:
+                continue
+            for pk in products:
+                for other in products:
+                    if other != pk:
+                        shared[pk][other] += 1
+        return shared
+
+    def candidates(self, pk):
+        category_id, price, words, _ = self.listings[pk]
+        pool = set()
+        if category_id in self.by_category:
+            entries = self.by_category[category_id]
+            middle = bisect_left(self.category_prices[category_id], price)
+            low = max(0, middle - PRICE_WINDOW)
+            pool.update(other for _, other in entries[low:middle + PRICE_WINDOW])
+        for word in words - self.common_words:
+            posting = self.by_word.get(word, ())
+            if len(posting) <= COMMON_WORD_LIMIT:
+                pool.update(posting)
+        pool.update(other for other in self.co_messaged.get(pk, ()) if other in self.listings)
+        pool.discard(pk)
+        return pool
+
+    def score(self, pk, other):
+        category_id, price, words, _ = self.listings[pk]
+        other_category, other_price, other_words, _ = self.listings[other]
+        score = 0.0
+        if category_id and category_id == other_category:
+            score += WEIGHTS['category']
+        highest = max(price, other_price)
+        if highest > 0:
+            score += WEIGHTS['price'] * (1 - abs(price - other_price) / highest)
+        else:
+            score += WEIGHTS['price']
+        if words and other_words:
+            score += WEIGHTS['title'] * len(words & other_words) / len(words | other_words)
+        shared = self.co_messaged.get(pk, {}).get(other, 0)
+        if shared:
+            score += WEIGHTS['chat'] * min(shared, CHAT_SATURATION) / CHAT_SATURATION
+        return score
+
+    def neighbours(self, pk, limit=STORED_NEIGHBOURS):
+        """``(score, pk)`` of the best live neighbours, best first."""
+        if pk not in self.listings:
+            return []
+        scored = ((self.score(pk, other), other) for other in self.candidates(pk)
+                  if self.listings[other][3])
+        return heapq.nlargest(limit, scored)
+
+
+# ─────────────────────────────────────────────
+# Refreshing the table
+# ─────────────────────────────────────────────
+
+def last_refreshed_at():
+    return RelatedProduct.objects.aggregate(at=Max('computed_at'))['at']
+
+
+def stale_product_ids(since):
+    """Listings changed or newly chatted about since ``since``, plus those pointing at them."""
+    changed = set(Product.objects.filter(updated_at__gt=since).values_list('pk', flat=True))
+    changed.update(ChatRoom.objects.filter(created_at__gt=since).values_list('product_id', flat=True))
+    pointing = RelatedProduct.objects.filter(related_id__in=changed).values_list('product_id', flat=True)
+    return changed | set(pointing)
+
+
+def _store(catalog, product_ids, computed_at, batch_size):
+    """Replaces the stored lists of ``product_ids``; returns every neighbour written."""
+    written = set()
+    for start in range(0, len(product_ids), batch_size):
+        batch = product_ids[start:start + batch_size]
+        rows = []
+        for pk in batch:
+            for rank, (score, other) in enumerate(catalog.neighbours(pk)):
+                rows.append(RelatedProduct(
+                    product_id=pk, related_id=other, rank=rank,
+                    score=round(score, 4), computed_at=computed_at,
+                ))
+                written.add(other)
+        with transaction.atomic():
+            RelatedProduct.objects.filter(product_id__in=batch).delete()
+            RelatedProduct.objects.bulk_create(rows)
+    return written
+
+
+def refresh_recommendations(product_ids=None, batch_size=BATCH_SIZE):
+    """
+    Recomputes neighbour lists for ``product_ids``, or for every active
+    listing when None. In the incremental case the refreshed listings'
+    neighbours are recomputed too, so a new listing also shows up on the
+    pages it is similar to. Returns the number of listings refreshed.
+    """
+    computed_at = timezone.now()
+
+    if product_ids is None:
+        catalog = Catalog.load()
+        RelatedProduct.objects.exclude(product__is_active=True).delete()
+        refreshed = list(catalog.listings)
+        _store(catalog, refreshed, computed_at, batch_size)
+        if refreshed:
+            bump_versions(RELATED)
+        return len(refreshed)
+
+    refreshed = list(set(product_ids))
+    gained = _refresh_batches(refreshed, computed_at, batch_size)
+    follow_up = list(gained - set(refreshed))
+    _refresh_batches(follow_up, computed_at, batch_size, include=refreshed)
+    refreshed += follow_up
+    # Only these listings' suggestion cards changed
+    bump_versions(*(product_scope(pk) for pk in refreshed))
+    return len(refreshed)
+
+
+def _refresh_batches(product_ids, computed_at, batch_size, include=()):
+    """Incremental refresh, loading one batch's neighbourhood at a time."""
+    written = set()
+    for start in range(0, len(product_ids), batch_size):
+        batch = product_ids[start:start + batch_size]
+        written |= _store(Catalog.load(batch, include), batch, computed_at, batch_size)
+    return written
+
+
+# ─────────────────────────────────────────────
+# Serving
+# ─────────────────────────────────────────────
+
+def related_products(product, limit=SHOWN_NEIGHBOURS):
+    """
+    The stored neighbours of ``product`` that are still live, best first.
+    Until the table has been refreshed for it, falls back to the newest
+    listings in the same category.
+    """
+    live = Product.objects.filter(is_active=True, is_sold=False).select_related('cover_image')
+    related = list(
+        live.filter(recommended_for__product=product).order_by('recommended_for__rank')[:limit]
+    )
+    if not related and product.category_id:
+        related = list(
+            live.filter(category_id=product.category_id).exclude(pk=product.pk)
+            .order_by('-created_at')[:limit]
+        )
+    return related
@@ -0,0 +1,236 @@
+"""
+Full-text search over product listings.
+
+Two interchangeable backends keep an inverted index of every available
+listing's title, description, category and location:
+
+* ``FTS5Backend``   — an SQLite FTS5 virtual table ranked with bm25().
+* ``TokenBackend``  — a plain ``SearchToken`` table (term → product,
+  weight) that works on any database, ranked by summed term weights.
+
+Either way a search is a filter plus a ``search_rank`` annotation on the
+listing queryset, matched and ranked by the database: every match is
+reachable through pagination and the facet counts cover all of them.
+
+The index is kept current by the signals in ``marketplace.signals`` and
+can be rebuilt from scratch with ``manage.py rebuild_search_index``.
+Both backends match every query word as a prefix, so "calc tex" finds
+"Calculus Textbook".
+"""
+import re
+from collections import defaultdict
+from functools import lru_cache
+
+from django.conf import settings
+from django.db import connection
+from django.db.models import F, FloatField, OuterRef, Subquery, Sum, Value
+
+
+FTS_TABLE = 'marketplace_product_fts'
+
+# Relative importance of each indexed field (title matters most)
+FIELD_WEIGHTS = {
+    'title': 3.0,
+    'description': 1.0,
+    'category': 2.0,
+    'location': 2.0,
+}
+
+TOKEN_RE = re.compile(r'\w+', re.UNICODE)
+MAX_TERM_LENGTH = 64
+
+
+def tokenize(text):
+    """Lower-cased word tokens of ``text``, truncated to the index term size."""
+    if not text:
+        return []
+    return [t[:MAX_TERM_LENGTH] for t in TOKEN_RE.findall(text.lower())]
+
+
+def document_for(product):
+    """The searchable text of a product, keyed by indexed field."""
+    return {
+        'title': product.title or '',
+        'description': product.description or '',
+        'category': product.category.name if product.category_id else '',
+        'location': product.location or '',
+    }
+
+
+def should_index(product):
+    """Only listings that can appear on the browse page are indexed."""
+    return product.is_active and not product.is_sold
+
+
+class BaseSearchBackend:
+    name = None
+
+    def index(self, product):
+        raise NotImplementedError
+
+    def remove(self, product_id):
+        raise NotImplementedError
+
+    def clear(self):
+        raise NotImplementedError
+
+    def filter(self, queryset, terms):
+        """
+        Restricts ``queryset`` to products matching every term as a
+        prefix and annotates ``search_rank`` (lower is better).
+        """
+        raise NotImplementedError
+
+    def title_matches(self, words):
+        """
+        Ids (as a ``values()`` queryset) of indexed listings having any of
+        ``words`` as a whole word in their title. Used to find related
+        listings without loading the catalog.
+        """
+        raise NotImplementedError
+
+    def update(self, product):
+        if should_index(product):
+            self.index(product)
+        else:
+            self.remove(product.pk)
+
+    def rebuild(self, queryset, batch_size=500):
+        """Drops the whole index and re-indexes ``queryset``. Returns the row count."""
+        self.clear()
+        indexed = 0
+        for product in queryset.select_related('category').iterator(chunk_size=batch_size):
+            if should_index(product):
+                self.index(product)
+                indexed += 1
+        return indexed
+
+
+class FTS5Backend(BaseSearchBackend):
+    name = 'fts5'
+
+    @staticmethod
+    def is_available():
+        if connection.vendor != 'sqlite':
+            return False
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = %s",
+                [FTS_TABLE],
+            )
+            return cursor.fetchone() is not None
+
+    def index(self, product):
+        doc = document_for(product)
+        with connection.cursor() as cursor:
+            cursor.execute(f"DELETE FROM {FTS_TABLE} WHERE rowid = %s", [product.pk])
+            cursor.execute(
+                f"INSERT INTO {FTS_TABLE} (rowid, title, description, category, location) "
+                f"VALUES (%s, %s, %s, %s, %s)",
+                [product.pk, doc['title'], doc['description'], doc['category'], doc['location']],
+            )
+
+    def remove(self, product_id):
+        with connection.cursor() as cursor:
+            cursor.execute(f"DELETE FROM {FTS_TABLE} WHERE rowid = %s", [product_id])
+
+    def clear(self):
+        with connection.cursor() as cursor:
+            cursor.execute(f"DELETE FROM {FTS_TABLE}")
+
+    @staticmethod
+    def configure():
+        """Makes the table's ``rank`` column bm25() with FIELD_WEIGHTS."""
+        weights = ', '.join(str(FIELD_WEIGHTS[f]) for f in ('title', 'description', 'category', 'location'))
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"INSERT INTO {FTS_TABLE} ({FTS_TABLE}, rank) VALUES ('rank', %s)",
+                [f'bm25({weights})'],
+            )
+
+    def rebuild(self, queryset, batch_size=500):
+        self.configure()
+        return super().rebuild(queryset, batch_size)
+
+    def filter(self, queryset, terms):
+        # Every word quoted (no FTS syntax injection) and prefix-matched.
+        # Joined rather than a correlated subquery: bm25() is only cheap
+        # on the cursor that ran the MATCH.
+        match = ' '.join(f'"{term}"*' for term in terms)
+        return queryset.filter(
+            search_document__document__match=match
+        ).annotate(search_rank=F('search_document__rank'))
+
+    def title_matches(self, words):
+        from .models import SearchDocument
+        match = 'title : (' + ' OR '.join(f'"{word}"' for word in words) + ')'
+        return SearchDocument.objects.filter(document__match=match).values('product_id')
+
+
+class TokenBackend(BaseSearchBackend):
+    name = 'tokens'
+
+    def _tokens_for(self, product):
+        weights = defaultdict(float)
+        for field, text in document_for(product).items():
+            for term in tokenize(text):
+                weights[term] += FIELD_WEIGHTS[field]
+        return weights
+
+    def index(self, product):
+        from .models import SearchToken
+        SearchToken.objects.filter(product_id=product.pk).delete()
+        SearchToken.objects.bulk_create([
+            SearchToken(term=term, product_id=product.pk, weight=weight)
+            for term, weight in self._tokens_for(product).items()
+        ])
+
+    def remove(self, product_id):
+        from .models import SearchToken
+        SearchToken.objects.filter(product_id=product_id).delete()
+
+    def clear(self):
+        from .models import SearchToken
+        SearchToken.objects.all().delete()
+
+    def filter(self, queryset, terms):
+        from .models import SearchToken
+        rank = Value(0.0)
+        for term in dict.fromkeys(terms):
+            # Range scan instead of LIKE so the term index is always usable
+            tokens = SearchToken.objects.filter(term__gte=term, term__lt=term + '\uffff')
+            # Every query word has to match (AND semantics)
+            queryset = queryset.filter(pk__in=tokens.values('product_id'))
+            score = tokens.filter(product=OuterRef('pk')).order_by().values('product').annotate(
+                score=Sum('weight')
+            ).values('score')
+            rank = rank - Subquery(score, output_field=FloatField())
+        return queryset.annotate(search_rank=rank)
+
+    def title_matches(self, words):
+        from .models import SearchToken
+        # Terms are not stored per field, so this also matches other fields
+        return SearchToken.objects.filter(term__in=list(words)).values('product_id')
+
+
+@lru_cache(maxsize=None)
+def get_backend():
+    """
+    Picks the backend named by settings.SEARCH_BACKEND
+    ('fts5', 'tokens' or 'auto' — FTS5 when the table exists).
+    """
+    choice = getattr(settings, 'SEARCH_BACKEND', 'auto')
+    if choice == 'fts5' or (choice == 'auto' and FTS5Backend.is_available()):
+        return FTS5Backend()
+    return TokenBackend()
+
+
+def filter_by_search(queryset, query):
+    """
+    Restricts ``queryset`` to products matching ``query`` and annotates
+    ``search_rank`` (lower is better) for relevance ordering.
+    """
+    terms = tokenize(query)
+    if not terms:
+        return queryset.none().annotate(search_rank=Value(0.0))
+    return get_backend().filter(queryset, terms)
@@ -0,0 +1,146 @@
+from django.conf import settings
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save, pre_delete
+from django.dispatch import receiver
+
+from .models import Category, Product, ProductImage, RelatedProduct
+from . import tasks
+from .cache import CATEGORIES, LISTINGS, bump_versions, product_scope
+
+
+# ─────────────────────────────────────────────
+# Search index maintenance (deferred to the job queue)
+# ─────────────────────────────────────────────
+
+@receiver(post_save, sender=Product)
+def index_product(sender, instance, created=False, raw=False, **kwargs):
+    """
+    Adds, refreshes or drops a listing in the search index when a save
+    changed what the index holds (text, category or visibility).
+    """
+    if raw:
+        return
+    state = instance.search_state()
+    if not created and state is not None and state == getattr(instance, '_search_state', None):
+        return
+    tasks.update_search_index.delay(instance.pk)
+    instance._search_state = state
+
+
+@receiver(post_delete, sender=Product)
+def unindex_product(sender, instance, **kwargs):
+    tasks.update_search_index.delay(instance.pk)
+
+
+@receiver(post_save, sender=Category)
+def reindex_category(sender, instance, created=False, raw=False, **kwargs):
+    """Category names are searchable, so a rename re-indexes its listings."""
+    if raw or created:
+        return
+    tasks.reindex_category.delay(instance.pk)
+
+
+# ─────────────────────────────────────────────
+# Image derivatives (deferred to the job queue)
+# ─────────────────────────────────────────────
+
+@receiver(post_save, sender=ProductImage)
+def build_image_derivatives(sender, instance, created=False, raw=False, **kwargs):
+    """
+    Queues thumbnail rendering for a new upload. Until the job runs the
+    listing shows as "photos processing" and the lazy derivative view
+    covers any request for a missing rendition.
+    """
+    if raw or not created or not getattr(settings, 'IMAGE_DERIVATIVES_ON_UPLOAD', True):
+        return
+    tasks.build_image_derivatives.delay(instance.pk)
+
+
+# ─────────────────────────────────────────────
+# Cover images
+# ─────────────────────────────────────────────
+
+@receiver(post_save, sender=ProductImage)
+def set_cover_image(sender, instance, created=False, raw=False, **kwargs):
+    """A listing's first photo becomes its cover."""
+    if raw or not created:
+        return
+    Product.objects.filter(
+        pk=instance.product_id, cover_image__isnull=True
+    ).update(cover_image=instance)
+
+
+@receiver(post_delete, sender=ProductImage)
+def replace_cover_image(sender, instance, origin=None, **kwargs):
+    """Deleting the cover (already nulled by SET_NULL) promotes the next photo."""
+    if isinstance(origin, Product):
+        return  # the whole listing is going
+    Product.refresh_cover_images([instance.product_id], only_missing=True)
+
+
+# ─────────────────────────────────────────────
+# Category active-listing counts
+# ─────────────────────────────────────────────
+
+@receiver(post_save, sender=Product)
+def update_category_counts(sender, instance, created=False, raw=False, **kwargs):
+    """
+    Moves the listing's contribution between categories when it is
+    created, re-categorised, sold / un-sold or (de)activated.
+    """
+    if raw:
+        return
+    before = None if created else getattr(instance, '_counted_category_id', None)
+    after = instance.counted_category_id()
+    if before != after:
+        with transaction.atomic():
+            Category.adjust_active_count(before, -1)
+            Category.adjust_active_count(after, 1)
+    instance._counted_category_id = after
+
+
+@receiver(post_delete, sender=Product)
+def release_category_count(sender, instance, **kwargs):
+    Category.adjust_active_count(getattr(instance, '_counted_category_id', None), -1)
+
+
+# ─────────────────────────────────────────────
+# Catalog cache invalidation
+# ─────────────────────────────────────────────
+
+def bump_listing_versions(product_id):
+    """
+    A listing changed: listing grids, its own detail page and the detail
+    pages whose suggestions show it are out of date.
+    """
+    recommended_by = RelatedProduct.objects.filter(related_id=product_id).values_list('product_id', flat=True)
+    bump_versions(
+        LISTINGS, product_scope(product_id),
+        *(product_scope(pk) for pk in recommended_by),
+    )
+
+
+@receiver(post_save, sender=Product)
+@receiver(pre_delete, sender=Product)
+def invalidate_listing_cache(sender, instance, raw=False, **kwargs):
+    # Before a delete, while the suggestion rows pointing at it still exist
+    if raw:
+        return
+    bump_listing_versions(instance.pk)
+
+
+@receiver(post_save, sender=ProductImage)
+@receiver(post_delete, sender=ProductImage)
+def invalidate_photo_cache(sender, instance, raw=False, origin=None, **kwargs):
+    if raw or isinstance(origin, Product):
+        return  # the listing's own delete already bumped
+    bump_listing_versions(instance.product_id)
+
+
+@receiver(post_save, sender=Category)
+@receiver(post_delete, sender=Category)
+def invalidate_category_cache(sender, raw=False, **kwargs):
+    """Listings show their category, and a delete un-categorises them."""
+    if raw:
+        return
+    bump_versions(CATEGORIES, LISTINGS)
@@ -0,0 +1,49 @@
+"""Background work for the marketplace app, run by the jobs queue."""
+from jobs.queue import task
+
+from .cache import bump_versions, product_scope
+from .images import ImageTooLarge, generate_derivatives
+from .models import Category, Product, ProductImage
+from .search import get_backend
+
+
+@task(max_attempts=5)
+def build_image_derivatives(image_id):
+    image = ProductImage.objects.filter(pk=image_id).first()
+    if image is None:
+        return
+    try:
+        generate_derivatives(image)
+    except ImageTooLarge:
+        return  # retrying cannot help; the lazy view answers 404
+    # Its detail page can link the renditions directly now. Other cached
+    # pages keep the lazy URLs, which redirect, until they expire.
+    bump_versions(product_scope(image.product_id))
+
+
+@task(max_attempts=5)
+def update_search_index(product_id):
+    """Indexes, refreshes or drops one listing according to its current state."""
+    product = Product.objects.select_related('category').filter(pk=product_id).first()
+    if product is None:
+        get_backend().remove(product_id)
+    else:
+        get_backend().update(product)
+
+
+@task(max_attempts=5)
+def index_products(product_ids):
+    """Indexes a batch of listings, e.g. after a bulk import."""
+    backend = get_backend()
+    for product in Product.objects.select_related('category').filter(pk__in=product_ids):
+        backend.update(product)
+
+
+@task(max_attempts=5)
+def reindex_category(category_id):
+    category = Category.objects.filter(pk=category_id).first()
+    if category is None:
+        return
+    backend = get_backend()
+    for product in category.products.filter(is_active=True, is_sold=False).select_related('category'):
+        backend.index(product)
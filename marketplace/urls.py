@@ -7,12 +7,15 @@ urlpatterns = [
     # Landing page for guests, product list for logged-in users
     path('', views.LandingView.as_view(), name='landing'),
     path('listings/', views.ProductListView.as_view(), name='product_list'),
+    path('listings/feed.json', views.ProductFeedView.as_view(), name='product_feed'),
 
     # My listings dashboard
     path('my-listings/', views.MyListingsView.as_view(), name='my_listings'),
 
     # Product CRUD
     path('listings/new/', views.ProductCreateView.as_view(), name='product_create'),
+    path('listings/import/', views.ProductImportView.as_view(), name='product_import'),
+    path('listings/export/', views.ProductExportView.as_view(), name='product_export'),
     path('listings/<int:pk>/', views.ProductDetailView.as_view(), name='product_detail'),
     path('listings/<int:pk>/edit/', views.ProductEditView.as_view(), name='product_edit'),
     path('listings/<int:pk>/delete/', views.ProductDeleteView.as_view(), name='product_delete'),
@@ -20,4 +23,7 @@ urlpatterns = [
     # Actions
     path('listings/<int:pk>/sold/', views.mark_as_sold, name='mark_as_sold'),
     path('images/<int:image_id>/delete/', views.delete_product_image, name='delete_image'),
+
+    # Resized WebP renditions, generated on first request if missing
+    path('images/<int:image_id>/<slug:size>.webp', views.image_derivative, name='image_derivative'),
 ]
\ No newline at end of file
@@ -1,13 +1,32 @@
 from django.shortcuts import render, redirect, get_object_or_404
+from django.template.loader import render_to_string
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
 from django.utils.decorators import method_decorator
 from django.views import View
-from django.http import Http404
-from django.db.models import Q, Count
-
+from django.http import Http404, HttpResponseRedirect, JsonResponse, StreamingHttpResponse
+from django.utils.cache import patch_cache_control
+from django.core.paginator import Paginator
+from django.db.models import Count, OuterRef, Q, Subquery, Sum
+from django.db.models.functions import Coalesce
+
+from accounts.models import User
+from bingo_project.conditional import ConditionalGetMixin
+from chat.models import ChatRoom
+from . import cache as catalog_cache
 from .models import Product, ProductImage, Category
-from .forms import ProductForm
+from .forms import ListingImportForm, ProductForm
+from .bulk import (
+    ImportFileError, UploadedImageSource, detect_format, export_listings, import_listings, text_stream,
+)
+from .images import DERIVATIVE_SIZES, ImageTooLarge, generate_derivatives
+from .search import filter_by_search
+from .recommendations import related_products
+from .analytics import record_view
+from .facets import FACETS_CACHE_TIMEOUT, FacetSelection, build_facets, facet_rows, rows_cache_key
+from .pagination import (
+    DEFAULT_SORT, SORT_KEYS, InvalidCursor, KeysetPaginator, approximate_count,
+)
 
 
 # ─────────────────────────────────────────────
@@ -19,95 +38,241 @@ class LandingView(View):
     Shows a marketing landing page to logged-out visitors.
     Logged-in users are sent straight to the product listing.
     """
+    # Names of the cached fragments (see marketplace.cache)
+    fragments = ('landing:categories', 'landing:recent')
+    # Read-only page: may be served from a replica (see bingo_project.database)
+    replica_reads = True
+
     def get(self, request):
         if request.user.is_authenticated:
             return redirect('marketplace:product_list')
 
-        # Grab a few recent products to show as preview
-        recent_products = Product.objects.filter(
-            is_active=True, is_sold=False
-        ).prefetch_related('images').order_by('-created_at')[:6]
-
-        categories = Category.objects.annotate(
-            product_count=Count('products', filter=Q(
-                products__is_active=True,
-                products__is_sold=False
-            ))
+        # Both sections are rendered once and reused for every visitor
+        # until a category (or its count) or a listing changes.
+        categories_html = catalog_cache.get_or_build(
+            'landing:categories', self.render_categories, scopes=(catalog_cache.CATEGORIES,)
+        )
+        recent_html = catalog_cache.get_or_build(
+            'landing:recent', self.render_recent_products, scopes=(catalog_cache.LISTINGS,)
         )
 
         return render(request, 'landing.html', {
-            'recent_products': recent_products,
+            'categories_html': categories_html,
+            'recent_html': recent_html,
+        })
+
+    def render_categories(self):
+        categories = Category.objects.all()
+        return render_to_string('marketplace/_landing_categories.html', {
             'categories': categories,
         })
 
+    def render_recent_products(self):
+        # Grab a few recent products to show as preview
+        recent_products = Product.objects.filter(
+            is_active=True, is_sold=False
+        ).select_related('cover_image').order_by('-created_at')[:6]
+        return render_to_string('marketplace/_landing_recent.html', {
+            'recent_products': recent_products,
+        })
+
 
 # ─────────────────────────────────────────────
 # Product List View (Homepage)
 # ─────────────────────────────────────────────
 
-class ProductListView(View):
+class ListingFilterMixin:
     """
-    Displays all active, unsold product listings.
-    Supports search by keyword and filter by category.
+    Shared search / facet filtering for the listing page and its JSON
+    feed, so both always return the same rows.
     """
-    template_name = 'marketplace/product_list.html'
+    paginate_by = 24
+    fragments = ('categories', 'listing:facets')
 
-    def get(self, request):
-        products = Product.objects.filter(
-            is_active=True, is_sold=False
-        ).select_related('seller', 'category').prefetch_related('images')
-
-        categories = Category.objects.annotate(
-            product_count=Count('products', filter=Q(
-                products__is_active=True,
-                products__is_sold=False
-            ))
+    def get_categories(self):
+        return catalog_cache.get_or_build(
+            'categories', lambda: list(Category.objects.all()), scopes=(catalog_cache.CATEGORIES,)
         )
 
+    def get_search_base(self, query):
+        """Live listings matching the search query (run once per request)."""
+        if getattr(self, '_search_base', None) is None:
+            products = Product.objects.filter(is_active=True, is_sold=False)
+            if query:
+                products = filter_by_search(products, query)
+            self._search_base = products
+        return self._search_base
+
+    def get_listing_filters(self, request):
         query = request.GET.get('q', '').strip()
-        if query:
-            products = products.filter(
-                Q(title__icontains=query) | Q(description__icontains=query)
-            )
+        categories = self.get_categories()
+        selection = FacetSelection.from_query(request.GET, categories)
 
-        category_slug = request.GET.get('category', '').strip()
-        active_category = None
-        if category_slug:
-            active_category = get_object_or_404(Category, slug=category_slug)
-            products = products.filter(category=active_category)
-
-        condition = request.GET.get('condition', '').strip()
-        if condition:
-            products = products.filter(condition=condition)
-
-        sort = request.GET.get('sort', 'newest')
-        if sort == 'price_low':
-            products = products.order_by('price')
-        elif sort == 'price_high':
-            products = products.order_by('-price')
-        else:
-            products = products.order_by('-created_at')
+        products = selection.apply(
+            self.get_search_base(query)
+        ).select_related('seller', 'category', 'cover_image').defer(*User.deferred_profile('seller'))
 
-        context = {
-            'products': products,
-            'categories': categories,
+        # Searches default to best-match order; relevance needs a query
+        sort = request.GET.get('sort', 'relevance' if query else DEFAULT_SORT)
+        if sort not in SORT_KEYS or (sort == 'relevance' and not query):
+            sort = DEFAULT_SORT
+
+        return products, {
             'query': query,
-            'active_category': active_category,
-            'condition': condition,
+            'categories': categories,
+            'selection': selection,
+            'active_category': selection.category,
+            'condition': selection.condition,
             'sort': sort,
-            'total_count': products.count(),
+        }
+
+    def get_facets(self, request, filters):
+        """Facet counts for the sidebar: at most one grouped query."""
+        query = filters['query']
+        rows = catalog_cache.get_or_build(
+            'listing:facets',
+            lambda: facet_rows(self.get_search_base(query)),
+            scopes=(catalog_cache.LISTINGS, catalog_cache.CATEGORIES),
+            timeout=FACETS_CACHE_TIMEOUT,
+            key=rows_cache_key(query),
+        )
+        return build_facets(rows, filters['selection'], filters['categories'], request.GET)
+
+    def get_page(self, request, products, sort, per_page=None):
+        """Returns the keyset page for ?cursor=, falling back to page one."""
+        paginator = KeysetPaginator(products, sort=sort, per_page=per_page or self.paginate_by)
+        try:
+            return paginator.page(request.GET.get('cursor') or None)
+        except InvalidCursor:
+            return paginator.page()
+
+    def get_page_query(self, request, cursor=None):
+        """Current query string with the cursor swapped out."""
+        params = request.GET.copy()
+        params.pop('cursor', None)
+        if cursor:
+            params['cursor'] = cursor
+        return params.urlencode()
+
+
+class ProductListView(ConditionalGetMixin, ListingFilterMixin, View):
+    """
+    Displays all active, unsold product listings.
+    Supports search by keyword and faceted filtering (category,
+    condition, price, location, posting date) with live counts.
+    Results are cursor-paginated on the active sort order.
+    """
+    template_name = 'marketplace/product_list.html'
+    replica_reads = True
+
+    def get_etag_parts(self, request):
+        # Listing and photo changes bump the first, categories and counts the second
+        return catalog_cache.get_versions(catalog_cache.LISTINGS, catalog_cache.CATEGORIES)
+
+    def get(self, request):
+        products, filters = self.get_listing_filters(request)
+        page = self.get_page(request, products, filters['sort'])
+        facets = self.get_facets(request, filters)
+
+        context = {
+            'products': page.object_list,
+            'page': page,
+            'next_page_query': self.get_page_query(request, page.next_cursor),
+            'first_page_query': self.get_page_query(request),
+            'facets': facets,
+            'total_count': facets.total,
             'condition_choices': Product.CONDITION_CHOICES,
+            **filters,
         }
         return render(request, self.template_name, context)
 
 
+class ProductFeedView(ListingFilterMixin, View):
+    """
+    Compact JSON version of the listing page.
+    Accepts the same filters plus ?cursor=, ?limit= (max 100)
+    and ?count=1 to include an approximate total.
+    """
+    max_limit = 100
+
+    def get(self, request):
+        products, filters = self.get_listing_filters(request)
+
+        try:
+            limit = int(request.GET.get('limit', self.paginate_by))
+        except ValueError:
+            limit = self.paginate_by
+        limit = max(1, min(limit, self.max_limit))
+
+        page = self.get_page(request, products, filters['sort'], per_page=limit)
+
+        results = []
+        for product in page:
+            image = product.get_primary_image()
+            results.append({
+                'id': product.pk,
+                'title': product.title,
+                'price': str(product.price),
+                'condition': product.condition,
+                'category': product.category.slug if product.category else None,
+                'location': product.location,
+                'created_at': product.created_at.isoformat(),
+                'url': product.get_absolute_url(),
+                # The same renditions as the HTML grid, never the original upload
+                'image': image.card_url if image else None,
+                'srcset': image.srcset if image else None,
+            })
+
+        data = {
+            'results': results,
+            'next_cursor': page.next_cursor,
+            'next': (
+                f"{request.path}?{self.get_page_query(request, page.next_cursor)}"
+                if page.has_next else None
+            ),
+        }
+        if request.GET.get('count') == '1':
+            data['count'], data['count_is_estimate'] = approximate_count(products)
+
+        return JsonResponse(data)
+
 
 # ─────────────────────────────────────────────
 # Product Detail View
 # ─────────────────────────────────────────────
 
-class ProductDetailView(View):
+class ProductDetailView(ConditionalGetMixin, View):
     template_name = 'marketplace/product_detail.html'
+    fragments = ('product:related',)
+    replica_reads = True
+    seller_id = None
+
+    def dispatch(self, request, *args, **kwargs):
+        response = super().dispatch(request, *args, **kwargs)
+        # Buffered, see marketplace.analytics; 304 revisits count as views
+        if (
+            request.method == 'GET' and response.status_code in (200, 304)
+            and self.seller_id != request.user.pk
+        ):
+            record_view(request, kwargs['pk'])
+        return response
+
+    def get_etag_parts(self, request, pk):
+        state = Product.objects.filter(
+            pk=pk, is_active=True
+        ).values_list('updated_at', 'seller_id').first()
+        if state is None:
+            return None  # let get() raise the 404
+        self.updated_at, self.seller_id = state
+        # The listing's own version also covers its photos and the
+        # suggestions shown below it; the category name comes from CATEGORIES
+        versions = catalog_cache.get_versions(
+            catalog_cache.product_scope(pk), catalog_cache.RELATED, catalog_cache.CATEGORIES,
+        )
+        return [*versions, self.updated_at.isoformat()]
+
+    def get_last_modified(self, request, pk):
+        return self.updated_at
 
     def get(self, request, pk):
         product = get_object_or_404(
@@ -115,20 +280,26 @@ class ProductDetailView(View):
             pk=pk,
             is_active=True
         )
-        # Fetch 4 related listings from same category, exclude current
-        related_products = Product.objects.filter(
-            is_active=True,
-            is_sold=False,
-            category=product.category
-        ).exclude(pk=pk).prefetch_related('images')[:4]
+        self.seller_id = product.seller_id
+        # Precomputed suggestions (see marketplace.recommendations),
+        # rendered once per listing until it or a suggested listing changes
+        related_html = catalog_cache.get_or_build(
+            'product:related', lambda: self.render_related(product),
+            scopes=(catalog_cache.product_scope(product.pk), catalog_cache.RELATED), key=product.pk,
+        )
 
         context = {
             'product': product,
             'is_seller': request.user == product.seller,
-            'related_products': related_products,
+            'related_html': related_html,
         }
         return render(request, self.template_name, context)
 
+    def render_related(self, product):
+        return render_to_string('marketplace/_related_products.html', {
+            'related_products': related_products(product),
+        })
+
 # ─────────────────────────────────────────────
 # Product Create View
 # ─────────────────────────────────────────────
@@ -170,6 +341,69 @@ class ProductCreateView(View):
         })
 
 
+# ─────────────────────────────────────────────
+# Bulk Import / Export
+# ─────────────────────────────────────────────
+
+@method_decorator(login_required, name='dispatch')
+class ProductImportView(View):
+    """
+    Posts many listings at once from an uploaded CSV / JSONL file,
+    e.g. for society sales and thrift drives.
+    """
+    template_name = 'marketplace/product_import.html'
+
+    def get(self, request):
+        return render(request, self.template_name, {'form': ListingImportForm()})
+
+    def post(self, request):
+        form = ListingImportForm(request.POST, request.FILES)
+        report = None
+        if form.is_valid():
+            upload = form.cleaned_data['file']
+            photos = UploadedImageSource(form.cleaned_data['photos'])
+            try:
+                report = import_listings(
+                    text_stream(upload.file), detect_format(upload.name), request.user,
+                    image_source=photos, dry_run=form.cleaned_data['dry_run'],
+                )
+            except (ImportFileError, UnicodeDecodeError) as exc:
+                form.add_error('file', f"Could not read this file: {exc}")
+
+        if report and report.created and not form.cleaned_data['dry_run']:
+            messages.success(request, f"{report.created} listing(s) posted! 🎉")
+            if report.ok:
+                return redirect('marketplace:my_listings')
+
+        return render(request, self.template_name, {
+            'form': form,
+            'report': report,
+            'dry_run': form.cleaned_data.get('dry_run') if form.is_bound else False,
+        })
+
+
+@method_decorator(login_required, name='dispatch')
+class ProductExportView(View):
+    """
+    Streams the user's listings (or, for staff, the whole catalog with
+    ?scope=all) as CSV or JSONL without loading them all into memory.
+    """
+
+    def get(self, request):
+        fmt = 'jsonl' if request.GET.get('format') == 'jsonl' else 'csv'
+        products = Product.objects.order_by('pk')
+        if request.GET.get('scope') == 'all' and request.user.is_staff:
+            filename = f'bingo-listings.{fmt}'
+        else:
+            products = products.filter(seller=request.user)
+            filename = f'my-listings.{fmt}'
+
+        content_type = 'application/x-ndjson' if fmt == 'jsonl' else 'text/csv; charset=utf-8'
+        response = StreamingHttpResponse(export_listings(products, fmt), content_type=content_type)
+        response['Content-Disposition'] = f'attachment; filename="{filename}"'
+        return response
+
+
 # ─────────────────────────────────────────────
 # Product Edit View (Seller Only)
 # ─────────────────────────────────────────────
@@ -300,33 +534,104 @@ def delete_product_image(request, image_id):
 
     return redirect('marketplace:product_detail', pk=image.product.pk)
 
+# ─────────────────────────────────────────────
+# Image Derivatives (lazy fallback)
+# ─────────────────────────────────────────────
+
+def image_derivative(request, image_id, size):
+    """
+    Builds a missing rendition on first request and redirects to its
+    content-hashed file. Used only until the derivative exists; after
+    that templates link to the file directly.
+    """
+    if size not in DERIVATIVE_SIZES:
+        raise Http404("Unknown image size.")
+    image = get_object_or_404(ProductImage, pk=image_id)
+
+    try:
+        generate_derivatives(image)
+        url = image.get_url(size)
+    except ImageTooLarge:
+        # Never hand a decompression bomb to browsers either
+        raise Http404("Image is too large to display.")
+    except (OSError, ValueError):
+        # Unreadable original — serve it as-is rather than a broken image
+        url = image.image.url
+
+    response = HttpResponseRedirect(url)
+    patch_cache_control(response, public=True, max_age=86400)
+    return response
+
+
 # ─────────────────────────────────────────────
 # My Listings (Seller Dashboard)
 # ─────────────────────────────────────────────
 
 @method_decorator(login_required, name='dispatch')
-class MyListingsView(View):
+class MyListingsView(ConditionalGetMixin, View):
     """
-    Shows all listings posted by the currently logged-in user.
-    Includes active, sold, and inactive listings.
+    Shows all listings posted by the currently logged-in user, one
+    paginated tab at a time (active, sold or all). Tab counts come from
+    one grouped aggregate and each listing's photo and chat counts are
+    subqueries, so the page costs the same for five listings or five
+    hundred.
     """
     template_name = 'marketplace/my_listings.html'
+    paginate_by = 20
+    tabs = {
+        'active': Q(is_active=True, is_sold=False),
+        'sold': Q(is_sold=True),
+        'all': Q(),
+    }
+
+    def get_counts(self, user):
+        """Every tab's count in one query."""
+        if not hasattr(self, '_counts'):
+            self._counts = Product.objects.filter(seller=user).aggregate(
+                **{tab: Count('pk', filter=q) for tab, q in self.tabs.items()},
+                # For the ETag: view-count flushes are plain UPDATEs that
+                # touch neither updated_at nor the catalog version
+                views=Sum('view_count'), viewers=Sum('recent_viewer_count'),
+            )
+        return self._counts
+
+    def get_etag_parts(self, request):
+        # Chats don't touch the catalog, and finished rendition jobs bump
+        # only their product's scope, so both are counted directly
+        chats = ChatRoom.objects.filter(seller=request.user).count()
+        pending_photos = ProductImage.objects.filter(product__seller=request.user, derivatives={}).count()
+        versions = catalog_cache.get_versions(catalog_cache.LISTINGS, catalog_cache.CATEGORIES)
+        return [*versions, chats, pending_photos, *self.get_counts(request.user).values()]
+
+    def get_listings(self, user, tab):
+        images = ProductImage.objects.filter(product=OuterRef('pk')).order_by().values('product')
+        chats = ChatRoom.objects.filter(product=OuterRef('pk')).order_by().values('product')
+        return Product.objects.filter(self.tabs[tab], seller=user).select_related(
+            'category', 'cover_image'
+        ).annotate(
+            image_count=Coalesce(Subquery(images.annotate(n=Count('pk')).values('n')), 0),
+            pending_photo_count=Coalesce(Subquery(
+                images.filter(derivatives={}).annotate(n=Count('pk')).values('n')
+            ), 0),
+            chat_count=Coalesce(Subquery(chats.annotate(n=Count('pk')).values('n')), 0),
+        ).order_by('-created_at', '-pk')
 
     def get(self, request):
-        all_listings = Product.objects.filter(
-            seller=request.user
-        ).prefetch_related('images').order_by('-created_at')
+        tab = request.GET.get('tab', 'active')
+        if tab not in self.tabs:
+            tab = 'active'
+        counts = self.get_counts(request.user)
 
-        # Separate by status for tabs
-        active_listings = all_listings.filter(is_active=True, is_sold=False)
-        sold_listings = all_listings.filter(is_sold=True)
+        paginator = Paginator(self.get_listings(request.user, tab), self.paginate_by)
+        paginator.count = counts[tab]  # already known; skips a COUNT query
+        page = paginator.get_page(request.GET.get('page'))
 
         context = {
-            'all_listings': all_listings,
-            'active_listings': active_listings,
-            'sold_listings': sold_listings,
-            'active_count': active_listings.count(),
-            'sold_count': sold_listings.count(),
-            'total_count': all_listings.count(),
+            'tab': tab,
+            'listings': page.object_list,
+            'page_obj': page,
+            'active_count': counts['active'],
+            'sold_count': counts['sold'],
+            'total_count': counts['all'],
         }
         return render(request, self.template_name, context)
\ No newline at end of file